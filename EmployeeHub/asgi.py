@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EmployeeHub.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after the setup done by get_asgi_application()
+from viewer.notifications import SSE_PATH, sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Server-sent events are streamed by a plain ASGI app, everything else goes to Django.
+    """
+    if scope['type'] == 'http' and scope['path'] == SSE_PATH:
+        await sse_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -46,13 +46,19 @@ LOGIN_REDIRECT_URL = 'homepage'
 LOGOUT_REDIRECT_URL = 'login'
 
 MIDDLEWARE = [
+    'viewer.tracing.TracingMiddleware',
+    'viewer.metrics.MetricsMiddleware',
+    'viewer.query_log.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'viewer.middleware.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'viewer.memory_profile.MemoryProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'viewer.tracing.ViewTracingMiddleware',
 ]
 
 ROOT_URLCONF = 'EmployeeHub.urls'
@@ -61,8 +67,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cached like the default loaders; every template render is a span of the sampled traces
+            'loaders': [
+                ('viewer.tracing.CachedLoader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -83,10 +95,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Background workers (manage.py runworker) write concurrently, wait for the lock instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
 
+# Statistics of every SQL fingerprint and the rotating log of statements slower than SLOW_QUERY_THRESHOLD
+# seconds, see viewer/query_log.py and `manage.py query_report`. Off by default, so manage.py commands and
+# tests leave no files behind; set it on the servers, e.g. to BASE_DIR / 'query_log'
+QUERY_LOG_DIR = None
+SLOW_QUERY_THRESHOLD = 0.1
+
+# Share of the requests traced into TRACE_DIR (0 to 1), TRACE_SAMPLE_RATES = {'url_name': rate} overrides it
+# for single views, see viewer/tracing.py
+TRACE_DIR = BASE_DIR / 'traces'
+TRACE_SAMPLE_RATE = 0
+
+# Age in days after which `manage.py purge_old_data` deletes the rows of each policy in viewer/retention.py,
+# None keeps them
+RETENTION_DAYS = {
+    'archived_comments': 3 * 365,
+    'events': 180,
+    'change_notifications': 7,
+    'finished_jobs': 30,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -124,6 +159,12 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_test')
 
+# collectstatic writes content-hashed, minified and precompressed (.gz/.br) copies into STATIC_ROOT,
+# StaticAssetMiddleware then serves them with immutable cache headers.
+# The development server keeps serving the plain files from viewer/static.
+if not DEBUG:
+    STATICFILES_STORAGE = 'viewer.storage.CompressedManifestStaticFilesStorage'
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
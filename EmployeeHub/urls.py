@@ -26,7 +26,11 @@ from viewer.views import HomepageView, UserListView, CustomerView, ContractListV
     SubmittablePasswordChangeView, show_subcontracts, SubContractUpdateView, SubContractDeleteView, CommentCreateView, \
     events_feed, calendar_view, update_event, create_event, get_groups, delete_event, \
     employee_profile, change_security_question_view, password_reset_step_1, password_reset_step_2, \
-    password_reset_step_3, SubContractAllListView,  ContractView, SubContractDetailView
+    password_reset_step_3, SubContractAllListView,  ContractView, SubContractDetailView, ArchivedContractListView, \
+    ArchivedContractDetailView, ArchivedContractRestoreView, AtRiskView, JobListView, JobEnqueueView, \
+    AnalyticsView, analytics_api, burndown_report, trend_report, hr_export, ContractBulkActionView, \
+    SubContractBulkActionView, api_list, api_detail, api_batch, event_stream, \
+    metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -50,6 +54,29 @@ urlpatterns = [
     path('contract/create/', ContractCreateView.as_view(), name='contract_create'),
     path('contract/update/<pk>', ContractUpdateView.as_view(), name='contract_update'),
     path('contract/delete/<pk>', ContractDeleteView.as_view(), name='contract_delete'),
+    path('at-risk/', AtRiskView.as_view(), name='at_risk'),
+    path('contract/bulk/', ContractBulkActionView.as_view(), name='contract_bulk_action'),
+
+# paths for the JSON API
+    path('api/v1/batch/', api_batch, name='api_batch'),
+    path('api/v1/<str:resource>/', api_list, name='api_list'),
+    path('api/v1/<str:resource>/<int:pk>/', api_detail, name='api_detail'),
+
+# paths for analytics
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('analytics/api/<str:dimension>/', analytics_api, name='analytics_api'),
+    path('reports/burndown/', burndown_report, name='burndown_report'),
+    path('reports/trend/', trend_report, name='trend_report'),
+    path('reports/trend/<str:scope>/<int:key>/', trend_report, name='trend_report_scope'),
+
+# paths for background jobs
+    path('jobs/', JobListView.as_view(), name='job_list'),
+    path('jobs/enqueue/', JobEnqueueView.as_view(), name='job_enqueue'),
+
+# path for archive
+    path('archive/', ArchivedContractListView.as_view(), name='archive_list'),
+    path('archive/<int:pk>/', ArchivedContractDetailView.as_view(), name='archive_detail'),
+    path('archive/<int:pk>/restore/', ArchivedContractRestoreView.as_view(), name='archive_restore'),
 
 # path fot customers
     path('customers/', CustomerView.as_view(), name='navbar_customers'),
@@ -65,6 +92,7 @@ urlpatterns = [
     path('subcontract/create/<param>', SubContractCreateView.as_view(), name='subcontract_create'),
     path("subcontract/<int:contract_pk>/<int:subcontract_number>/update/", SubContractUpdateView.as_view(), name="subcontract_update"),
     path('subcontract/delete/<pk>', SubContractDeleteView.as_view(), name='subcontract_delete'),
+    path('subcontract/bulk/', SubContractBulkActionView.as_view(), name='subcontract_bulk_action'),
 
 # paths for comments
     path('comment/create/<pk>', CommentCreateView.as_view(), name='comment_add'),
@@ -72,12 +100,14 @@ urlpatterns = [
 #path for calendar
     path('calendar/', calendar_view, name='calendar'),
     path('events-feed/', events_feed, name='events_feed'),
+    path('events/stream/', event_stream, name='event_stream'),
     path('create-event/', create_event, name='create_event'),
     path('get-groups/', get_groups, name='get_groups'),
     path('update-event/<int:event_id>/', update_event, name='update_event'),
     path('delete-event/<int:event_id>/', delete_event, name='delete_event'),
 
     path('employees/', UserListView.as_view(), name='employees'),
+    path('employees/export.<str:export_format>', hr_export, name='hr_export'),
 
 #path for employee profile
     path('employee-profile/', employee_profile, name='employee_profile'),
@@ -87,4 +117,7 @@ urlpatterns = [
     path('password-reset/step-2/', password_reset_step_2, name='password_reset_step_2'),
     path('password-reset/step-3/', password_reset_step_3, name='password_reset_step_3'),
 
+#path for monitoring
+    path('metrics', metrics, name='metrics'),
+
 ]
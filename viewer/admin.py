@@ -1,8 +1,82 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.contrib.auth.models import Permission
+from django.db.models import Q
+from django.template.response import TemplateResponse
 
 from .models import Position, UserProfile, EmployeeInformation, BankAccount, EmergencyContact, Contract, Customer, \
     SubContract, Comment, Event, SecurityQuestion
+from .bulk import apply_bulk_action
+from .forms import ReassignForm
+from .pagination import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow without bound: estimated row counts and no second
+    COUNT(*) of the whole table next to a filtered count.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Integer fields matched exactly by a numeric search term. The admin's '=field' is an iexact, which
+    # SQLite runs as a LIKE that no index serves, so search_fields keep only '^' prefix searches of
+    # columns with a NOCASE index.
+    number_search_fields = []
+
+    def get_search_fields(self, request):
+        return super().get_search_fields(request) or self.number_search_fields
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.search_fields:
+            results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        else:
+            results, may_have_duplicates = queryset.none(), False
+        term = search_term.strip()
+        if self.number_search_fields and term.isdigit():
+            numbers = Q(*((field, int(term)) for field in self.number_search_fields), _connector=Q.OR)
+            results |= queryset.filter(numbers)
+        elif not term:
+            results = queryset
+        return results, may_have_duplicates
+
+
+class BulkActionsAdmin(LargeTableAdmin):
+    """
+    Status changes and reassignment of the selected rows with a few UPDATEs, see viewer.bulk.
+    """
+    actions = ['mark_done', 'mark_cancelled', 'reassign']
+
+    def run_bulk_action(self, request, queryset, action, user=None):
+        changed = apply_bulk_action(self.model, action, queryset.values('pk'), user)
+        self.message_user(request, f"Změněno záznamů: {changed}.", messages.SUCCESS)
+
+    @admin.action(description="Označit jako hotové", permissions=['change'])
+    def mark_done(self, request, queryset):
+        self.run_bulk_action(request, queryset, 'done')
+
+    @admin.action(description="Zrušit", permissions=['change'])
+    def mark_cancelled(self, request, queryset):
+        self.run_bulk_action(request, queryset, 'cancelled')
+
+    @admin.action(description="Předat uživateli", permissions=['change'])
+    def reassign(self, request, queryset):
+        """
+        Asks for the new user on an intermediate page, which posts the action back with 'apply'.
+        """
+        form = ReassignForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            self.run_bulk_action(request, queryset, 'reassign', form.cleaned_data['user'])
+            return None
+        return TemplateResponse(request, 'admin/viewer/bulk_reassign.html', {
+            **self.admin_site.each_context(request),
+            'title': "Předat uživateli",
+            'opts': self.model._meta,
+            'form': form,
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        })
 
 
 class EmergencyContactInline(admin.TabularInline):
@@ -23,19 +97,71 @@ class EmployeeInformationInline(admin.StackedInline):
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'position', 'phone_number']
+    list_select_related = ['user', 'position']
+    list_filter = ['position']
+    # One profile per employee, the join to auth_user is scanned
+    search_fields = ['^user__username', '^user__last_name', '=phone_number']
+    autocomplete_fields = ['user', 'position']
     inlines = [EmployeeInformationInline, BankAccountInline, EmergencyContactInline]
 
 
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ['last_name', 'first_name', 'email_address', 'phone_number']
+    # Prefix searches (istartswith, a LIKE in SQLite) use the NOCASE indexes of the two columns
+    search_fields = ['^last_name', '^first_name']
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+
+@admin.register(Contract)
+class ContractAdmin(BulkActionsAdmin):
+    list_display = ['contract_name', 'user', 'customer', 'status', 'deadline', 'risk_bucket', 'subcontracts_total']
+    list_select_related = ['user', 'customer']
+    list_filter = ['status', 'risk_bucket']
+    # Only columns of the contract table, a term on a joined table makes SQLite scan for the whole OR
+    search_fields = ['^contract_name']
+    number_search_fields = ['id']
+    autocomplete_fields = ['user', 'customer']
+    ordering = ['-deadline']
+
+
+@admin.register(SubContract)
+class SubContractAdmin(BulkActionsAdmin):
+    list_display = ['subcontract_name', 'contract', 'subcontract_number', 'user', 'status', 'risk_bucket']
+    list_select_related = ['contract', 'user']
+    list_filter = ['status', 'risk_bucket']
+    search_fields = ['^subcontract_name']
+    number_search_fields = ['id', 'contract_id']
+    autocomplete_fields = ['user', 'contract']
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ['text', 'subcontract', 'created']
+    list_select_related = ['subcontract']
+    number_search_fields = ['subcontract_id']
+    autocomplete_fields = ['subcontract']
+    ordering = ['-created']
+
+
+@admin.register(Event)
+class EventAdmin(LargeTableAdmin):
+    list_display = ['title', 'group', 'start_time', 'end_time']
+    list_select_related = ['group']
+    list_filter = ['group']
+    search_fields = ['^title']
+    autocomplete_fields = ['group']
+    ordering = ['-start_time']
+
+
 # Registering models for Django administration
 # These models will be available in the administration interface,
 # making it easier to manage data in the application.
-admin.site.register(Position)               # Model for positions
-admin.site.register(Customer)               # Model for customers
-admin.site.register(Contract)               # Model for contracts
-admin.site.register(SubContract)            # Model for subcontracts
-admin.site.register(Comment)                # Model for comments
-admin.site.register(Event)                  # Model for events
 admin.site.register(SecurityQuestion)       # Model for security questions
 admin.site.register(Permission)             # Model for permissions
@@ -0,0 +1,116 @@
+"""
+Workload rollups per employee, customer and position.
+
+Each rollup is a handful of grouped queries (COUNT(...) FILTER (WHERE ...) per status and risk bucket)
+instead of loading rows. The results are cached, and the cache is invalidated, not updated: any change
+of a contract, subcontract or the grouped objects drops the whole namespace (see viewer.caching and
+viewer.signals), and the next read runs the grouped queries again. Applying per-row deltas would drift,
+as the risk buckets move with time and bulk updates bypass the per-row signals. The `warm_analytics`
+job recomputes the rollups ahead of the readers.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+
+from .caching import cached
+from .models import Contract, SubContract, Customer, Position, Status, RiskBucket
+
+User = get_user_model()
+
+STATUS_KEYS = {Status.IN_PROGRESS: 'open', Status.DONE: 'done', Status.CANCELLED: 'cancelled'}
+BUCKET_KEYS = {RiskBucket.OVERDUE: 'overdue', RiskBucket.WEEK: 'week', RiskBucket.FORTNIGHT: 'fortnight',
+               RiskBucket.LATER: 'later'}
+
+# Cache namespaces each dimension depends on
+DIMENSIONS = {
+    'user': ('contracts', 'employees'),
+    'customer': ('contracts', 'customers'),
+    'position': ('contracts', 'employees'),
+}
+
+
+def status_counts():
+    return {key: Count('pk', filter=Q(status=status)) for status, key in STATUS_KEYS.items()}
+
+
+def bucket_counts():
+    return {key: Count('pk', filter=Q(risk_bucket=bucket)) for bucket, key in BUCKET_KEYS.items()}
+
+
+def contract_rollup(group_field, with_subcontract_counters=False):
+    """
+    One grouped query over Contract: contracts per status and open contracts per risk bucket.
+    The subcontract counters kept on Contract give the subcontract totals without reading SubContract.
+    """
+    annotations = {**status_counts(), **bucket_counts()}
+    if with_subcontract_counters:
+        annotations.update(
+            sub_open=Sum('subcontracts_in_progress'),
+            sub_done=Sum('subcontracts_done'),
+            sub_cancelled=Sum('subcontracts_cancelled'),
+        )
+    return {row.pop(group_field): row for row in
+            Contract.objects.values(group_field).annotate(**annotations).order_by()}
+
+
+def subcontract_rollup(group_field):
+    """
+    One grouped query over SubContract: subcontracts per status.
+    """
+    return {row.pop(group_field): row for row in
+            SubContract.objects.values(group_field).annotate(**status_counts()).order_by()}
+
+
+def build_rows(names, contracts, subcontracts):
+    rows = []
+    for key in contracts.keys() | subcontracts.keys():
+        contract_row = contracts.get(key, {})
+        subcontract_row = subcontracts.get(key, {})
+        rows.append({
+            'id': key,
+            'name': names.get(key, "—"),
+            'contracts': {name: contract_row.get(name, 0) for name in STATUS_KEYS.values()},
+            'subcontracts': {name: subcontract_row.get(name) or 0 for name in STATUS_KEYS.values()},
+            'deadlines': {name: contract_row.get(name, 0) for name in BUCKET_KEYS.values()},
+        })
+    rows.sort(key=lambda row: (-row['contracts']['open'], row['name']))
+    return rows
+
+
+def workload_by_user():
+    contracts = contract_rollup('user')
+    subcontracts = subcontract_rollup('user')
+    ids = contracts.keys() | subcontracts.keys()
+    names = {pk: f"{first_name} {last_name}".strip() or username for pk, first_name, last_name, username in
+             User.objects.filter(pk__in=ids).values_list('pk', 'first_name', 'last_name', 'username')}
+    return build_rows(names, contracts, subcontracts)
+
+
+def workload_by_customer():
+    contracts = contract_rollup('customer', with_subcontract_counters=True)
+    subcontracts = {key: {'open': row.pop('sub_open'), 'done': row.pop('sub_done'),
+                          'cancelled': row.pop('sub_cancelled')} for key, row in contracts.items()}
+    names = {pk: f"{first_name} {last_name}" for pk, first_name, last_name in
+             Customer.objects.filter(pk__in=contracts).values_list('pk', 'first_name', 'last_name')}
+    return build_rows(names, contracts, subcontracts)
+
+
+def workload_by_position():
+    contracts = contract_rollup('user__userprofile__position')
+    subcontracts = subcontract_rollup('user__userprofile__position')
+    names = dict(Position.objects.values_list('pk', 'name'))
+    names[None] = "Bez pozice"
+    return build_rows(names, contracts, subcontracts)
+
+
+ROLLUPS = {
+    'user': workload_by_user,
+    'customer': workload_by_customer,
+    'position': workload_by_position,
+}
+
+
+def workload(dimension):
+    """
+    Cached workload rows for 'user', 'customer' or 'position', recomputed in full after an invalidation.
+    """
+    return cached(DIMENSIONS[dimension], f"analytics:workload:{dimension}", ROLLUPS[dimension])
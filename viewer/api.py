@@ -0,0 +1,306 @@
+"""
+JSON API (/api/v1/) for contracts, subcontracts, customers and comments.
+
+Reads go through .values() with only the requested fields (?fields=id,contract_name,customer.last_name);
+a dotted field joins the related table, so the joins follow the requested fields and no model
+instance is built for a list. Lists are paginated with an opaque cursor over the primary key, which
+stays stable while rows are added, and every response carries an ETag of its body so clients can
+revalidate with If-None-Match. Writes go through model forms and Model.save(), so counters, risk
+buckets and cache invalidation behave as in the HTML views.
+"""
+import base64
+import hashlib
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms import modelform_factory
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from .models import Contract, SubContract, Customer, Comment, Position, Status
+
+User = get_user_model()
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors
+
+
+class Resource:
+    """
+    One model exposed by the API.
+    """
+    model = None
+    # API field name -> ORM path passed to values(), dotted names follow a foreign key
+    fields = {}
+    # Fields of a response without ?fields=
+    default_fields = []
+    # Fields accepted by POST and PATCH
+    writable = []
+    # Query parameter -> lookup, e.g. ?status=0
+    filters = {}
+    # Values of writable fields a POST may leave out
+    create_defaults = {}
+    # Foreign key field -> name of the resource it points to, for ?include= in batches (viewer.batching)
+    related = {}
+
+    def permission(self, action):
+        return f"{self.model._meta.app_label}.{action}_{self.model._meta.model_name}"
+
+    def parse_fields(self, value):
+        """
+        Requested field names from ?fields=, the id always included.
+        """
+        if not value:
+            return self.default_fields
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+        return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+
+    def queryset(self, params):
+        queryset = self.model.objects.all()
+        lookups = {}
+        for param, lookup in self.filters.items():
+            if param in params:
+                lookups[lookup] = params[param]
+        try:
+            return queryset.filter(**lookups)
+        except (ValueError, TypeError):
+            raise ApiError("Invalid filter value")
+
+    def rows(self, queryset, fields):
+        """
+        Values of `fields` for the rows of `queryset`, keyed by the API field names.
+        """
+        paths = [self.fields[name] for name in fields]
+        return [dict(zip(fields, values)) for values in queryset.values_list(*paths)]
+
+    def list(self, params):
+        """
+        One page of rows as {'results': [...], 'next': cursor or None}.
+        """
+        fields = self.parse_fields(params.get('fields'))
+        limit = parse_limit(params.get('limit'))
+        queryset = self.queryset(params).order_by('pk')
+        if params.get('cursor'):
+            queryset = queryset.filter(pk__gt=decode_cursor(params['cursor']))
+        # One row more than the page tells whether there is a next page
+        results = self.rows(queryset[:limit + 1], fields)
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_cursor(results[-1]['id'])
+        return {'results': results, 'next': next_cursor}
+
+    def detail(self, pk, fields=None):
+        rows = self.rows(self.model.objects.filter(pk=pk), fields or self.default_fields)
+        if not rows:
+            raise ApiError("Not found", status=404)
+        return rows[0]
+
+    def form(self, data, instance=None):
+        """
+        Bound model form of the writable fields. For an update the current values fill in the
+        fields missing from `data`, so PATCH may send only what changes.
+        """
+        unknown = set(data) - set(self.writable)
+        if unknown:
+            raise ApiError(f"Read-only or unknown fields: {', '.join(sorted(unknown))}")
+        form_class = modelform_factory(self.model, fields=self.writable)
+        if instance is not None:
+            data = {**model_to_dict(instance, fields=self.writable), **data}
+        else:
+            data = {**{name: value() if callable(value) else value
+                       for name, value in self.create_defaults.items()}, **data}
+        return form_class(data, instance=instance)
+
+    def save(self, form):
+        return form.save()
+
+
+class ContractResource(Resource):
+    model = Contract
+    fields = {
+        'id': 'id',
+        'contract_name': 'contract_name',
+        'created': 'created',
+        'deadline': 'deadline',
+        'status': 'status',
+        'closed_at': 'closed_at',
+        'risk_bucket': 'risk_bucket',
+        'subcontracts_total': 'subcontracts_total',
+        'subcontracts_in_progress': 'subcontracts_in_progress',
+        'subcontracts_done': 'subcontracts_done',
+        'subcontracts_cancelled': 'subcontracts_cancelled',
+        'user': 'user_id',
+        'user.username': 'user__username',
+        'user.first_name': 'user__first_name',
+        'user.last_name': 'user__last_name',
+        'customer': 'customer_id',
+        'customer.first_name': 'customer__first_name',
+        'customer.last_name': 'customer__last_name',
+    }
+    default_fields = ['id', 'contract_name', 'created', 'deadline', 'status', 'user', 'customer',
+                      'subcontracts_total', 'subcontracts_done']
+    writable = ['contract_name', 'user', 'customer', 'status', 'deadline']
+    filters = {'status': 'status', 'user': 'user_id', 'customer': 'customer_id', 'risk_bucket': 'risk_bucket'}
+    create_defaults = {'status': Status.IN_PROGRESS, 'deadline': lambda: timezone.now() + timedelta(days=30)}
+    related = {'user': 'users', 'customer': 'customers'}
+
+
+class SubContractResource(Resource):
+    model = SubContract
+    fields = {
+        'id': 'id',
+        'subcontract_name': 'subcontract_name',
+        'subcontract_number': 'subcontract_number',
+        'created': 'created',
+        'status': 'status',
+        'risk_bucket': 'risk_bucket',
+        'user': 'user_id',
+        'user.username': 'user__username',
+        'user.first_name': 'user__first_name',
+        'user.last_name': 'user__last_name',
+        'contract': 'contract_id',
+        'contract.contract_name': 'contract__contract_name',
+        'contract.deadline': 'contract__deadline',
+    }
+    default_fields = ['id', 'subcontract_name', 'subcontract_number', 'created', 'status', 'user', 'contract']
+    writable = ['subcontract_name', 'user', 'contract', 'subcontract_number', 'status']
+    filters = {'status': 'status', 'user': 'user_id', 'contract': 'contract_id'}
+    create_defaults = {'status': Status.IN_PROGRESS}
+    related = {'user': 'users', 'contract': 'contracts'}
+
+    def save(self, form):
+        subcontract = form.save(commit=False)
+        if subcontract.subcontract_number is None:
+            subcontract.subcontract_number = SubContract.get_next_subcontract_number(subcontract.contract)
+        subcontract.save()
+        return subcontract
+
+
+class CustomerResource(Resource):
+    model = Customer
+    fields = {
+        'id': 'id',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'created': 'created',
+        'phone_number': 'phone_number',
+        'email_address': 'email_address',
+    }
+    default_fields = list(fields)
+    writable = ['first_name', 'last_name', 'phone_number', 'email_address']
+
+
+class CommentResource(Resource):
+    model = Comment
+    fields = {
+        'id': 'id',
+        'text': 'text',
+        'created': 'created',
+        'subcontract': 'subcontract_id',
+        'subcontract.subcontract_name': 'subcontract__subcontract_name',
+        'subcontract.contract': 'subcontract__contract_id',
+    }
+    default_fields = ['id', 'text', 'created', 'subcontract']
+    writable = ['text', 'subcontract']
+    filters = {'subcontract': 'subcontract_id'}
+    related = {'subcontract': 'subcontracts'}
+
+
+class UserResource(Resource):
+    """
+    Read-only, only loaded as related rows of a batch.
+    """
+    model = User
+    fields = {
+        'id': 'id',
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'position': 'userprofile__position_id',
+    }
+    default_fields = list(fields)
+    related = {'position': 'positions'}
+
+
+class PositionResource(Resource):
+    """
+    Read-only, only loaded as related rows of a batch.
+    """
+    model = Position
+    fields = {'id': 'id', 'name': 'name'}
+    default_fields = list(fields)
+
+
+RESOURCES = {
+    'contracts': ContractResource(),
+    'subcontracts': SubContractResource(),
+    'customers': CustomerResource(),
+    'comments': CommentResource(),
+}
+
+# Resources that can only be read as related rows
+RELATED_RESOURCES = {
+    **RESOURCES,
+    'users': UserResource(),
+    'positions': PositionResource(),
+}
+
+
+def get_resource(name):
+    if name not in RESOURCES:
+        raise ApiError("Unknown resource", status=404)
+    return RESOURCES[name]
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError("Invalid limit")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(json.dumps({'after': pk}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))['after'])
+    except (ValueError, TypeError, KeyError):
+        raise ApiError("Invalid cursor")
+
+
+def parse_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError("Invalid JSON")
+    if not isinstance(data, dict):
+        raise ApiError("Expected a JSON object")
+    return data
+
+
+def render_json(data):
+    """
+    JSON body of `data` and its ETag.
+    """
+    content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+    return content, f'"{hashlib.md5(content).hexdigest()}"'
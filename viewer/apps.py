@@ -10,3 +10,9 @@ class ViewerConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField' # Výchozí typ auto-pole pro modely
     name = 'viewer' # Název aplikace
+
+    def ready(self):
+        from . import signals  # noqa: F401 - připojí signály (počítadla podprojektů)
+        from . import tasks  # noqa: F401 - zaregistruje úlohy pro runworker
+        from . import query_log  # noqa: F401 - měří dotazy každého připojení k databázi
+        from . import tracing  # noqa: F401 - zapisuje dotazy do vzorkovaných traců
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contract, SubContract, Comment, ChangeVersion, ArchivedContract, ArchivedSubContract, \
+    ArchivedComment
+from .signals import suspend_counter_updates, suspend_notifications
+
+
+def archivable_contracts(days):
+    """
+    Finished or cancelled contracts closed more than `days` days ago, oldest first.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    return Contract.objects.finished().filter(closed_at__lt=cutoff).order_by('closed_at')
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def archive_contracts(contract_ids):
+    """
+    Moves the contracts with their subcontracts and comments into the archive tables in one transaction.
+    Contracts that were reopened in the meantime are left alone. Returns the number of archived contracts.
+    """
+    contracts = list(Contract.objects.select_for_update().finished().filter(pk__in=contract_ids))
+    if not contracts:
+        return 0
+    ids = [contract.pk for contract in contracts]
+    subcontracts = list(SubContract.objects.filter(contract_id__in=ids))
+    comments = list(Comment.objects.filter(subcontract__contract_id__in=ids))
+
+    ArchivedContract.objects.bulk_create([
+        ArchivedContract(id=contract.pk, contract_name=contract.contract_name, created=contract.created,
+                         user_id=contract.user_id, customer_id=contract.customer_id, status=contract.status,
+                         deadline=contract.deadline, closed_at=contract.closed_at)
+        for contract in contracts
+    ])
+    ArchivedSubContract.objects.bulk_create([
+        ArchivedSubContract(id=subcontract.pk, subcontract_name=subcontract.subcontract_name,
+                            created=subcontract.created, user_id=subcontract.user_id,
+                            contract_id=subcontract.contract_id, subcontract_number=subcontract.subcontract_number,
+                            status=subcontract.status)
+        for subcontract in subcontracts
+    ])
+    ArchivedComment.objects.bulk_create([
+        ArchivedComment(id=comment.pk, text=comment.text, subcontract_id=comment.subcontract_id,
+                        created=comment.created)
+        for comment in comments
+    ])
+
+    # The contracts are deleted right after, so their subcontract counters don't need updating
+    with suspend_counter_updates(), suspend_notifications():
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments]).delete()
+        SubContract.objects.filter(contract_id__in=ids).delete()
+        Contract.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def restore_contract(archived_contract):
+    """
+    Moves an archived contract with its subcontracts and comments back to the live tables under their
+    original primary keys. The closing date is reset, so the next archive run doesn't take it again.
+    """
+    archived_subcontracts = list(archived_contract.subcontracts.all())
+    archived_comments = list(ArchivedComment.objects.filter(subcontract__contract=archived_contract))
+
+    contract = Contract.objects.create(
+        id=archived_contract.pk, contract_name=archived_contract.contract_name,
+        user_id=archived_contract.user_id, customer_id=archived_contract.customer_id,
+        status=archived_contract.status, deadline=archived_contract.deadline,
+    )
+    SubContract.objects.bulk_create([
+        SubContract(id=subcontract.pk, subcontract_name=subcontract.subcontract_name, user_id=subcontract.user_id,
+                    contract=contract, subcontract_number=subcontract.subcontract_number, status=subcontract.status)
+        for subcontract in archived_subcontracts
+    ])
+    Comment.objects.bulk_create([
+        Comment(id=comment.pk, text=comment.text, subcontract_id=comment.subcontract_id)
+        for comment in archived_comments
+    ])
+
+    # auto_now_add overwrote the creation dates, put the original ones back
+    Contract.objects.filter(pk=contract.pk).update(created=archived_contract.created)
+    for subcontract in archived_subcontracts:
+        SubContract.objects.filter(pk=subcontract.pk).update(created=subcontract.created)
+    for comment in archived_comments:
+        Comment.objects.filter(pk=comment.pk).update(created=comment.created)
+
+    Contract.refresh_subcontract_counters(contract_ids=[contract.pk])
+    SubContract.objects.filter(contract=contract).update_risk_buckets('contract__deadline')
+    archived_contract.delete()
+    contract.refresh_from_db()
+    return contract
@@ -0,0 +1,188 @@
+"""
+Batched reads for the JSON API (POST /api/v1/batch/).
+
+A batch holds several sub-requests, each a list read ({"resource": "contracts", "params": {...}}) or a
+read of rows by primary key ({"resource": "contracts", "ids": [1, 2]}). Reads by primary key and
+the related rows named in "include" (users, customers, contracts, ...) are not fetched one at a time:
+they are queued in a DataLoader per resource and each loader fetches everything queued in one
+`pk IN (...)` query, so ten sub-requests asking for overlapping users cost one user query.
+Identical sub-requests run once.
+"""
+import json
+
+from .api import ApiError, MAX_LIMIT, RESOURCES, RELATED_RESOURCES
+
+MAX_SUBREQUESTS = 20
+
+
+class DataLoader:
+    """
+    Collects primary keys with load() and fetches the ones not loaded yet with dispatch(),
+    one query for all of them.
+    """
+    def __init__(self, resource):
+        self.resource = resource
+        self.rows = {}
+        self.pending = set()
+
+    def load(self, pks):
+        self.pending.update(pk for pk in pks if pk is not None and pk not in self.rows)
+
+    def dispatch(self):
+        """
+        Fetches the pending rows and returns them, keyed by primary key.
+        """
+        pks, self.pending = self.pending, set()
+        if not pks:
+            return {}
+        queryset = self.resource.model.objects.filter(pk__in=pks)
+        loaded = {row['id']: row for row in self.resource.rows(queryset, self.resource.default_fields)}
+        # Missing rows are remembered too, so they are not asked for again
+        self.rows.update({pk: loaded.get(pk) for pk in pks})
+        return loaded
+
+
+class Batch:
+    """
+    Runs the sub-requests of one batch for `user`.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.loaders = {}
+        # Resource name -> include tree applied to every row loaded for it
+        self.nested = {}
+
+    def loader(self, name):
+        if name not in self.loaders:
+            self.loaders[name] = DataLoader(RELATED_RESOURCES[name])
+        return self.loaders[name]
+
+    def check_permission(self, name):
+        if not self.user.has_perm(RELATED_RESOURCES[name].permission('view')):
+            raise ApiError(f"Permission denied: {name}", status=403)
+
+    def include_tree(self, resource, include):
+        """
+        {"field": {nested tree}} from include paths such as ["contract", "contract.user.position"].
+        """
+        if not isinstance(include, list):
+            raise ApiError("Invalid include")
+        tree = {}
+        for path in include:
+            current, node = resource, tree
+            for field in str(path).split('.'):
+                if field not in current.related:
+                    raise ApiError(f"Cannot include: {path}")
+                self.check_permission(current.related[field])
+                node = node.setdefault(field, {})
+                current = RELATED_RESOURCES[current.related[field]]
+        return tree
+
+    def queue_related(self, resource, rows, tree):
+        rows = list(rows)
+        for field, subtree in tree.items():
+            name = resource.related[field]
+            loader = self.loader(name)
+            pks = {row.get(field) for row in rows} - {None}
+            loader.load(pks)
+            merge(self.nested.setdefault(name, {}), subtree)
+            # Rows loaded earlier in the batch don't pass through dispatch again
+            loaded = [loader.rows[pk] for pk in pks if loader.rows.get(pk)]
+            if subtree and loaded:
+                self.queue_related(loader.resource, loaded, subtree)
+
+    def run(self, requests):
+        """
+        Returns {"responses": {id: {"status": ..., "body": ...}}, "included": {resource: {pk: row}}}.
+        """
+        if not isinstance(requests, list) or not requests:
+            raise ApiError("Expected a list of requests")
+        if len(requests) > MAX_SUBREQUESTS:
+            raise ApiError(f"At most {MAX_SUBREQUESTS} requests per batch")
+
+        responses = {}
+        by_ids = []
+        coalesced = {}
+        for position, request in enumerate(requests):
+            request_id = str(request.get('id', position)) if isinstance(request, dict) else str(position)
+            key = json.dumps({k: v for k, v in request.items() if k != 'id'}, sort_keys=True) \
+                if isinstance(request, dict) else None
+            if key in coalesced:
+                responses[request_id] = coalesced[key]
+                continue
+            try:
+                response = self.start(request, by_ids)
+            except ApiError as error:
+                response = {'status': error.status, 'body': {'status': 'error', 'message': error.message}}
+            coalesced[key] = responses[request_id] = response
+
+        # Rows asked for by primary key first, their related rows may need another round
+        self.dispatch_all()
+        for name, pks, tree, response in by_ids:
+            rows = [row for row in (self.loader(name).rows.get(pk) for pk in pks) if row is not None]
+            response['body'] = {'results': rows}
+            self.queue_related(RESOURCES[name], rows, tree)
+        while any(loader.pending for loader in self.loaders.values()):
+            self.dispatch_all()
+
+        return {
+            'responses': responses,
+            'included': {
+                name: {pk: row for pk, row in loader.rows.items() if row is not None}
+                for name, loader in sorted(self.loaders.items()) if name in self.nested
+            },
+        }
+
+    def dispatch_all(self):
+        for name, loader in list(self.loaders.items()):
+            loaded = loader.dispatch()
+            if loaded and self.nested.get(name):
+                self.queue_related(loader.resource, loaded.values(), self.nested[name])
+
+    def start(self, request, by_ids):
+        """
+        Runs a list read right away; a read by primary key is queued and filled in after dispatch.
+        """
+        if not isinstance(request, dict):
+            raise ApiError("Expected a JSON object")
+        name = request.get('resource')
+        if name not in RESOURCES:
+            raise ApiError("Unknown resource", status=404)
+        self.check_permission(name)
+        resource = RESOURCES[name]
+        tree = self.include_tree(resource, request.get('include') or [])
+
+        if 'ids' in request:
+            # A string is iterable too, "12" must not become the ids 1 and 2
+            if not isinstance(request['ids'], list):
+                raise ApiError("Invalid ids")
+            try:
+                pks = [int(pk) for pk in request['ids']]
+            except (TypeError, ValueError):
+                raise ApiError("Invalid ids")
+            if len(pks) > MAX_LIMIT:
+                raise ApiError(f"At most {MAX_LIMIT} ids per request")
+            self.loader(name).load(pks)
+            response = {'status': 200, 'body': None}
+            by_ids.append((name, pks, tree, response))
+            return response
+
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            raise ApiError("Invalid params")
+        params = {key: str(value) for key, value in params.items()}
+        if tree and params.get('fields'):
+            # The foreign keys are needed to include the related rows
+            params['fields'] = ",".join([params['fields'], *tree])
+        body = resource.list(params)
+        self.queue_related(resource, body['results'], tree)
+        return {'status': 200, 'body': body}
+
+
+def merge(tree, other):
+    for field, subtree in other.items():
+        merge(tree.setdefault(field, {}), subtree)
+
+
+def run_batch(user, requests):
+    return Batch(user).run(requests)
@@ -0,0 +1,118 @@
+"""
+Set-based status changes and reassignment of contracts and subcontracts.
+
+Each operation is a few UPDATE statements in one transaction instead of a save() per row, so the
+work Contract.save(), SubContract.save() and viewer.signals do per object is redone here for the
+whole set: closing dates, risk buckets, the subcontract counters of the affected contracts and the
+cache invalidation. The change versions of the tables are bumped once per operation.
+"""
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import bump
+from .models import Contract, SubContract, Status, ChangeVersion
+
+
+def closing_fields(status, now):
+    """
+    closed_at and risk_bucket values of rows moved to `status`, as Contract.save() would set them.
+    A contract moved from done to cancelled keeps its original closing date.
+    """
+    if int(status) in Contract.FINISHED_STATUSES:
+        return {'closed_at': Coalesce(F('closed_at'), Value(now)), 'risk_bucket': None}
+    return {'closed_at': None}
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def set_contract_status(contract_ids, status):
+    """
+    Moves the contracts to `status`. Finishing or cancelling a contract finishes or cancels its
+    subcontracts that are still in progress as well. Returns the number of changed contracts.
+    """
+    now = timezone.now()
+    contracts = Contract.objects.filter(pk__in=contract_ids).exclude(status=status)
+    ids = list(contracts.values_list('pk', flat=True))
+    if not ids:
+        return 0
+    Contract.objects.filter(pk__in=ids).update(status=status, **closing_fields(status, now))
+    if int(status) in Contract.FINISHED_STATUSES:
+        SubContract.objects.active().filter(contract_id__in=ids).update(status=status, risk_bucket=None)
+    else:
+        # Reopened contracts and their open subcontracts get a risk bucket again
+        Contract.objects.filter(pk__in=ids).update_risk_buckets('deadline', now)
+        SubContract.objects.filter(contract_id__in=ids).update_risk_buckets('contract__deadline', now)
+    Contract.refresh_subcontract_counters(contract_ids=ids)
+    bump('contracts')
+    return len(ids)
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def set_subcontract_status(subcontract_ids, status):
+    """
+    Moves the subcontracts to `status` and recounts the counters of their contracts.
+    Returns the number of changed subcontracts.
+    """
+    subcontracts = SubContract.objects.filter(pk__in=subcontract_ids).exclude(status=status)
+    rows = list(subcontracts.values_list('pk', 'contract_id'))
+    if not rows:
+        return 0
+    ids = [pk for pk, contract_id in rows]
+    if int(status) == Status.IN_PROGRESS:
+        SubContract.objects.filter(pk__in=ids).update(status=status)
+        SubContract.objects.filter(pk__in=ids).update_risk_buckets('contract__deadline')
+    else:
+        SubContract.objects.filter(pk__in=ids).update(status=status, risk_bucket=None)
+    Contract.refresh_subcontract_counters(contract_ids={contract_id for pk, contract_id in rows})
+    bump('contracts')
+    return len(ids)
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def reassign_contracts(contract_ids, user):
+    """
+    Hands the contracts over to `user`, together with their open subcontracts that belonged to the
+    previous owner of the contract. Returns the number of changed contracts.
+    """
+    contracts = Contract.objects.filter(pk__in=contract_ids).exclude(user=user)
+    ids = list(contracts.values_list('pk', flat=True))
+    if not ids:
+        return 0
+    SubContract.objects.active().filter(contract_id__in=ids, user=F('contract__user')).update(user=user)
+    Contract.objects.filter(pk__in=ids).update(user=user)
+    bump('contracts')
+    return len(ids)
+
+
+@transaction.atomic
+@ChangeVersion.deferred()
+def reassign_subcontracts(subcontract_ids, user):
+    """
+    Hands the subcontracts over to `user`. Returns the number of changed subcontracts.
+    """
+    changed = SubContract.objects.filter(pk__in=subcontract_ids).exclude(user=user).update(user=user)
+    if changed:
+        bump('contracts')
+    return changed
+
+
+# Bulk action name -> target status
+STATUS_ACTIONS = {'done': Status.DONE, 'cancelled': Status.CANCELLED}
+
+
+def apply_bulk_action(model, action, ids, user=None):
+    """
+    Runs a bulk action ('done', 'cancelled' or 'reassign') on the Contract or SubContract rows `ids`
+    (a list of primary keys or a values('pk') queryset). Returns the number of changed rows.
+    """
+    set_status, reassign = {
+        Contract: (set_contract_status, reassign_contracts),
+        SubContract: (set_subcontract_status, reassign_subcontracts),
+    }[model]
+    if action == 'reassign':
+        return reassign(ids, user)
+    return set_status(ids, STATUS_ACTIONS[action])
@@ -0,0 +1,67 @@
+"""
+Namespace-versioned caching.
+
+Every cached value is stored under a key that contains the current version of the namespaces it
+depends on. Invalidating a namespace only bumps its version; the old entries are never read again
+and expire on their own, so no key needs to be tracked or deleted.
+
+Versions live in the default cache. With several server processes, configure a shared backend
+(memcached, Redis, file based) in CACHES so that a bump in one process is seen by all of them.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import CACHE_REQUESTS
+from .tracing import span
+
+
+def version_key(namespace):
+    return f"ns-version:{namespace}"
+
+
+def versions(namespaces):
+    """
+    Current versions of `namespaces`. A missing version starts at the current time in milliseconds,
+    so a version lost by eviction never comes back to a number that old entries still use.
+    """
+    keys = [version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, int(time.time() * 1000), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*namespaces):
+    """
+    Invalidates everything cached under `namespaces`.
+    """
+    for namespace in namespaces:
+        key = version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def cached(namespaces, key, compute, timeout=None):
+    """
+    Returns the value cached under `key` for the current versions of `namespaces`, computing and
+    storing it on a miss.
+    """
+    timeout = getattr(settings, 'CACHE_TIMEOUT', 300) if timeout is None else timeout
+    stamp = ".".join(f"{namespace}{number}" for namespace, number in zip(namespaces, versions(namespaces)))
+    full_key = f"{key}:{stamp}"
+    with span('cache.get', 'cache', key=full_key):
+        value = cache.get(full_key)
+    for namespace in namespaces:
+        CACHE_REQUESTS.inc(namespace=namespace, result='miss' if value is None else 'hit')
+    if value is None:
+        with span('cache.compute', 'cache', key=full_key):
+            value = compute()
+        with span('cache.set', 'cache', key=full_key):
+            cache.set(full_key, value, timeout)
+    return value
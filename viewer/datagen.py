@@ -0,0 +1,79 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.utils import timezone
+
+from .models import Contract, Customer, SubContract, Comment, Event, Position, UserProfile, Status
+
+
+def generate_dataset(users=50, customers=200, contracts=5000, subcontracts_per_contract=4,
+                     comments_per_subcontract=2, events=2000, seed=1, batch_size=2000):
+    """
+    Fills the database with a large random but reproducible dataset for benchmarks.
+
+    Rows are written with bulk_create, so no signals are sent; the contract counters
+    and risk buckets are recomputed afterwards.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    positions = Position.objects.bulk_create([Position(name=f"Pozice {i}") for i in range(5)])
+    first_user = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    user_objects = User.objects.bulk_create(
+        [User(username=f"bench{first_user + i}", first_name="Jan", last_name=f"Novák {i}") for i in range(users)],
+        batch_size=batch_size,
+    )
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user, position=rng.choice(positions)) for user in user_objects],
+        batch_size=batch_size,
+    )
+    customer_objects = Customer.objects.bulk_create(
+        [Customer(first_name=f"Zákazník {i}", last_name=f"Příjmení {rng.randrange(customers)}")
+         for i in range(customers)],
+        batch_size=batch_size,
+    )
+    contract_objects = Contract.objects.bulk_create(
+        [Contract(
+            contract_name=f"Projekt {i}",
+            user=rng.choice(user_objects),
+            customer=rng.choice(customer_objects),
+            status=rng.choices(Status.values, weights=[3, 6, 1])[0],
+            deadline=now + timedelta(days=rng.randint(-365, 365)),
+        ) for i in range(contracts)],
+        batch_size=batch_size,
+    )
+    subcontract_objects = SubContract.objects.bulk_create(
+        [SubContract(
+            subcontract_name=f"Podprojekt {number}",
+            user=rng.choice(user_objects),
+            contract=contract,
+            subcontract_number=number,
+            status=contract.status,
+        ) for contract in contract_objects for number in range(1, subcontracts_per_contract + 1)],
+        batch_size=batch_size,
+    )
+    Contract.refresh_subcontract_counters()
+    Contract.objects.update_risk_buckets('deadline')
+    SubContract.objects.update_risk_buckets('contract__deadline')
+    Comment.objects.bulk_create(
+        [Comment(text=f"Komentář {i}", subcontract=subcontract)
+         for subcontract in subcontract_objects for i in range(comments_per_subcontract)],
+        batch_size=batch_size,
+    )
+    groups = [Group.objects.get_or_create(name=f"Skupina {i}")[0] for i in range(5)]
+    event_objects = []
+    for i in range(events):
+        start = now + timedelta(days=rng.randint(-365, 365), hours=rng.randint(0, 23))
+        event_objects.append(Event(title=f"Událost {i}", start_time=start,
+                                   end_time=start + timedelta(hours=rng.randint(1, 72)), group=rng.choice(groups)))
+    Event.objects.bulk_create(event_objects, batch_size=batch_size)
+
+    return {
+        'users': len(user_objects),
+        'customers': len(customer_objects),
+        'contracts': len(contract_objects),
+        'subcontracts': len(subcontract_objects),
+        'comments': len(subcontract_objects) * comments_per_subcontract,
+        'events': len(event_objects),
+    }
@@ -0,0 +1,153 @@
+"""
+Streaming HR export of employee profiles as CSV or JSON Lines.
+
+Profiles are read in keyset batches (pk > last pk, ordered by pk) with the user, position, employee
+information and bank account joined in and the emergency contacts prefetched, so every batch costs
+two queries and only one batch is held in memory, however many employees there are.
+"""
+import csv
+import json
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import UserProfile
+
+EXPORT_BATCH_SIZE = 500
+
+# Column name -> value of a profile, in export order
+PROFILE_COLUMNS = {
+    'id': lambda profile: profile.pk,
+    'username': lambda profile: profile.user.username,
+    'first_name': lambda profile: profile.user.first_name,
+    'last_name': lambda profile: profile.user.last_name,
+    'email': lambda profile: profile.user.email,
+    'is_active': lambda profile: profile.user.is_active,
+    'position': lambda profile: profile.position.name if profile.position else None,
+    'phone_number': lambda profile: profile.phone_number,
+}
+
+EMPLOYEE_INFORMATION_FIELDS = [
+    'permament_address', 'permament_descriptive_number', 'permament_postal_code', 'city', 'phone_number',
+    'start_employee_contract', 'birth_day', 'contract_type',
+]
+BANK_ACCOUNT_FIELDS = ['account_prefix', 'account_number', 'bank_code', 'bank_name', 'iban', 'swift_bic']
+EMERGENCY_CONTACT_FIELDS = ['name', 'address', 'descriptive_number', 'postal_code', 'city', 'phone_number']
+
+
+def related_or_none(profile, name):
+    """
+    The one-to-one `name` of `profile` or None. select_related caches a missing row as well, so this
+    never queries.
+    """
+    try:
+        return getattr(profile, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def iter_profiles(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields every UserProfile with its related HR data, reading `batch_size` profiles per batch.
+    """
+    queryset = UserProfile.objects.select_related(
+        'user', 'position', 'employeeinformation', 'bankaccount',
+    ).prefetch_related('emergency_contacts').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last_pk = batch[-1].pk
+
+
+def profile_record(profile):
+    """
+    HR data of one profile as a dict of JSON serializable values.
+    """
+    record = {name: value(profile) for name, value in PROFILE_COLUMNS.items()}
+    information = related_or_none(profile, 'employeeinformation')
+    record['employee_information'] = {
+        field: serialize(getattr(information, field)) for field in EMPLOYEE_INFORMATION_FIELDS
+    } if information else None
+    account = related_or_none(profile, 'bankaccount')
+    record['bank_account'] = {
+        field: getattr(account, field) for field in BANK_ACCOUNT_FIELDS
+    } if account else None
+    record['emergency_contacts'] = [
+        {field: getattr(contact, field) for field in EMERGENCY_CONTACT_FIELDS}
+        for contact in profile.emergency_contacts.all()
+    ]
+    return record
+
+
+def serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_header():
+    return (list(PROFILE_COLUMNS)
+            + [f"employee_information_{field}" for field in EMPLOYEE_INFORMATION_FIELDS]
+            + [f"bank_account_{field}" for field in BANK_ACCOUNT_FIELDS]
+            + ['emergency_contacts'])
+
+
+# A cell starting with one of these is a formula in Excel and LibreOffice
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    """
+    The value as a CSV cell, text that a spreadsheet would run as a formula prefixed with '.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_row(record):
+    """
+    Flat CSV row of a record; emergency contacts share one column, one "name, phone" pair per contact.
+    """
+    information = record['employee_information'] or {}
+    account = record['bank_account'] or {}
+    return [csv_cell(value) for value in (
+        [record[name] for name in PROFILE_COLUMNS]
+        + [information.get(field) for field in EMPLOYEE_INFORMATION_FIELDS]
+        + [account.get(field) for field in BANK_ACCOUNT_FIELDS]
+        + ["; ".join(f"{contact['name']}, {contact['phone_number']}" for contact in record['emergency_contacts'])]
+    )]
+
+
+class Echo:
+    """
+    File-like object that returns what is written, so csv.writer can produce one line at a time.
+    """
+    def write(self, value):
+        return value
+
+
+def export_csv(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the export as CSV lines, the header first.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(csv_header())
+    for profile in iter_profiles(batch_size):
+        yield writer.writerow(csv_row(profile_record(profile)))
+
+
+def export_jsonl(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the export as JSON Lines, one profile per line.
+    """
+    for profile in iter_profiles(batch_size):
+        yield json.dumps(profile_record(profile), ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (export_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
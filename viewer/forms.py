@@ -1,3 +1,4 @@
+from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 from django.forms import ModelForm, inlineformset_factory, BaseInlineFormSet
 from django import forms
@@ -98,6 +99,52 @@ class SearchForm(forms.Form):
     )
 
 
+class ReassignForm(forms.Form):
+    """
+    Choice of the user who takes over the selected contracts or subcontracts.
+    """
+    user = forms.ModelChoiceField(
+        queryset=get_user_model().objects.filter(is_active=True).order_by('username'),
+        label="Uživatel",
+    )
+
+
+class IdListField(forms.TypedMultipleChoiceField):
+    """
+    List of primary keys without a fixed set of choices; the bulk functions skip ids that don't exist.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(coerce=int, **kwargs)
+
+    def valid_value(self, value):
+        return True
+
+
+class BulkActionForm(ReassignForm):
+    """
+    Bulk status change or reassignment of the selected contracts or subcontracts.
+    The user is only required for reassignment.
+    """
+    ACTIONS = [
+        ('done', "Označit jako hotové"),
+        ('cancelled', "Zrušit"),
+        ('reassign', "Předat uživateli"),
+    ]
+    action = forms.ChoiceField(choices=ACTIONS, label="Akce")
+    selected = IdListField(label="Vybrané")
+    field_order = ['action', 'selected', 'user']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['user'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == 'reassign' and not cleaned_data.get('user'):
+            self.add_error('user', "Vyberte uživatele, kterému se záznamy předají.")
+        return cleaned_data
+
+
 class BankAccountForm(forms.ModelForm):
     account_number = forms.CharField(
         max_length=20,
@@ -214,6 +261,27 @@ EmergencyContactFormSet = inlineformset_factory(
     can_delete=True,  # Allows users to delete contacts
 )
 
+# Form sets of the employee profile page, built once at import instead of on every request.
+# A profile without contacts gets one blank form, otherwise only the existing contacts are shown.
+EmergencyContactAddFormSet = inlineformset_factory(
+    UserProfile,
+    EmergencyContact,
+    form=EmergencyContactForm,
+    formset=BaseEmergencyContactFormSet,
+    extra=1,
+    max_num=2,
+    can_delete=True,
+)
+EmergencyContactEditFormSet = inlineformset_factory(
+    UserProfile,
+    EmergencyContact,
+    form=EmergencyContactForm,
+    formset=BaseEmergencyContactFormSet,
+    extra=0,
+    max_num=2,
+    can_delete=True,
+)
+
 
 class EmployeeInformationForm(forms.ModelForm):
     permament_address = forms.CharField(
@@ -0,0 +1,160 @@
+"""
+Small database-backed job queue.
+
+Tasks are plain functions registered with @task and queued with enqueue(). Workers started by
+`manage.py runworker` claim jobs with a compare-and-set UPDATE, so several processes can share
+the queue on SQLite without an external broker.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import LOCK_RETRIES
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name=None, max_attempts=3):
+    """
+    Registers the decorated function as a task. The job payload is passed to it as keyword arguments
+    and the return value, which must be JSON serializable, is stored as the job result.
+    """
+    def register(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_after=None, max_attempts=None):
+    """
+    Queues a run of the task `name` and returns the Job.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown task {name!r}.")
+    return retry_locked(lambda: Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or TASKS[name].max_attempts,
+    ))
+
+
+def retry_locked(operation, attempts=5, delay=0.05):
+    """
+    Runs a database write, retrying it while SQLite reports "database is locked".
+    """
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except OperationalError as error:
+            if 'locked' not in str(error) or attempt == attempts - 1:
+                raise
+            LOCK_RETRIES.inc()
+            time.sleep(delay * 2 ** attempt)
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before retrying after `attempts` failed attempts: exponential, capped, with jitter.
+    """
+    base = getattr(settings, 'JOB_RETRY_BACKOFF', 10)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'JOB_RETRY_BACKOFF_MAX', 3600))
+    return delay + random.uniform(0, base)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim_next(worker):
+    """
+    Claims the oldest due job for `worker` and returns it, or None when the queue is empty.
+
+    The UPDATE only matches while the job is still queued, so when two workers race for the same row
+    exactly one of them updates it and the other one moves on to the next candidate.
+    """
+    while True:
+        now = timezone.now()
+        candidate = Job.objects.filter(status=JobStatus.QUEUED, run_after__lte=now) \
+            .order_by('run_after', 'id').values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+        claimed = retry_locked(lambda: Job.objects.filter(pk=candidate, status=JobStatus.QUEUED).update(
+            status=JobStatus.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1))
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records the result, or schedules a retry with backoff when attempts remain.
+    """
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.name!r}.")
+        result = func(**job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed, attempt %s of %s", job.pk, job.name, job.attempts, job.max_attempts)
+        job.error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = JobStatus.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = JobStatus.FAILED
+            job.finished_at = timezone.now()
+        retry_locked(lambda: job.save(update_fields=['status', 'run_after', 'error', 'finished_at']))
+        return False
+
+    job.status = JobStatus.DONE
+    job.result = result
+    job.finished_at = timezone.now()
+    retry_locked(lambda: job.save(update_fields=['status', 'result', 'finished_at']))
+    return True
+
+
+def requeue_stale(timeout=None):
+    """
+    Puts back jobs whose worker died while running them (running for longer than JOB_TIMEOUT seconds).
+    """
+    timeout = timeout or getattr(settings, 'JOB_TIMEOUT', 3600)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return retry_locked(lambda: Job.objects.filter(status=JobStatus.RUNNING, started_at__lt=cutoff)
+                        .update(status=JobStatus.QUEUED, run_after=timezone.now(), worker=''))
+
+
+def work(stop_event=None, poll_interval=1.0, once=False):
+    """
+    Worker loop: claims and runs jobs until `stop_event` is set. With `once` it returns as soon as
+    the queue has no due job. Returns the number of processed jobs.
+    """
+    worker = worker_name()
+    processed = 0
+    while stop_event is None or not stop_event.is_set():
+        job = claim_next(worker)
+        if job is None:
+            if once:
+                break
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, get_resolver, reverse
+
+from viewer.analytics import DIMENSIONS
+from viewer.api import RESOURCES
+from viewer.datagen import generate_dataset
+from viewer.exports import EXPORT_FORMATS
+from viewer.models import Contract, Customer, SubContract, Event, SnapshotScope
+from viewer.query_plans import explain, classify, table_statistics, estimate_query_rows, candidate_indexes
+
+
+# URLs whose GET changes the state of the session the advisor is using
+SKIPPED_URL_NAMES = {'logout'}
+
+
+class QueryRecorder:
+    """
+    Execute wrapper that records (sql, params, duration) of every statement.
+    """
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+
+class Command(BaseCommand):
+    help = ("Requests every URL from EmployeeHub/urls.py against a data snapshot, runs EXPLAIN QUERY PLAN "
+            "on every captured SELECT and reports full table scans, temporary B-tree sorts, estimated rows "
+            "and candidate indexes as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot', help="SQLite database file to analyse. It is copied, never modified. "
+                                               "Without it a dataset is generated in a test database.")
+        parser.add_argument('--contracts', type=int, default=2000,
+                            help="Number of generated contracts when no snapshot is given.")
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Scans and sorts of fewer estimated rows are reported but not flagged.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--fail-on-issues', action='store_true',
+                            help="Exit with an error when any query is flagged, for use as a merge gate.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        restore = self.open_snapshot(options['snapshot']) if options['snapshot'] else self.open_generated(options)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            statistics = table_statistics()
+            report = self.build_report(statistics, options['min_rows'])
+        finally:
+            restore()
+            teardown_test_environment()
+
+        if report['summary']['skipped_urls']:
+            self.stderr.write(f"Not requested, no sample value for their path parameters: "
+                              f"{', '.join(report['summary']['skipped_urls'])}")
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['fail_on_issues'] and report['summary']['flagged_queries']:
+            raise CommandError(f"{report['summary']['flagged_queries']} queries need an index, see the report.")
+
+    @staticmethod
+    def open_snapshot(path):
+        if not os.path.isfile(path):
+            raise CommandError(f"Snapshot {path} does not exist.")
+        directory = tempfile.mkdtemp()
+        copy = os.path.join(directory, 'snapshot.sqlite3')
+        shutil.copyfile(path, copy)
+        old_name = connection.settings_dict['NAME']
+        connection.close()
+        connection.settings_dict['NAME'] = copy
+        call_command('migrate', verbosity=0, interactive=False)
+
+        def restore():
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+            shutil.rmtree(directory, ignore_errors=True)
+        return restore
+
+    @staticmethod
+    def open_generated(options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        generate_dataset(contracts=options['contracts'], events=options['contracts'] // 2)
+        return lambda: connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def build_report(self, statistics, min_rows):
+        user, _ = get_user_model().objects.get_or_create(
+            username='index-advisor', defaults={'is_staff': True, 'is_superuser': True})
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        urls = []
+        flagged = 0
+        suggestions = {}
+        for name, path in self.iter_urls():
+            captured = []
+            with connection.execute_wrapper(QueryRecorder(captured)):
+                response = client.get(path)
+                if response.streaming:
+                    # The rows of a streamed response are read while it is consumed
+                    b''.join(response.streaming_content)
+            queries = self.analyse_queries(captured, statistics, min_rows)
+            for query in queries:
+                flagged += query['flagged']
+                for candidate in query['candidate_indexes']:
+                    key = (candidate['table'], tuple(candidate['columns']))
+                    suggestions.setdefault(key, set()).add(name)
+            urls.append({
+                'name': name,
+                'path': path,
+                'status': response.status_code,
+                'query_count': len(captured),
+                'repeated_queries': sum(query['count'] - 1 for query in queries),
+                'queries': queries,
+            })
+
+        return {
+            'database': connection.settings_dict['NAME'],
+            'tables': statistics['tables'],
+            'urls': urls,
+            'summary': {
+                'urls': len(urls),
+                # Named URLs with a path parameter the data gave no value for, not requested
+                'skipped_urls': sorted(self.skipped_urls),
+                'flagged_queries': flagged,
+                'full_scans': sum(len(q['full_scans']) for url in urls for q in url['queries'] if q['flagged']),
+                'temp_btrees': sum(len(q['temp_btrees']) for url in urls for q in url['queries'] if q['flagged']),
+                'candidate_indexes': [
+                    {'table': table, 'columns': list(columns), 'urls': sorted(names)}
+                    for (table, columns), names in sorted(suggestions.items())
+                ],
+            },
+        }
+
+    @staticmethod
+    def analyse_queries(captured_queries, statistics, min_rows):
+        """
+        Groups identical statements (N+1 queries show up as a high count) and explains each one once.
+        """
+        grouped = {}
+        for sql, params, duration in captured_queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            entry = grouped.setdefault(sql, {'count': 0, 'time': 0.0, 'params': params})
+            entry['count'] += 1
+            entry['time'] += duration
+
+        results = []
+        for sql, entry in grouped.items():
+            plan = explain(sql, entry['params'])
+            classified = classify(plan)
+            estimated_rows = estimate_query_rows(plan, statistics)
+            problems = classified['full_scans'] + classified['temp_btrees'] + classified['automatic_indexes']
+            results.append({
+                'sql': sql,
+                'count': entry['count'],
+                'time': round(entry['time'], 6),
+                'plan': [step['detail'] for step in plan],
+                'full_scans': classified['full_scans'],
+                'temp_btrees': classified['temp_btrees'],
+                'automatic_indexes': classified['automatic_indexes'],
+                'estimated_rows': estimated_rows,
+                'candidate_indexes': candidate_indexes(sql, plan) if problems else [],
+                'flagged': bool(problems) and estimated_rows >= min_rows,
+            })
+        return results
+
+    def iter_urls(self):
+        """
+        Yields (name, path) for every named top-level URL pattern, once per sample value of each path
+        parameter (every API resource, export format, ...). Patterns with a parameter that can't be filled
+        are collected in self.skipped_urls. Included URLconfs (the admin) are skipped.
+        """
+        self.skipped_urls = []
+        for pattern in get_resolver().url_patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIPPED_URL_NAMES:
+                continue
+            combinations = [{}]
+            for parameter in pattern.pattern.regex.groupindex:
+                combinations = [{**kwargs, parameter: value} for kwargs in combinations
+                                for value in self.sample_values(pattern, parameter, kwargs)]
+            if not combinations:
+                self.skipped_urls.append(pattern.name)
+            for kwargs in combinations:
+                yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+    @staticmethod
+    def sample_values(pattern, parameter, kwargs):
+        """
+        Values requested for a path parameter, given the parameters before it. Empty when the data has none.
+        """
+        def first_pk(model):
+            pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+            return [] if pk is None else [pk]
+
+        subcontract = SubContract.objects.order_by('pk').first()
+        if parameter == 'contract_pk':
+            return [subcontract.contract_id] if subcontract else []
+        if parameter == 'subcontract_number':
+            return [subcontract.subcontract_number] if subcontract else []
+        if parameter == 'event_id':
+            return first_pk(Event)
+        if parameter == 'param':
+            return first_pk(Contract)
+        if parameter == 'resource':
+            return list(RESOURCES)
+        if parameter == 'dimension':
+            return list(DIMENSIONS)
+        if parameter == 'export_format':
+            return list(EXPORT_FORMATS)
+        if parameter == 'scope':
+            return list(SnapshotScope.values)
+        if parameter == 'key':
+            return {SnapshotScope.TOTAL: [0], SnapshotScope.USER: first_pk(get_user_model()),
+                    SnapshotScope.CUSTOMER: first_pk(Customer)}[kwargs['scope']]
+        if parameter == 'pk':
+            if 'resource' in kwargs:
+                return first_pk(RESOURCES[kwargs['resource']].model)
+            if pattern.name == 'comment_add':
+                # The pk of the commented subcontract
+                return first_pk(SubContract)
+            model = getattr(getattr(pattern.callback, 'view_class', None), 'model', None)
+            return first_pk(model) if model is not None else []
+        return []
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.archive import archivable_contracts, archive_contracts, restore_contract
+from viewer.models import ArchivedContract
+
+
+class Command(BaseCommand):
+    help = ("Moves contracts finished or cancelled more than --days days ago, with their subcontracts and "
+            "comments, into the archive tables. Each batch is moved in its own transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 365),
+                            help="Archive contracts closed more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Contracts moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many contracts would be moved.")
+        parser.add_argument('--restore', type=int, nargs='+', metavar='CONTRACT_ID',
+                            help="Move these contracts back from the archive instead.")
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            return self.restore(options['restore'])
+
+        queryset = archivable_contracts(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} contracts would be archived.")
+            return
+
+        archived = 0
+        last_pk = None
+        while True:
+            # Keyset over the primary key, skipped contracts (reopened meanwhile) don't loop forever
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            ids = list(batch.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            archived += archive_contracts(ids)
+            last_pk = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} contracts."))
+
+    def restore(self, contract_ids):
+        archived_contracts = list(ArchivedContract.objects.filter(pk__in=contract_ids))
+        missing = set(contract_ids) - {contract.pk for contract in archived_contracts}
+        if missing:
+            raise CommandError(f"Contracts {', '.join(map(str, sorted(missing)))} are not in the archive.")
+        for archived_contract in archived_contracts:
+            restore_contract(archived_contract)
+        self.stdout.write(self.style.SUCCESS(f"Restored {len(archived_contracts)} contracts."))
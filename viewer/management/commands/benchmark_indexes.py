@@ -0,0 +1,107 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from viewer.datagen import generate_dataset
+from viewer.models import Contract, SubContract, Comment, Event, Customer
+from viewer.query_plans import explain_queryset, classify
+from viewer.views import today_bounds
+
+
+INDEXED_MODELS = (Contract, SubContract, Comment, Event, Customer)
+
+
+class Command(BaseCommand):
+    help = ("Generates a large dataset in a throw-away test database and compares query plans and timings "
+            "of the hot queries from viewer/views.py with and without the indexes declared in Meta.indexes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contracts', type=int, default=20000, help="Number of generated contracts.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query, the best time is reported.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            counts = generate_dataset(contracts=options['contracts'], events=options['contracts'] // 2)
+            user_id = (Contract.objects.values('user').annotate(n=Count('id')).order_by('-n')
+                       .values_list('user', flat=True)[0])
+            cases = self.get_cases(user_id)
+
+            self.analyze()
+            with_indexes = self.measure(cases, options['repeat'])
+            self.drop_indexes()
+            self.analyze()
+            without_indexes = self.measure(cases, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = [
+            {'query': label, 'with_indexes': with_indexes[label], 'without_indexes': without_indexes[label]}
+            for label in cases
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps({'dataset': counts, 'results': results}, indent=2))
+            return
+
+        self.stdout.write(f"Dataset: {counts}")
+        for result in results:
+            before, after = result['without_indexes'], result['with_indexes']
+            self.stdout.write(f"\n{result['query']}")
+            self.stdout.write(f"  without indexes: {before['ms']:9.2f} ms  {' | '.join(before['plan'])}")
+            self.stdout.write(f"  with indexes:    {after['ms']:9.2f} ms  {' | '.join(after['plan'])}")
+
+    @staticmethod
+    def get_cases(user_id):
+        """
+        The query shapes used by the views, keyed by a short description.
+        """
+        day_start, day_end = today_bounds()
+        return {
+            "HomepageView / ContractListView: user's active contracts by deadline":
+                lambda: Contract.objects.active().filter(user_id=user_id).order_by('deadline'),
+            "ContractAllListView: all contracts by deadline, first page":
+                lambda: Contract.objects.order_by('deadline')[:50],
+            "Active contracts by deadline":
+                lambda: Contract.objects.active().order_by('deadline')[:50],
+            "show_subcontracts: user's active subcontracts by contract deadline":
+                lambda: SubContract.objects.active().filter(user_id=user_id).select_related('contract')
+                .order_by('contract__deadline'),
+            "HomepageView: user's active subcontracts":
+                lambda: SubContract.objects.active().filter(user_id=user_id),
+            "HomepageView: latest comments":
+                lambda: Comment.objects.order_by('-created')[:5],
+            "HomepageView: today's events":
+                lambda: Event.objects.filter(start_time__lt=day_end, end_time__gte=day_start).order_by('start_time'),
+            "CustomerView: customers by name":
+                lambda: Customer.objects.order_by('last_name', 'first_name'),
+        }
+
+    @staticmethod
+    def measure(cases, repeat):
+        results = {}
+        for label, make_queryset in cases.items():
+            steps = explain_queryset(make_queryset())
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(make_queryset())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = {'ms': best * 1000, 'plan': [step['detail'] for step in steps], **classify(steps)}
+        return results
+
+    @staticmethod
+    def drop_indexes():
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.remove_index(model, index)
+
+    @staticmethod
+    def analyze():
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
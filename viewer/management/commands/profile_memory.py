@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from viewer.datagen import generate_dataset
+from viewer.memory_profile import body, format_size, measure
+
+# URL names of the views building the largest pages
+PROFILED_URL_NAMES = ['homepage', 'navbar_contracts_all', 'navbar_subcontracts']
+
+
+class Command(BaseCommand):
+    help = ("Generates a dataset in a test database, requests the heaviest views and prints the peak memory "
+            "tracemalloc measured for each of them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contracts', type=int, default=2000, help="Number of generated contracts.")
+        parser.add_argument('--stream', action='store_true',
+                            help="Also measure the lists with ?stream=1, see StreamingListMixin.")
+        parser.add_argument('--top', type=int, default=0, help="Allocation sites listed per view.")
+        parser.add_argument('--max-peak', type=float,
+                            help="Exit with an error when a view peaks above this many MiB, for use as a merge gate.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generate_dataset(contracts=options['contracts'], events=options['contracts'] // 2)
+            results = self.profile(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'view':<40} {'status':>6} {'bytes':>10} {'peak':>12} {'at the end':>12}")
+        for path, status, content, measurement in results:
+            self.stdout.write(f"{path:<40} {status:>6} {len(content):>10} {format_size(measurement.peak):>12} "
+                              f"{format_size(measurement.size):>12}")
+            for site, size, count in measurement.top:
+                self.stdout.write(f"{'':>4}{size / 1024:>10.1f} KiB {count:>8} blocks  {site}")
+
+        limit = options['max_peak']
+        over = [path for path, _, _, measurement in results if limit and measurement.peak > limit * 1024 * 1024]
+        if over:
+            raise CommandError(f"Peak memory above {limit} MiB: {', '.join(over)}")
+
+    def profile(self, options):
+        user, _ = get_user_model().objects.get_or_create(
+            username='memory-profiler', defaults={'is_staff': True, 'is_superuser': True})
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        paths = [reverse(name) for name in PROFILED_URL_NAMES]
+        if options['stream']:
+            paths += [f"{reverse(name)}?stream=1" for name in PROFILED_URL_NAMES if name != 'homepage']
+        results = []
+        for path in paths:
+            # The first request fills the template cache and the lazy imports, the second is measured
+            body(client.get(path))
+
+            def get():
+                response = client.get(path)
+                return response, body(response)
+            measurement = measure(get, limit=options['top'])
+            response, content = measurement.result
+            results.append((path, response.status_code, content, measurement))
+        return results
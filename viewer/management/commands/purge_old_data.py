@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.retention import POLICIES, active_policies, purge
+
+
+class Command(BaseCommand):
+    help = ("Deletes the rows older than their retention in RETENTION_DAYS (see viewer/retention.py) in small "
+            "batches, each in its own transaction, pausing between them so it can run while the server is used.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', metavar='POLICY',
+                            help=f"Only these policies: {', '.join(POLICIES)}. All configured ones by default.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.1, help="Seconds to sleep between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would be deleted.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['policies']) - set(POLICIES)
+        if unknown:
+            raise CommandError(f"Unknown policies {', '.join(sorted(unknown))}, choose from {', '.join(POLICIES)}.")
+        policies = active_policies(options['policies'])
+        if not policies:
+            self.stdout.write("No retention configured in RETENTION_DAYS.")
+            return
+
+        for policy in policies:
+            if options['dry_run']:
+                self.stdout.write(f"{policy.name}: {policy.queryset().count()} rows would be deleted, "
+                                  f"{policy.description} ({policy.days()} days).")
+                continue
+
+            def progress(deleted, total, name=policy.name):
+                self.stdout.write(f"{name}: {deleted}/{total}")
+            deleted = purge(policy, batch_size=options['batch_size'], pause=options['pause'], progress=progress)
+            self.stdout.write(self.style.SUCCESS(f"{policy.name}: deleted {deleted} rows."))
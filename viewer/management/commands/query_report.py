@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.query_log import flush, load_stats, reset
+
+
+class Command(BaseCommand):
+    help = ("Lists the SQL fingerprints with the most total time, added up from the statistics the server "
+            "processes write to QUERY_LOG_DIR (see viewer/query_log.py).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Number of fingerprints listed.")
+        parser.add_argument('--view', help="Only statements run by this view (URL name).")
+        parser.add_argument('--dir', help="Directory of the statistics, QUERY_LOG_DIR by default.")
+        parser.add_argument('--width', type=int, default=160, help="Fingerprints are cut to this length.")
+        parser.add_argument('--reset', action='store_true',
+                            help="Delete the statistics files instead, the counting starts over.")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'QUERY_LOG_DIR', None)
+        if not directory:
+            raise CommandError("Set QUERY_LOG_DIR or pass --dir.")
+        if options['reset']:
+            self.stdout.write(f"Deleted {reset(directory)} statistics files.")
+            return
+        flush(force=True)
+        stats = load_stats(directory)
+        if options['view']:
+            stats = {
+                statement: {**entry, 'total': entry['views'][options['view']], 'views': {options['view']: 0}}
+                for statement, entry in stats.items() if options['view'] in entry['views']
+            }
+        if not stats:
+            self.stdout.write("No statements recorded.")
+            return
+
+        top = sorted(stats.items(), key=lambda item: item[1]['total'], reverse=True)[:options['top']]
+        self.stdout.write(f"{'total s':>10} {'count':>8} {'avg ms':>9} {'max ms':>9}  views / fingerprint")
+        for statement, entry in top:
+            views = sorted(entry['views'], key=entry['views'].get, reverse=True)
+            self.stdout.write(
+                f"{entry['total']:>10.3f} {entry['count']:>8} {entry['total'] / entry['count'] * 1000:>9.2f} "
+                f"{entry['max'] * 1000:>9.2f}  {', '.join(views)}"
+            )
+            self.stdout.write(f"{'':>40}{statement[:options['width']]}")
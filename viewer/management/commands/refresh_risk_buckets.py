@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from viewer.caching import bump
+from viewer.models import Contract, SubContract
+
+
+class Command(BaseCommand):
+    help = ("Moves contracts and subcontracts in progress to the risk bucket of their deadline (overdue, "
+            "7 days, 14 days, later). Only rows whose bucket changed are written. Run it from cron, "
+            "at least once a day.")
+
+    def handle(self, *args, **options):
+        contracts = Contract.objects.update_risk_buckets('deadline')
+        subcontracts = SubContract.objects.update_risk_buckets('contract__deadline')
+        if contracts or subcontracts:
+            bump('contracts')
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated risk buckets of {contracts} contracts and {subcontracts} subcontracts."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from viewer.caching import bump
+from viewer.models import Contract
+
+
+class Command(BaseCommand):
+    help = "Recomputes the subcontract counters on Contract from the SubContract table and fixes any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Contracts checked per query.")
+        parser.add_argument('contract_ids', nargs='*', type=int, help="Only check these contracts.")
+
+    def handle(self, *args, **options):
+        repaired = Contract.refresh_subcontract_counters(
+            contract_ids=options['contract_ids'] or None,
+            batch_size=options['batch_size'],
+        )
+        if repaired:
+            bump('contracts')
+        self.stdout.write(self.style.SUCCESS(f"Repaired counters of {repaired} contracts."))
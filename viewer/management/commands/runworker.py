@@ -0,0 +1,84 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from viewer.jobs import work, requeue_stale
+
+
+def run_threads(threads, poll_interval, once, stop_event):
+    """
+    Runs `threads` worker loops in this process, each with its own database connection.
+    """
+    processed = []
+
+    def target():
+        try:
+            processed.append(work(stop_event, poll_interval=poll_interval, once=once))
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=target, daemon=True) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(processed)
+
+
+def run_process(threads, poll_interval, once):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+    run_threads(threads, poll_interval, once, stop_event)
+
+
+class Command(BaseCommand):
+    help = ("Runs background job workers: --processes processes with --threads threads each. "
+            "SIGTERM or Ctrl+C lets the running jobs finish and stops the workers.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes.")
+        parser.add_argument('--threads', type=int, default=1, help="Worker threads per process.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait before polling an empty queue again.")
+        parser.add_argument('--once', action='store_true',
+                            help="Process the jobs that are due and exit, e.g. when run from cron.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} jobs of dead workers.")
+
+        if options['processes'] <= 1:
+            stop_event = threading.Event()
+            if not options['once']:
+                signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+                signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+            if options['threads'] <= 1:
+                processed = work(stop_event, poll_interval=options['poll_interval'], once=options['once'])
+            else:
+                processed = run_threads(options['threads'], options['poll_interval'], options['once'], stop_event)
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
+            return
+
+        # Forked children must not share the parent's database connection
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_process,
+                                    args=(options['threads'], options['poll_interval'], options['once']))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from viewer.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = ("Writes today's status snapshot (contracts and subcontracts per status, in total, per user and "
+            "per customer) for the burndown and trend reports. Run it from cron once a day; running it again "
+            "on the same day replaces that day's rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help="Day to record the snapshot under (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        rows = take_snapshot(options['date'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} snapshot rows."))
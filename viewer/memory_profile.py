@@ -0,0 +1,117 @@
+"""
+Memory profiling of single requests with tracemalloc.
+
+A staff user adding ?profile_memory=1 to a URL gets, instead of the page, a plain text report of the
+request: the peak of the memory allocated while it was served and the source lines that allocated
+the most of what was still alive at its end. A streamed response is consumed inside the measurement,
+so its rows count too. tracemalloc is process wide, so one request is profiled at a time; the others
+are served normally meanwhile. `manage.py profile_memory` measures the heavy views the same way.
+"""
+import threading
+import tracemalloc
+
+from django.conf import settings
+from django.http import HttpResponse
+
+PROFILE_PARAMETER = 'profile_memory'
+
+profile_lock = threading.Lock()
+
+# Allocations made by the profiler itself and by imports are not interesting
+IGNORED_FILES = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+class Measurement:
+    def __init__(self, result, peak, size, top):
+        self.result = result
+        # Bytes: highest traced memory while running, memory still allocated at the end
+        self.peak = peak
+        self.size = size
+        # [(file:line, bytes, allocations)]
+        self.top = top
+
+
+def measure(func, limit=10):
+    """
+    Runs func() under tracemalloc and returns a Measurement with its result. Starts tracemalloc when
+    it isn't running and stops it again afterwards.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(getattr(settings, 'MEMORY_PROFILE_FRAMES', 1))
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(IGNORED_FILES)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(IGNORED_FILES)
+    finally:
+        if started:
+            tracemalloc.stop()
+    top = [
+        (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff, stat.count_diff)
+        for stat in after.compare_to(before, 'lineno')[:limit] if stat.size_diff > 0
+    ]
+    return Measurement(result, peak - baseline, current - baseline, top)
+
+
+def body(response):
+    """
+    The body of the response. Generating a streamed one is part of the work done after the view returns.
+    """
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.2f} MiB"
+
+
+def report(label, measurement):
+    lines = [
+        label,
+        f"peak: {format_size(measurement.peak)}",
+        f"still allocated at the end: {format_size(measurement.size)}",
+        "",
+        "top allocation sites:",
+    ]
+    for site, size, count in measurement.top:
+        lines.append(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {site}")
+    return "\n".join(lines) + "\n"
+
+
+class MemoryProfileMiddleware:
+    """
+    Serves ?profile_memory=1 of staff users with the memory report. Goes after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_PARAMETER not in request.GET or not request.user.is_staff:
+            return self.get_response(request)
+        if not profile_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Memory-Profile'] = 'busy'
+            return response
+        try:
+            measurement = measure(lambda: self.serve(request), limit=getattr(settings, 'MEMORY_PROFILE_TOP', 15))
+        finally:
+            profile_lock.release()
+        response, content = measurement.result
+        label = f"{request.method} {request.get_full_path()} -> {response.status_code}, {len(content)} bytes"
+        profile = HttpResponse(report(label, measurement), content_type='text/plain; charset=utf-8')
+        profile['X-Memory-Peak'] = str(measurement.peak)
+        return profile
+
+    def serve(self, request):
+        response = self.get_response(request)
+        return response, body(response)
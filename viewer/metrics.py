@@ -0,0 +1,378 @@
+"""
+Request, database and cache metrics in the Prometheus text exposition format (GET /metrics).
+
+Every thread writes to its own shard, a plain dict only that thread changes, so recording a sample
+takes no lock. The exposition sums the shards of the process. With several server processes, set
+METRICS_DIR to a directory they share: each process writes its totals there at most every
+METRICS_FLUSH_INTERVAL seconds (and whenever it serves /metrics), and /metrics adds up the files of
+all processes. Counters and histograms of processes that have exited are kept, gauges are dropped.
+"""
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+METRICS = {}
+
+# Seconds, the default buckets of the Prometheus client libraries
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class ShardOwner:
+    """
+    Lives as long as the thread its Shards belong to, see Shards.
+    """
+
+
+class Shards(threading.local):
+    """
+    Samples of the current thread: (metric name, labels) -> value, a histogram's value being the
+    per-bucket counts followed by the +Inf count and the sum. When the thread ends, its samples are
+    added to `retired` and its shard is dropped, so servers starting a thread per connection don't
+    collect shards without bound.
+    """
+    def __init__(self):
+        self.samples = {}
+        self.owner = ShardOwner()
+        with shards_lock:
+            all_shards.append(self.samples)
+        # The thread-local attributes, and so the owner, are released when the thread ends
+        weakref.finalize(self.owner, retire, self.samples)
+
+
+def retire(samples):
+    with shards_lock:
+        merge_samples(retired, samples)
+        all_shards.remove(samples)
+
+
+shards_lock = threading.Lock()
+all_shards = []
+# Samples of the threads that have ended
+retired = {}
+shards = Shards()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        METRICS[name] = self
+
+    def key(self, labels):
+        return self.name, tuple(str(labels.get(label, '')) for label in self.labels)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        samples = shards.samples
+        key = self.key(labels)
+        samples[key] = samples.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        samples = shards.samples
+        key = self.key(labels)
+        counts = samples.get(key)
+        if counts is None:
+            counts = samples[key] = [0] * (len(self.buckets) + 2)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            position = len(self.buckets)
+        counts[position] += 1
+        counts[-1] += value
+
+
+REQUESTS = Counter('employeehub_http_requests_total', "Finished requests.", ('view', 'method', 'status'))
+REQUEST_LATENCY = Histogram('employeehub_http_request_duration_seconds', "Time to produce the response.",
+                            ('view', 'method'))
+ACTIVE_REQUESTS = Gauge('employeehub_http_requests_active', "Requests being processed.")
+REQUEST_QUERIES = Histogram('employeehub_http_request_db_queries', "SQL queries per request.", ('view',),
+                            buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram('employeehub_http_request_db_seconds', "Time spent in SQL queries per request.",
+                            ('view',))
+TEMPLATE_RENDER = Histogram('employeehub_template_render_seconds', "Rendering time of template responses.",
+                            ('template',))
+CACHE_REQUESTS = Counter('employeehub_cache_requests_total', "Lookups of viewer.caching.cached().",
+                         ('namespace', 'result'))
+LOCK_RETRIES = Counter('employeehub_sqlite_lock_retries_total', "Writes retried after \"database is locked\".")
+
+
+def merge_samples(target, samples):
+    for key, value in samples.items():
+        if isinstance(value, list):
+            current = target.setdefault(key, [0] * len(value))
+            for position, number in enumerate(value):
+                current[position] += number
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def process_samples():
+    """
+    Totals of all threads of this process.
+    """
+    with shards_lock:
+        current = list(all_shards)
+        totals = {}
+        merge_samples(totals, retired)
+    for samples in current:
+        # dict() copies in one step, safe against the owning thread adding a key meanwhile
+        merge_samples(totals, {key: list(value) if isinstance(value, list) else value
+                               for key, value in dict(samples).items()})
+    return totals
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def process_file(directory, pid):
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+last_flush = 0.0
+flush_lock = threading.Lock()
+
+
+def flush(force=False):
+    """
+    Writes the totals of this process to METRICS_DIR, unless done less than METRICS_FLUSH_INTERVAL ago.
+    """
+    global last_flush
+    directory = metrics_dir()
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+    if not directory or (not force and time.monotonic() - last_flush < interval):
+        return
+    if not flush_lock.acquire(blocking=False):
+        return
+    try:
+        last_flush = time.monotonic()
+        samples = [[name, list(labels), value] for (name, labels), value in process_samples().items()]
+        os.makedirs(directory, exist_ok=True)
+        path = process_file(directory, os.getpid())
+        # Readers never see a half written file
+        with open(f"{path}.tmp", 'w') as file:
+            json.dump({'pid': os.getpid(), 'samples': samples}, file)
+        os.replace(f"{path}.tmp", path)
+    finally:
+        flush_lock.release()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """
+    Totals of this process, or of all processes writing to METRICS_DIR.
+    """
+    directory = metrics_dir()
+    if not directory:
+        return process_samples()
+    flush(force=True)
+    totals = {}
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith('metrics-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        alive = pid_alive(data['pid'])
+        samples = {}
+        for metric_name, labels, value in data['samples']:
+            metric = METRICS.get(metric_name)
+            if metric is None or (metric.kind == 'gauge' and not alive):
+                continue
+            samples[(metric_name, tuple(labels))] = value
+        merge_samples(totals, samples)
+    return totals
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [(name, value) for name, value in zip(names, values)] + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(samples=None):
+    """
+    The samples in the Prometheus text format.
+    """
+    samples = collect() if samples is None else samples
+    by_metric = {}
+    for (name, labels), value in samples.items():
+        by_metric.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, metric in METRICS.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(by_metric.get(name, [])):
+            if metric.kind != 'histogram':
+                lines.append(f"{name}{format_labels(metric.labels, labels)} {format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), value):
+                cumulative += count
+                le = bound if bound == '+Inf' else format_number(float(bound))
+                lines.append(f"{name}_bucket{format_labels(metric.labels, labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(metric.labels, labels)} {format_number(float(value[-1]))}")
+            lines.append(f"{name}_count{format_labels(metric.labels, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class QueryTimer:
+    """
+    Execute wrapper counting the queries of a request and the time spent in them.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, SQL queries and template rendering time of every request, labelled with
+    the URL name of the view. Goes first in MIDDLEWARE, so the other middleware is timed too. A streamed
+    response is measured until its last chunk is generated.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ACTIVE_REQUESTS.inc()
+        timer = QueryTimer()
+        start = time.perf_counter()
+        response = None
+        try:
+            with self.timed(timer):
+                response = self.get_response(request)
+        finally:
+            if response is None or not response.streaming:
+                self.record(request, response, timer, start)
+        if response.streaming:
+            # The body of a streamed response is generated after the view returns, the request ends when
+            # the last chunk is sent
+            response.streaming_content = TimedStream(
+                response.streaming_content, timer, lambda: self.record(request, response, timer, start))
+        return response
+
+    @staticmethod
+    def timed(timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    @staticmethod
+    def record(request, response, timer, start):
+        view = view_label(request)
+        status = response.status_code if response is not None else 500
+        REQUEST_LATENCY.observe(time.perf_counter() - start, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=status)
+        REQUEST_QUERIES.observe(timer.count, view=view)
+        REQUEST_DB_TIME.observe(timer.duration, view=view)
+        ACTIVE_REQUESTS.dec()
+        flush()
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+        template = template_label(response.template_name)
+        response.add_post_render_callback(
+            lambda rendered: TEMPLATE_RENDER.observe(time.perf_counter() - start, template=template))
+        return response
+
+
+class TimedStream:
+    """
+    Iterates the body of a streamed response with the query timer installed, and calls finish() once
+    when it is exhausted or closed, also when the server closes it unread.
+    """
+    def __init__(self, content, timer, finish):
+        self.iterator = iter(content)
+        self.timer = timer
+        self.finish = finish
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            # The wrappers are removed between the chunks, the server runs other code meanwhile
+            with MetricsMiddleware.timed(self.timer):
+                return next(self.iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.finish()
+
+
+def view_label(request):
+    """
+    URL name of the matched view, never the path itself, which would make a label per object.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+def template_label(template_name):
+    if isinstance(template_name, (list, tuple)):
+        return template_name[0] if template_name else ''
+    return getattr(getattr(template_name, 'template', None), 'name', None) or str(template_name)
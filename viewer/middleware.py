@@ -0,0 +1,101 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+
+# ManifestStaticFilesStorage inserts a 12 character md5 fragment before the extension.
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def accepted_encodings(header):
+    """
+    Accept-Encoding as {coding: q-value}, e.g. "gzip, br;q=0" gives {'gzip': 1.0, 'br': 0.0}.
+    """
+    accepted = {}
+    for token in header.split(','):
+        coding, *parameters = [part.strip() for part in token.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serves collected static files from STATIC_ROOT.
+
+    Hashed file names are sent with far-future immutable cache headers, so browsers never ask for them
+    again, and the precompressed .br/.gz variant written by collectstatic is picked according to the
+    Accept-Encoding header. Requests for files that are not in STATIC_ROOT are passed through.
+    """
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and settings.STATIC_ROOT and \
+                request.path.startswith(settings.STATIC_URL):
+            response = self.serve(request, request.path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except ValueError:
+            return None
+        if not name or not os.path.isfile(path):
+            return None
+
+        served, encoding = self.variant(request, path)
+        # Every encoding is its own representation and needs its own ETag, otherwise a cache revalidating
+        # one of them could get a 304 for a body in an encoding its client didn't accept
+        stat = os.stat(served)
+        etag = '"%x-%x%s"' % (int(stat.st_mtime), stat.st_size, '-' + encoding if encoding else '')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(name)
+            response = FileResponse(open(served, 'rb'), filename=os.path.basename(name),
+                                    content_type=content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if HASHED_NAME_RE.search(name):
+            response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response['Cache-Control'] = 'public, max-age=%d' % getattr(settings, 'STATIC_MAX_AGE', 60)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def variant(self, request, path):
+        """
+        The file to send for the request's Accept-Encoding and its content coding, None when uncompressed.
+        """
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        candidates = [(encoding, suffix) for encoding, suffix in self.encodings
+                      if accepted.get(encoding, accepted.get('*', 0)) > 0]
+        # The highest q-value wins, br before gzip when they are equal
+        candidates.sort(key=lambda candidate: accepted.get(candidate[0], accepted.get('*', 0)), reverse=True)
+        for encoding, suffix in candidates:
+            if os.path.isfile(path + suffix):
+                return path + suffix, encoding
+        return path, None
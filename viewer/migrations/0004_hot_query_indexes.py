@@ -0,0 +1,45 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0003_alter_contract_deadline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['user', 'deadline'], name='contract_user_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['deadline'], name='contract_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('status', '0')), fields=['deadline'], name='contract_active_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['last_name', 'first_name'], name='customer_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_time', 'end_time'], name='event_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['group', 'start_time'], name='event_group_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcontract',
+            index=models.Index(condition=models.Q(('status', '0')), fields=['user'], name='subcontract_active_user_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:22
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    Contract = apps.get_model('viewer', 'Contract')
+    counters = {
+        'subcontracts_total': Count('subcontracts'),
+        'subcontracts_in_progress': Count('subcontracts', filter=Q(subcontracts__status='0')),
+        'subcontracts_done': Count('subcontracts', filter=Q(subcontracts__status='1')),
+        'subcontracts_cancelled': Count('subcontracts', filter=Q(subcontracts__status='2')),
+    }
+    contracts = list(Contract.objects.annotate(**{f'new_{field}': value for field, value in counters.items()}))
+    for contract in contracts:
+        for field in counters:
+            setattr(contract, field, getattr(contract, f'new_{field}'))
+    Contract.objects.bulk_update(contracts, list(counters), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='subcontracts_cancelled',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='subcontracts_done',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='subcontracts_in_progress',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='subcontracts_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def close_finished_contracts(apps, schema_editor):
+    # The real finishing date is unknown, count from now so nothing gets archived right after migrating
+    Contract = apps.get_model('viewer', 'Contract')
+    Contract.objects.filter(status__in=('1', '2'), closed_at__isnull=True).update(closed_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('viewer', '0005_contract_subcontract_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.CharField(max_length=200)),
+                ('created', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedContract',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('contract_name', models.CharField(max_length=100)),
+                ('created', models.DateTimeField()),
+                ('status', models.CharField(choices=[('0', 'V procesu'), ('1', 'Dokončeno'), ('2', 'Zrušeno')], max_length=64)),
+                ('deadline', models.DateTimeField()),
+                ('closed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedSubContract',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subcontract_name', models.CharField(max_length=128)),
+                ('created', models.DateTimeField()),
+                ('subcontract_number', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('0', 'V procesu'), ('1', 'Dokončeno'), ('2', 'Zrušeno')], max_length=64)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('closed_at__isnull', False)), fields=['closed_at'], name='contract_closed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedsubcontract',
+            name='contract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subcontracts', to='viewer.archivedcontract'),
+        ),
+        migrations.AddField(
+            model_name='archivedsubcontract',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcontract',
+            name='customer',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='viewer.customer'),
+        ),
+        migrations.AddField(
+            model_name='archivedcontract',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='subcontract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='viewer.archivedsubcontract'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcontract',
+            index=models.Index(fields=['-archived_at'], name='archivedcontract_archived_idx'),
+        ),
+        migrations.RunPython(close_finished_contracts, migrations.RunPython.noop),
+    ]
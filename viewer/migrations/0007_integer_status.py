@@ -0,0 +1,86 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:27
+
+from django.db import migrations, models
+
+
+STATUS_CHOICES = [(0, 'V procesu'), (1, 'Dokončeno'), (2, 'Zrušeno')]
+STATUS_MODELS = ('Contract', 'SubContract', 'ArchivedContract', 'ArchivedSubContract')
+
+
+def status_to_integer(apps, schema_editor):
+    # Anything but a valid code (e.g. the "('0', 'V procesu')" saved by the old tuple default) stays in progress
+    for model_name in STATUS_MODELS:
+        model = apps.get_model('viewer', model_name)
+        for code in ('1', '2'):
+            model.objects.filter(status=code).update(status_code=int(code))
+
+
+def status_to_string(apps, schema_editor):
+    for model_name in STATUS_MODELS:
+        model = apps.get_model('viewer', model_name)
+        for code in ('0', '1', '2'):
+            model.objects.filter(status_code=int(code)).update(status=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0006_contract_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contract',
+            name='contract_active_deadline_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='subcontract',
+            name='subcontract_active_user_idx',
+        ),
+    ] + [
+        migrations.AddField(
+            model_name=model_name.lower(),
+            name='status_code',
+            field=models.SmallIntegerField(choices=STATUS_CHOICES, default=0),
+        )
+        for model_name in STATUS_MODELS
+    ] + [
+        migrations.RunPython(status_to_integer, status_to_string),
+    ] + [
+        operation
+        for model_name in STATUS_MODELS
+        for operation in (
+            migrations.RemoveField(
+                model_name=model_name.lower(),
+                name='status',
+            ),
+            migrations.RenameField(
+                model_name=model_name.lower(),
+                old_name='status_code',
+                new_name='status',
+            ),
+        )
+    ] + [
+        migrations.AlterField(
+            model_name='archivedcontract',
+            name='status',
+            field=models.SmallIntegerField(choices=STATUS_CHOICES),
+        ),
+        migrations.AlterField(
+            model_name='archivedsubcontract',
+            name='status',
+            field=models.SmallIntegerField(choices=STATUS_CHOICES),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['deadline'], name='contract_active_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['user', 'deadline'], name='contract_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcontract',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['user'], name='subcontract_active_user_idx'),
+        ),
+    ]
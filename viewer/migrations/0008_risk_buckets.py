@@ -0,0 +1,57 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:29
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def risk_bucket_ranges(now):
+    # The thresholds of viewer.models.risk_bucket_ranges() when this migration was written:
+    # overdue, up to 7 days, up to 14 days, later
+    yield 0, None, now
+    yield 1, now, now + timedelta(days=8)
+    yield 2, now + timedelta(days=8), now + timedelta(days=15)
+    yield 3, now + timedelta(days=15), None
+
+
+def fill_risk_buckets(apps, schema_editor):
+    now = timezone.now()
+    for model_name, deadline_field in (('Contract', 'deadline'), ('SubContract', 'contract__deadline')):
+        model = apps.get_model('viewer', model_name)
+        for bucket, lower, upper in risk_bucket_ranges(now):
+            lookups = {}
+            if lower is not None:
+                lookups[f"{deadline_field}__gte"] = lower
+            if upper is not None:
+                lookups[f"{deadline_field}__lt"] = upper
+            model.objects.filter(status=0, **lookups).update(risk_bucket=bucket)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0007_integer_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='risk_bucket',
+            field=models.SmallIntegerField(blank=True, choices=[(0, 'Po termínu'), (1, 'Do 7 dní'), (2, 'Do 14 dní'), (3, 'Později')], editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='subcontract',
+            name='risk_bucket',
+            field=models.SmallIntegerField(blank=True, choices=[(0, 'Po termínu'), (1, 'Do 7 dní'), (2, 'Do 14 dní'), (3, 'Později')], editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('risk_bucket__isnull', False)), fields=['risk_bucket', 'deadline'], name='contract_risk_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcontract',
+            index=models.Index(condition=models.Q(('risk_bucket__isnull', False)), fields=['risk_bucket'], name='subcontract_risk_bucket_idx'),
+        ),
+        migrations.RunPython(fill_risk_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('scope', models.CharField(choices=[('total', 'Celkem'), ('user', 'Zaměstnanec'), ('customer', 'Zákazník')], max_length=8)),
+                ('key', models.BigIntegerField(default=0)),
+                ('contracts_open', models.PositiveIntegerField(default=0)),
+                ('contracts_done', models.PositiveIntegerField(default=0)),
+                ('contracts_cancelled', models.PositiveIntegerField(default=0)),
+                ('subcontracts_open', models.PositiveIntegerField(default=0)),
+                ('subcontracts_done', models.PositiveIntegerField(default=0)),
+                ('subcontracts_cancelled', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='statussnapshot',
+            constraint=models.UniqueConstraint(fields=('scope', 'key', 'date'), name='unique_status_snapshot'),
+        ),
+    ]
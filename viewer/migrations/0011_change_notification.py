@@ -0,0 +1,29 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0010_status_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=50)),
+                ('kind', models.CharField(max_length=20)),
+                ('action', models.CharField(choices=[('created', 'Vytvořeno'), ('updated', 'Upraveno'), ('deleted', 'Smazáno')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changenotification',
+            index=models.Index(fields=['created'], name='changenotification_created_idx'),
+        ),
+    ]
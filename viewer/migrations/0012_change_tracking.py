@@ -0,0 +1,45 @@
+# Generated by Django 4.1.1 on 2026-10-19 13:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_updated_at(apps, schema_editor):
+    # Rows written before the column existed were last known to change when they were created
+    for model_name in ('Contract', 'SubContract', 'Customer'):
+        apps.get_model('viewer', model_name).objects.update(updated_at=models.F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0011_change_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='subcontract',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
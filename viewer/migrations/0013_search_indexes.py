@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-19 14:36
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0012_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(django.db.models.functions.comparison.Collate('contract_name', 'NOCASE'), name='contract_name_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.comparison.Collate('last_name', 'NOCASE'), name='customer_last_name_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.comparison.Collate('first_name', 'NOCASE'), name='customer_first_name_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(django.db.models.functions.comparison.Collate('title', 'NOCASE'), name='event_title_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcontract',
+            index=models.Index(django.db.models.functions.comparison.Collate('subcontract_name', 'NOCASE'), name='subcontract_name_ci_idx'),
+        ),
+    ]
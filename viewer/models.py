@@ -1,10 +1,13 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta, date
 from django.contrib.auth.hashers import make_password, check_password
 from django.db.models import CharField, Model, ForeignKey, DateTimeField, DO_NOTHING, IntegerField, \
-    EmailField, UniqueConstraint, CASCADE, PROTECT, Max
+    EmailField, UniqueConstraint, CASCADE, PROTECT, Max, Index, Q, PositiveIntegerField, Count, SmallIntegerField, F
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Collate
 
 
 from django.forms import Form, PasswordInput
@@ -13,13 +16,130 @@ from django.utils import timezone
 User = get_user_model()
 
 
+class Status(models.IntegerChoices):
+    """
+    Status of contracts and subcontracts, stored as a small integer.
+    """
+    IN_PROGRESS = 0, "V procesu"
+    DONE = 1, "Dokončeno"
+    CANCELLED = 2, "Zrušeno"
+
+
+class RiskBucket(models.IntegerChoices):
+    """
+    How close the deadline of work in progress is, the same thresholds as delta() in the templates.
+    """
+    OVERDUE = 0, "Po termínu"
+    WEEK = 1, "Do 7 dní"
+    FORTNIGHT = 2, "Do 14 dní"
+    LATER = 3, "Později"
+
+
+# Buckets shown as at risk, and the row colour of each bucket
+AT_RISK_BUCKETS = (RiskBucket.OVERDUE, RiskBucket.WEEK, RiskBucket.FORTNIGHT)
+RISK_CSS_CLASSES = {
+    RiskBucket.OVERDUE: "table-danger",
+    RiskBucket.WEEK: "table-danger",
+    RiskBucket.FORTNIGHT: "table-warning",
+}
+
+
+def risk_bucket_ranges(now=None):
+    """
+    Yields (bucket, lower, upper) deadline ranges, lower inclusive and upper exclusive, None for an open end.
+    delta() rounds down to whole days, so "<= 7 days" means a deadline less than 8 days away.
+    """
+    now = now or timezone.now()
+    yield RiskBucket.OVERDUE, None, now
+    yield RiskBucket.WEEK, now, now + timedelta(days=8)
+    yield RiskBucket.FORTNIGHT, now + timedelta(days=8), now + timedelta(days=15)
+    yield RiskBucket.LATER, now + timedelta(days=15), None
+
+
+def risk_bucket_for(deadline, now=None):
+    for bucket, lower, upper in risk_bucket_ranges(now):
+        if (lower is None or deadline >= lower) and (upper is None or deadline < upper):
+            return bucket
+
+
+class TrackedQuerySet(models.QuerySet):
+    """
+    Keeps updated_at and the ChangeVersion of the table current for writes that bypass Model.save():
+    update(), bulk_update() and bulk_create(). Saves and deletes of single rows are tracked by viewer.signals.
+    """
+    def update(self, **kwargs):
+        if any(field.name == 'updated_at' for field in self.model._meta.concrete_fields):
+            kwargs.setdefault('updated_at', timezone.now())
+        updated = super().update(**kwargs)
+        if updated:
+            ChangeVersion.bump(self.model)
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            ChangeVersion.bump(self.model)
+        return objs
+
+    def delete(self):
+        # One bump per table for the whole cascade instead of one per deleted row
+        with ChangeVersion.deferred():
+            return super().delete()
+
+
+class StatusQuerySet(TrackedQuerySet):
+    """
+    Status filters shared by contracts and subcontracts. active() matches the partial "status = 0" indexes.
+    """
+    def active(self):
+        return self.filter(status=Status.IN_PROGRESS)
+
+    def done(self):
+        return self.filter(status=Status.DONE)
+
+    def cancelled(self):
+        return self.filter(status=Status.CANCELLED)
+
+    def finished(self):
+        return self.filter(status__in=(Status.DONE, Status.CANCELLED))
+
+    def at_risk(self):
+        return self.filter(risk_bucket__in=AT_RISK_BUCKETS)
+
+    def update_risk_buckets(self, deadline_field, now=None):
+        """
+        Moves the rows to the risk bucket of their deadline with one UPDATE per bucket, touching only
+        the rows whose bucket changed. Rows no longer in progress lose their bucket.
+        Returns the number of updated rows.
+        """
+        updated = self.exclude(status=Status.IN_PROGRESS).filter(risk_bucket__isnull=False).update(risk_bucket=None)
+        for bucket, lower, upper in risk_bucket_ranges(now):
+            lookups = {}
+            if lower is not None:
+                lookups[f"{deadline_field}__gte"] = lower
+            if upper is not None:
+                lookups[f"{deadline_field}__lt"] = upper
+            updated += self.active().filter(**lookups).exclude(risk_bucket=bucket).update(risk_bucket=bucket)
+        return updated
+
+
 class Customer(Model):
     first_name = CharField(max_length=50)
     last_name = CharField(max_length=50)
     created = DateTimeField(auto_now_add=True)
+    updated_at = DateTimeField(auto_now=True)
     phone_number = CharField(max_length=16, default="123456789")
     email_address = EmailField(max_length=128, default="jan@novak.cz")
 
+    objects = TrackedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            Index(fields=["last_name", "first_name"], name="customer_name_idx"),
+            # Admin prefix search: SQLite's LIKE ignores case, it can only use indexes collated NOCASE
+            Index(Collate("last_name", "NOCASE"), name="customer_last_name_ci_idx"),
+            Index(Collate("first_name", "NOCASE"), name="customer_first_name_ci_idx"),
+        ]
 
     def __str__(self):
         return f"Zákazník: {self.first_name} {self.last_name}"
@@ -28,17 +148,118 @@ class Customer(Model):
 class Contract(Model):
     contract_name = CharField(max_length=100)
     created = DateTimeField(auto_now_add=True)
+    # Also set by every QuerySet.update(), see TrackedQuerySet
+    updated_at = DateTimeField(auto_now=True)
     user = ForeignKey(User, on_delete=DO_NOTHING, default=1)
     customer = ForeignKey(Customer, on_delete=DO_NOTHING, default=1)
-    status_choices = [("0", "V procesu"), ("1", "Dokončeno"), ("2", "Zrušeno")]
-    status = CharField(max_length=64, choices=status_choices, default=status_choices[0])
+    status_choices = Status.choices
+    status = SmallIntegerField(choices=Status.choices, default=Status.IN_PROGRESS)
     deadline = DateTimeField(default=timezone.now() + timedelta(days=30))
 
+    # Subcontract rollups, maintained by viewer.signals and repaired by `manage.py repair_contract_counters`
+    subcontracts_total = PositiveIntegerField(default=0, editable=False)
+    subcontracts_in_progress = PositiveIntegerField(default=0, editable=False)
+    subcontracts_done = PositiveIntegerField(default=0, editable=False)
+    subcontracts_cancelled = PositiveIntegerField(default=0, editable=False)
+    # When the contract was finished or cancelled, contracts closed long ago are moved to the archive
+    closed_at = DateTimeField(null=True, blank=True, editable=False)
+    # RiskBucket of the deadline while in progress, kept current by `manage.py refresh_risk_buckets`
+    risk_bucket = SmallIntegerField(choices=RiskBucket.choices, null=True, blank=True, editable=False)
+
+    FINISHED_STATUSES = (Status.DONE, Status.CANCELLED)
+
+    # Subcontract status -> counter field
+    SUBCONTRACT_COUNTERS = {
+        Status.IN_PROGRESS: "subcontracts_in_progress",
+        Status.DONE: "subcontracts_done",
+        Status.CANCELLED: "subcontracts_cancelled",
+    }
+    COUNTER_FIELDS = ("subcontracts_total", *SUBCONTRACT_COUNTERS.values())
+
+    objects = StatusQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # "Moje projekty" and the homepage: contracts of one user ordered by deadline
+            Index(fields=["user", "deadline"], name="contract_user_deadline_idx"),
+            # "Všechny projekty" ordered by deadline
+            Index(fields=["deadline"], name="contract_deadline_idx"),
+            # Active work only, a fraction of the table once contracts get finished
+            Index(fields=["deadline"], condition=Q(status=Status.IN_PROGRESS), name="contract_active_deadline_idx"),
+            Index(fields=["user", "deadline"], condition=Q(status=Status.IN_PROGRESS),
+                  name="contract_active_user_idx"),
+            # Candidates for the archive
+            Index(fields=["closed_at"], condition=Q(closed_at__isnull=False), name="contract_closed_at_idx"),
+            # "Co hoří" page: at risk contracts by bucket and deadline
+            Index(fields=["risk_bucket", "deadline"], condition=Q(risk_bucket__isnull=False),
+                  name="contract_risk_bucket_idx"),
+            # Admin prefix search and autocomplete
+            Index(Collate("contract_name", "NOCASE"), name="contract_name_ci_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if int(self.status) in self.FINISHED_STATUSES:
+            if self.closed_at is None:
+                self.closed_at = timezone.now()
+        else:
+            self.closed_at = None
+        bucket = risk_bucket_for(self.deadline)
+        self.risk_bucket = bucket if int(self.status) == Status.IN_PROGRESS else None
+        adding = self._state.adding
+        if not adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # The counters in memory may be older than the row, the signals change it with F() updates
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        with transaction.atomic(), ChangeVersion.deferred():
+            super().save(*args, **kwargs)
+            if not adding:
+                # The subcontracts share the deadline of their contract
+                SubContract.objects.active().filter(contract=self).exclude(risk_bucket=bucket) \
+                    .update(risk_bucket=bucket)
+
+    @property
+    def risk_class(self):
+        return RISK_CSS_CLASSES.get(self.risk_bucket, "")
 
     def delta(self):
         current_date = timezone.now()
         return (self.deadline - current_date).days
 
+    @classmethod
+    def refresh_subcontract_counters(cls, contract_ids=None, batch_size=500):
+        """
+        Recomputes the subcontract counters from the SubContract table and saves the contracts whose
+        counters differ. Returns the number of repaired contracts.
+        """
+        counters = {'subcontracts_total': Count('subcontracts')}
+        for status, field in cls.SUBCONTRACT_COUNTERS.items():
+            counters[field] = Count('subcontracts', filter=Q(subcontracts__status=status))
+        queryset = cls.objects.all() if contract_ids is None else cls.objects.filter(pk__in=contract_ids)
+        fields = list(counters)
+        annotated = queryset.annotate(**{f"new_{field}": value for field, value in counters.items()}) \
+            .only('pk', *fields).order_by('pk')
+        repaired = 0
+        last_pk = 0
+        while True:
+            # Batches by primary key, SQLite doesn't like writes to a table while a cursor over it is open
+            batch = list(annotated.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for contract in batch:
+                if any(getattr(contract, field) != getattr(contract, f"new_{field}") for field in fields):
+                    for field in fields:
+                        setattr(contract, field, getattr(contract, f"new_{field}"))
+                    changed.append(contract)
+            if changed:
+                cls.objects.bulk_update(changed, fields)
+                repaired += len(changed)
+        return repaired
+
 
     def __str__(self):
         return f"Zakázka: {self.contract_name}"
@@ -47,16 +268,52 @@ class Contract(Model):
 class SubContract(Model):
     subcontract_name = CharField(max_length=128)
     created = DateTimeField(auto_now_add=True)
+    updated_at = DateTimeField(auto_now=True)
     user = ForeignKey(User, on_delete=DO_NOTHING, default=1)
     contract = ForeignKey(Contract, related_name='subcontracts', on_delete=PROTECT)
     subcontract_number = IntegerField(null=True, blank=True, default=1)
-    status_choices = [("0", "V procesu"), ("1", "Dokončeno"), ("2", "Zrušeno")]
-    status = CharField(max_length=64, choices=status_choices, default=status_choices[0])
+    status_choices = Status.choices
+    status = SmallIntegerField(choices=Status.choices, default=Status.IN_PROGRESS)
+    # RiskBucket of the contract deadline while in progress, see Contract.risk_bucket
+    risk_bucket = SmallIntegerField(choices=RiskBucket.choices, null=True, blank=True, editable=False)
 
     class Meta:
         constraints = [
             UniqueConstraint(fields=["contract", "subcontract_number"], name="unique_subcontract_per_contract")
         ]
+        indexes = [
+            Index(fields=["user"], condition=Q(status=Status.IN_PROGRESS), name="subcontract_active_user_idx"),
+            Index(fields=["risk_bucket"], condition=Q(risk_bucket__isnull=False), name="subcontract_risk_bucket_idx"),
+            # Admin prefix search and autocomplete
+            Index(Collate("subcontract_name", "NOCASE"), name="subcontract_name_ci_idx"),
+        ]
+
+    objects = StatusQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the contract counters were computed from, see viewer.signals
+        if 'contract_id' in instance.__dict__ and 'status' in instance.__dict__:
+            instance._counted_state = (instance.contract_id, instance.status)
+        return instance
+
+    def save(self, *args, **kwargs):
+        if int(self.status) == Status.IN_PROGRESS:
+            self.risk_bucket = risk_bucket_for(self.contract.deadline)
+        else:
+            self.risk_bucket = None
+        # The contract counters are updated in post_save, inside the same transaction
+        with transaction.atomic(), ChangeVersion.deferred():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(), ChangeVersion.deferred():
+            return super().delete(*args, **kwargs)
+
+    @property
+    def risk_class(self):
+        return RISK_CSS_CLASSES.get(self.risk_bucket, "")
 
     @property
     def delta(self):
@@ -71,7 +328,7 @@ class SubContract(Model):
         return (max_number or 0) + 1
 
     def __str__(self):
-        return f"Podprojekt: {self.subcontract_name} {self.contract.pk}-{self.subcontract_number}"
+        return f"Podprojekt: {self.subcontract_name} {self.contract_id}-{self.subcontract_number}"
 
 
 class Position(Model):
@@ -101,6 +358,23 @@ class UserProfile(models.Model):
     def check_security_answer(self, raw_answer):
         return check_password(raw_answer, self.security_answer)
 
+    @classmethod
+    def load_aggregate(cls, user):
+        """
+        Returns the profile of `user` (created when missing) with its position, security question,
+        employee information, bank account and emergency contacts loaded in two queries.
+        A missing employee information or bank account is cached too, so accessing it raises
+        DoesNotExist without another query.
+        """
+        queryset = cls.objects.select_related(
+            'position', 'security_question', 'employeeinformation', 'bankaccount',
+        ).prefetch_related('emergency_contacts')
+        profile = queryset.filter(user=user).first()
+        if profile is None:
+            cls.objects.get_or_create(user=user)
+            profile = queryset.get(user=user)
+        return profile
+
     def __str__(self):
         return f"{self.user.username} - {self.position.name if self.position else 'No position'} - {self.phone_number}"
 
@@ -111,6 +385,14 @@ class Comment(Model):
     subcontract = ForeignKey(SubContract, on_delete=CASCADE, default=1)
     created = DateTimeField(auto_now_add=True)
 
+    objects = TrackedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Latest comments on the homepage
+            Index(fields=["-created"], name="comment_created_idx"),
+        ]
+
     def __str__(self):
         return f"Komentář: {self.text}"
 
@@ -122,6 +404,15 @@ class Event(models.Model):
     end_time = models.DateTimeField()
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='events')
 
+    class Meta:
+        indexes = [
+            # Events overlapping a day: start_time < day end AND end_time >= day start
+            Index(fields=["start_time", "end_time"], name="event_start_end_idx"),
+            Index(fields=["group", "start_time"], name="event_group_start_idx"),
+            # Admin prefix search
+            Index(Collate("title", "NOCASE"), name="event_title_ci_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -184,3 +475,207 @@ class EmployeeInformation(models.Model):
     #         days = delta.days % 365
     #         return f"{years} let, {days} dní" if years else f"{days} dní"
     #     return None
+
+
+# Archive of finished contracts, see viewer/archive.py.
+# The rows keep their original primary keys, so a restored contract gets its old URL back.
+# Users and customers may be deleted after archiving, the nullable unconstrained keys keep the rows visible.
+class ArchivedContract(Model):
+    id = models.BigIntegerField(primary_key=True)
+    contract_name = CharField(max_length=100)
+    created = DateTimeField()
+    user = ForeignKey(User, on_delete=DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    customer = ForeignKey(Customer, on_delete=DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    status = SmallIntegerField(choices=Status.choices)
+    deadline = DateTimeField()
+    closed_at = DateTimeField()
+    archived_at = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=["-archived_at"], name="archivedcontract_archived_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archivovaná zakázka: {self.contract_name}"
+
+
+class ArchivedSubContract(Model):
+    id = models.BigIntegerField(primary_key=True)
+    subcontract_name = CharField(max_length=128)
+    created = DateTimeField()
+    user = ForeignKey(User, on_delete=DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    contract = ForeignKey(ArchivedContract, related_name='subcontracts', on_delete=CASCADE)
+    subcontract_number = IntegerField(null=True, blank=True)
+    status = SmallIntegerField(choices=Status.choices)
+
+    def __str__(self):
+        return f"Archivovaný podprojekt: {self.subcontract_name} {self.contract_id}-{self.subcontract_number}"
+
+
+class ArchivedComment(Model):
+    id = models.BigIntegerField(primary_key=True)
+    text = CharField(max_length=200)
+    subcontract = ForeignKey(ArchivedSubContract, related_name='comments', on_delete=CASCADE)
+    created = DateTimeField()
+
+    def __str__(self):
+        return f"Archivovaný komentář: {self.text}"
+
+
+class JobStatus(models.IntegerChoices):
+    QUEUED = 0, "Ve frontě"
+    RUNNING = 1, "Běží"
+    DONE = 2, "Hotovo"
+    FAILED = 3, "Selhalo"
+
+
+# Background job, see viewer/jobs.py and `manage.py runworker`
+class Job(Model):
+    name = CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = SmallIntegerField(choices=JobStatus.choices, default=JobStatus.QUEUED)
+    # Not picked up before this time, pushed back on every failed attempt
+    run_after = DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    worker = CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created = DateTimeField(auto_now_add=True)
+    started_at = DateTimeField(null=True, blank=True)
+    finished_at = DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The queue itself, what the workers poll
+            Index(fields=["run_after", "id"], condition=Q(status=JobStatus.QUEUED), name="job_queued_idx"),
+            Index(fields=["status", "-created"], name="job_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Úloha: {self.name} #{self.pk} ({self.get_status_display()})"
+
+
+class SnapshotScope(models.TextChoices):
+    TOTAL = "total", "Celkem"
+    USER = "user", "Zaměstnanec"
+    CUSTOMER = "customer", "Zákazník"
+
+
+# Daily aggregate of contract and subcontract statuses, written by viewer/snapshots.py.
+# key is the user or customer id, 0 for the TOTAL scope (NULL would not be unique).
+class StatusSnapshot(Model):
+    date = models.DateField()
+    scope = CharField(max_length=8, choices=SnapshotScope.choices)
+    key = models.BigIntegerField(default=0)
+    contracts_open = PositiveIntegerField(default=0)
+    contracts_done = PositiveIntegerField(default=0)
+    contracts_cancelled = PositiveIntegerField(default=0)
+    subcontracts_open = PositiveIntegerField(default=0)
+    subcontracts_done = PositiveIntegerField(default=0)
+    subcontracts_cancelled = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of the trend queries: one scope and key over a range of dates
+            UniqueConstraint(fields=["scope", "key", "date"], name="unique_status_snapshot"),
+        ]
+
+    def __str__(self):
+        return f"Snímek {self.date}: {self.scope} {self.key}"
+
+
+class ChangeAction(models.TextChoices):
+    CREATED = "created", "Vytvořeno"
+    UPDATED = "updated", "Upraveno"
+    DELETED = "deleted", "Smazáno"
+
+
+# Change pushed to open pages over server-sent events, written by viewer.signals and read by
+# viewer/notifications.py. topic is "calendar" or "subcontract:<id>", the id is the SSE event id.
+class ChangeNotification(Model):
+    topic = CharField(max_length=50)
+    kind = CharField(max_length=20)
+    action = CharField(max_length=10, choices=ChangeAction.choices)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict, blank=True)
+    created = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Retention purge
+            Index(fields=["created"], name="changenotification_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Změna {self.pk}: {self.kind} {self.object_id} ({self.action})"
+
+
+# Tables whose ChangeVersion bumps are being collected by ChangeVersion.deferred()
+deferred_versions = ContextVar('deferred_versions', default=None)
+
+
+# Version of a table, bumped by every write to it (viewer.signals, TrackedQuerySet).
+# The HTML views build their ETag and Last-Modified from these, see ConditionalGetMixin in viewer/views.py.
+class ChangeVersion(Model):
+    table = CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def label(model):
+        return model.lower() if isinstance(model, str) else model._meta.label_lower
+
+    @classmethod
+    def bump(cls, *models):
+        """
+        Increments the versions of `models` (model classes or "app.Model" labels) with one UPDATE.
+        """
+        labels = {cls.label(model) for model in models}
+        pending = deferred_versions.get()
+        if pending is not None:
+            pending.update(labels)
+            return
+        if not labels:
+            return
+        now = timezone.now()
+        if cls.objects.filter(table__in=labels).update(version=F('version') + 1, updated_at=now) < len(labels):
+            existing = set(cls.objects.filter(table__in=labels).values_list('table', flat=True))
+            for label in labels - existing:
+                cls.objects.get_or_create(table=label, defaults={'version': 1, 'updated_at': now})
+
+    @classmethod
+    @contextmanager
+    def deferred(cls):
+        """
+        Collects the bumps made inside the block and bumps each table once when it ends.
+        Nested blocks leave the bumping to the outermost one.
+        """
+        if deferred_versions.get() is not None:
+            yield
+            return
+        pending = set()
+        token = deferred_versions.set(pending)
+        try:
+            yield
+        finally:
+            deferred_versions.reset(token)
+        cls.bump(*pending)
+
+    @classmethod
+    def current(cls, models):
+        """
+        (label:version, updated_at) of `models` in the given order, version 0 for a table never written.
+        """
+        labels = [cls.label(model) for model in models]
+        rows = {table: (version, updated_at) for table, version, updated_at
+                in cls.objects.filter(table__in=labels).values_list('table', 'version', 'updated_at')}
+        state = []
+        for label in labels:
+            version, updated_at = rows.get(label, (0, None))
+            state.append((f"{label}:{version}", updated_at))
+        return state
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
@@ -0,0 +1,225 @@
+"""
+Server-sent events for calendar events and comments.
+
+viewer.signals writes a ChangeNotification row in the same transaction as every saved or deleted
+Event and Comment. The ASGI app in EmployeeHub/asgi.py routes SSE_PATH to sse_application(), which
+streams the notifications of the requested topics to the browser. One Broadcaster per process polls
+the table and fans the new rows out to all open streams, so a hundred open tabs cost one query per
+poll interval. A client that reconnects sends Last-Event-ID and gets the rows it missed.
+
+Under WSGI (runserver) there is no stream: the fallback view answers 204, which tells EventSource
+to stop reconnecting, and the pages keep working without live updates.
+"""
+import asyncio
+import json
+import logging
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http import HttpRequest
+
+from .models import ChangeNotification
+
+logger = logging.getLogger(__name__)
+
+SSE_PATH = '/events/stream/'
+CALENDAR_TOPIC = 'calendar'
+# Rows read per poll and replayed to a reconnecting client at most
+BACKLOG_LIMIT = 500
+
+
+def subcontract_topic(subcontract_id):
+    return f"subcontract:{subcontract_id}"
+
+
+def event_payload(event):
+    """
+    The event as served by events_feed, so the calendar can add it directly.
+    """
+    return {
+        'id': event.pk,
+        'title': event.title,
+        'start': event.start_time.isoformat(),
+        'end': event.end_time.isoformat(),
+        'extendedProps': {'group': event.group.name if event.group_id else 'No Group'},
+    }
+
+
+def comment_payload(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat() if comment.created else None,
+    }
+
+
+def notify(topic, kind, action, object_id, payload=None):
+    return ChangeNotification.objects.create(topic=topic, kind=kind, action=action, object_id=object_id,
+                                             payload=payload or {})
+
+
+def fetch_notifications(after_id, topics=None, limit=BACKLOG_LIMIT):
+    queryset = ChangeNotification.objects.filter(pk__gt=after_id)
+    if topics is not None:
+        queryset = queryset.filter(topic__in=topics)
+    return list(queryset.order_by('pk').values('id', 'topic', 'kind', 'action', 'object_id', 'payload')[:limit])
+
+
+def latest_notification_id():
+    return ChangeNotification.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def format_event(row):
+    data = json.dumps({'action': row['action'], 'id': row['object_id'], 'data': row['payload']})
+    return f"id: {row['id']}\nevent: {row['kind']}\ndata: {data}\n\n".encode()
+
+
+class Broadcaster:
+    """
+    Polls ChangeNotification while at least one stream is open and puts the new rows on the queue
+    of every stream subscribed to their topic.
+    """
+    def __init__(self):
+        self.subscribers = {}
+        self.last_id = None
+        self.task = None
+
+    async def subscribe(self, topics):
+        queue = asyncio.Queue(maxsize=BACKLOG_LIMIT)
+        if self.last_id is None:
+            self.last_id = await sync_to_async(latest_notification_id)()
+        self.subscribers[queue] = set(topics)
+        if self.task is None or self.task.done() or self.task.get_loop() is not asyncio.get_running_loop():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    async def run(self):
+        interval = getattr(settings, 'SSE_POLL_INTERVAL', 1.0)
+        try:
+            while self.subscribers:
+                try:
+                    rows = await sync_to_async(fetch_notifications)(self.last_id)
+                except Exception:
+                    logger.exception("Polling change notifications failed")
+                    rows = []
+                for row in rows:
+                    self.last_id = row['id']
+                    self.publish(row)
+                if len(rows) < BACKLOG_LIMIT:
+                    await asyncio.sleep(interval)
+        finally:
+            # Streams opened later start from the rows current at that time
+            self.last_id = None
+
+    def publish(self, row):
+        for queue, topics in list(self.subscribers.items()):
+            if row['topic'] in topics:
+                try:
+                    queue.put_nowait(row)
+                except asyncio.QueueFull:
+                    # A client this far behind reconnects and catches up from Last-Event-ID
+                    self.unsubscribe(queue)
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+
+
+broadcaster = Broadcaster()
+
+
+def authorize(cookie_header, topics):
+    """
+    The user of the session cookie if they may follow every topic, else None.
+    """
+    cookies = SimpleCookie()
+    cookies.load(cookie_header)
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user = get_user(request)
+    if not user.is_authenticated:
+        return None
+    for topic in topics:
+        if topic.startswith('subcontract:'):
+            if not user.has_perm('viewer.view_subcontract'):
+                return None
+        elif topic != CALENDAR_TOPIC:
+            return None
+    return user
+
+
+async def send_response(send, status, body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def sse_application(scope, receive, send):
+    """
+    ASGI app of SSE_PATH: ?topic=calendar&topic=subcontract:5 streams the changes of those topics.
+    """
+    params = parse_qs(scope.get('query_string', b'').decode())
+    topics = params.get('topic', [])
+    headers = dict(scope.get('headers', []))
+    if scope['method'] != 'GET' or not topics:
+        await send_response(send, 400, b'Expected GET with at least one topic')
+        return
+    user = await sync_to_async(authorize)(headers.get(b'cookie', b'').decode('latin-1'), topics)
+    if user is None:
+        await send_response(send, 403)
+        return
+    try:
+        last_id = int(headers.get(b'last-event-id', b'') or params.get('last_event_id', [''])[0] or -1)
+    except ValueError:
+        last_id = -1
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+    queue = await broadcaster.subscribe(topics)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        if last_id >= 0:
+            # Missed while reconnecting; the queue already collects what comes after
+            for row in await sync_to_async(fetch_notifications)(last_id, topics):
+                await send({'type': 'http.response.body', 'body': format_event(row), 'more_body': True})
+                last_id = row['id']
+        heartbeat = getattr(settings, 'SSE_HEARTBEAT', 15)
+        while not disconnected.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, pending = await asyncio.wait({getter, disconnected}, timeout=heartbeat,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            row = getter.result()
+            if row is None:
+                break
+            if row['id'] > last_id:
+                await send({'type': 'http.response.body', 'body': format_event(row), 'more_body': True})
+                last_id = row['id']
+        if not disconnected.done():
+            # Dropped for falling behind: end the response, the browser reconnects
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnected.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,65 @@
+"""
+Paginator for changelists of large tables.
+
+Counting every row of a table with millions of rows is often slower than fetching the page itself.
+For an unfiltered queryset the row count is read from the statistics the database keeps for the
+planner; a filtered queryset is counted exactly but only up to a cap, so the page links stop at the
+cap instead of scanning the whole table for the last page number.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def table_row_estimate(model, using='default'):
+    """
+    Planner's estimate of the number of rows of `model`'s table, or None when the database keeps none
+    (SQLite before the first ANALYZE, or an unsupported backend).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of a row counts the rows of its index, a partial index holds only part of
+            # the table, so the largest one is the table size
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat and stat.split()[0].isdigit()]
+            return max(counts) if counts else None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that was never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count is estimated for large tables, see the module docstring.
+
+    Below ESTIMATED_COUNT_THRESHOLD rows (10 000 by default) the exact count is cheap and used instead.
+    Filtered querysets are counted up to ESTIMATED_COUNT_LIMIT rows (100 000 by default).
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000)
+        if not queryset.query.where:
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate is not None and estimate > threshold:
+                return estimate
+            return queryset.count()
+        limit = getattr(settings, 'ESTIMATED_COUNT_LIMIT', 100000)
+        # COUNT(*) over a LIMITed subquery stops reading at the limit
+        return queryset.order_by().values('pk')[:limit].count()
@@ -0,0 +1,221 @@
+"""
+Slow-query log and per-statement statistics.
+
+An execute wrapper installed on every database connection fingerprints each statement: literals and
+placeholders become ?, IN lists collapse to IN (...) and whitespace is squeezed, so all runs of one
+query in the code share a fingerprint. Per fingerprint and view it counts the runs and the total and
+maximum time. Statements slower than SLOW_QUERY_THRESHOLD seconds also go to a rotating log,
+QUERY_LOG_DIR/slow.log, one JSON object per line.
+
+The statistics of each process are written to QUERY_LOG_DIR/stats-<pid>-<start time>.json at most every
+QUERY_STATS_FLUSH_INTERVAL seconds and when the process exits; `manage.py query_report` adds them up
+and `manage.py query_report --reset` deletes them.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+# URL name of the view being served, set by QueryLogMiddleware
+current_view = ContextVar('current_view', default=None)
+
+SAVEPOINT_RE = re.compile(r'\b(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) "[^"]+"', re.IGNORECASE)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"(?<![\w\".])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER_RE = re.compile(r"%s|\?")
+IN_LIST_RE = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+
+stats_lock = threading.Lock()
+# (fingerprint, view) -> [count, total seconds, max seconds]
+stats = {}
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    The statement with its literals normalised, e.g. WHERE "id" IN (?, ?, ?) AND "name" = 'x'
+    becomes WHERE "id" IN (...) AND "name" = ?.
+    """
+    sql = SAVEPOINT_RE.sub(r'\1 ?', sql)
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def record(statement, view, duration):
+    key = (statement, view)
+    with stats_lock:
+        entry = stats.get(key)
+        if entry is None:
+            stats[key] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+
+def log_dir():
+    return getattr(settings, 'QUERY_LOG_DIR', None)
+
+
+slow_logger = logging.getLogger('viewer.slow_queries')
+slow_logger.propagate = False
+slow_logger.setLevel(logging.INFO)
+
+
+def slow_log_handler():
+    """
+    The rotating handler of QUERY_LOG_DIR/slow.log, replaced when the setting changes.
+    """
+    directory = log_dir()
+    if not directory:
+        return None
+    path = os.path.abspath(os.path.join(directory, 'slow.log'))
+    for handler in slow_logger.handlers:
+        if handler.baseFilename == path:
+            return handler
+        slow_logger.removeHandler(handler)
+        handler.close()
+    os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024),
+                                  backupCount=getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 5), encoding='utf-8')
+    slow_logger.addHandler(handler)
+    return handler
+
+
+def log_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        statement = fingerprint(sql)
+        view = current_view.get() or 'other'
+        record(statement, view, duration)
+        if duration >= getattr(settings, 'SLOW_QUERY_THRESHOLD', 0.1) and slow_log_handler():
+            slow_logger.info(json.dumps({
+                'time': timezone.now().isoformat(), 'duration': round(duration, 6),
+                'view': view, 'fingerprint': statement,
+            }))
+
+
+def install(sender, connection, **kwargs):
+    # First in the list: execute_wrapper() blocks open at this moment remove their wrapper with pop()
+    if log_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_query)
+
+
+connection_created.connect(install, dispatch_uid='query_log_install')
+
+
+# A new process reusing the pid of an old one doesn't overwrite its statistics
+PROCESS_STARTED = int(time.time())
+
+
+def stats_file(directory, pid, started):
+    return os.path.join(directory, f"stats-{pid}-{started}.json")
+
+
+def stats_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.startswith('stats-') and name.endswith('.json')]
+
+
+last_flush = 0.0
+flush_lock = threading.Lock()
+
+
+def flush(force=False):
+    """
+    Writes the statistics of this process to QUERY_LOG_DIR, unless done less than
+    QUERY_STATS_FLUSH_INTERVAL seconds ago.
+    """
+    global last_flush
+    directory = log_dir()
+    interval = getattr(settings, 'QUERY_STATS_FLUSH_INTERVAL', 10)
+    if not directory or (not force and time.monotonic() - last_flush < interval):
+        return
+    if not flush_lock.acquire(blocking=False):
+        return
+    try:
+        last_flush = time.monotonic()
+        with stats_lock:
+            rows = [[statement, view, *entry] for (statement, view), entry in stats.items()]
+        os.makedirs(directory, exist_ok=True)
+        path = stats_file(directory, os.getpid(), PROCESS_STARTED)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump({'pid': os.getpid(), 'stats': rows}, file)
+        os.replace(f"{path}.tmp", path)
+    finally:
+        flush_lock.release()
+
+
+atexit.register(flush, force=True)
+
+
+def load_stats(directory):
+    """
+    Statistics of all processes in `directory` as {fingerprint: {'count', 'total', 'max', 'views'}},
+    'views' mapping each view to its share of the total time.
+    """
+    merged = {}
+    for path in stats_files(directory):
+        try:
+            with open(path, encoding='utf-8') as file:
+                rows = json.load(file)['stats']
+        except (OSError, ValueError, KeyError):
+            continue
+        for statement, view, count, total, longest in rows:
+            entry = merged.setdefault(statement, {'count': 0, 'total': 0.0, 'max': 0.0, 'views': {}})
+            entry['count'] += count
+            entry['total'] += total
+            entry['max'] = max(entry['max'], longest)
+            entry['views'][view] = entry['views'].get(view, 0.0) + total
+    return merged
+
+
+def reset(directory):
+    """
+    Deletes the statistics files in `directory` and the statistics of this process. Returns the number
+    of deleted files.
+    """
+    with stats_lock:
+        stats.clear()
+    files = stats_files(directory)
+    for path in files:
+        os.remove(path)
+    return len(files)
+
+
+class QueryLogMiddleware:
+    """
+    Labels the statements of a request with the URL name of its view and flushes the statistics.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+            flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
@@ -0,0 +1,157 @@
+import re
+
+from django.db import connections
+
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?(?P<rest>.*)$")
+SEARCH_RE = re.compile(r"^SEARCH (?:TABLE )?(?P<table>\w+)(?: AS \w+)?(?: USING (?P<index>.+))?$")
+TEMP_BTREE_RE = re.compile(r"^USE TEMP B-TREE FOR (?P<purpose>.+)$")
+
+
+def explain(sql, params=(), using='default'):
+    """
+    Runs EXPLAIN QUERY PLAN for an SQL statement and returns the plan as a list of
+    ``{'id', 'parent', 'detail'}`` dictionaries (SQLite only).
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [{'id': row[0], 'parent': row[1], 'detail': row[-1]} for row in cursor.fetchall()]
+
+
+def explain_queryset(queryset):
+    """
+    EXPLAIN QUERY PLAN for a queryset.
+    """
+    sql, params = queryset.query.sql_with_params()
+    return explain(sql, params, using=queryset.db)
+
+
+def classify(plan):
+    """
+    Sorts the plan steps into full table scans, index searches, temporary B-tree sorts and
+    automatic indexes (which SQLite builds for every run of the query when a join has no index).
+    A scan that walks an index (``SCAN t USING INDEX ...``) is not a full table scan.
+    """
+    result = {'full_scans': [], 'index_scans': [], 'searches': [], 'temp_btrees': [], 'automatic_indexes': []}
+    for step in plan:
+        detail = step['detail']
+        if 'AUTOMATIC' in detail:
+            match = SCAN_RE.match(detail) or SEARCH_RE.match(detail)
+            if match:
+                result['automatic_indexes'].append(match.group('table'))
+                continue
+        match = SCAN_RE.match(detail)
+        if match:
+            if 'USING' in match.group('rest'):
+                result['index_scans'].append(match.group('table'))
+            else:
+                result['full_scans'].append(match.group('table'))
+            continue
+        match = SEARCH_RE.match(detail)
+        if match:
+            result['searches'].append(match.group('table'))
+            continue
+        match = TEMP_BTREE_RE.match(detail)
+        if match:
+            result['temp_btrees'].append(match.group('purpose'))
+    return result
+
+
+INDEX_USE_RE = re.compile(r"USING (?:COVERING )?INDEX (?P<index>\w+)(?: \((?P<terms>.*)\))?")
+COLUMN_RE = re.compile(r'"(?P<table>\w+)"\."(?P<column>\w+)"')
+EQUALITY_RE = re.compile(r'"(?P<table>\w+)"\."(?P<column>\w+)" (?:= |IN \(|IS NULL)')
+RANGE_RE = re.compile(r'"(?P<table>\w+)"\."(?P<column>\w+)" (?:<|>|BETWEEN )')
+CLAUSE_END_RE = re.compile(r" (?:GROUP BY|HAVING|ORDER BY|LIMIT) ")
+
+
+def table_statistics(using='default'):
+    """
+    Reads sqlite_stat1 (filled by ANALYZE) into ``{'tables': {table: rows}, 'indexes': {index: [stat, ...]}}``.
+    An index stat list starts with the number of rows in the index followed by the average number of rows
+    matching the first 1, 2, ... columns.
+    """
+    statistics = {'tables': {}, 'indexes': {}}
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if not cursor.fetchone():
+            return statistics
+        cursor.execute("SELECT tbl, idx, stat FROM sqlite_stat1")
+        for table, index, stat in cursor.fetchall():
+            numbers = [int(part) for part in stat.split() if part.isdigit()]
+            if not numbers:
+                continue
+            if index is not None and index != table:
+                statistics['indexes'][index] = numbers
+            # Partial indexes hold only part of the table, the largest count is the table size
+            statistics['tables'][table] = max(statistics['tables'].get(table, 0), numbers[0])
+    return statistics
+
+
+def estimate_rows(step, statistics):
+    """
+    Rough number of rows a SCAN/SEARCH plan step visits, based on sqlite_stat1.
+    Returns None for steps that don't read a table.
+    """
+    detail = step['detail']
+    scan = SCAN_RE.match(detail)
+    search = SEARCH_RE.match(detail)
+    if not scan and not search:
+        return None
+    table = (scan or search).group('table')
+    table_rows = statistics['tables'].get(table, 0)
+    if 'INTEGER PRIMARY KEY (rowid=?)' in detail:
+        return 1
+    index_use = INDEX_USE_RE.search(detail)
+    index_stat = statistics['indexes'].get(index_use.group('index')) if index_use else None
+    if scan:
+        return index_stat[0] if index_stat else table_rows
+    terms = (index_use.group('terms') or '') if index_use else detail
+    equalities = terms.count('=?')
+    rows = table_rows
+    if index_stat:
+        rows = index_stat[min(equalities, len(index_stat) - 1)] if equalities else index_stat[0]
+    if '<' in terms or '>' in terms:
+        # The same guess SQLite makes for a range constraint without stat4
+        rows = max(rows // 4, 1)
+    return rows
+
+
+def estimate_query_rows(plan, statistics):
+    """
+    Multiplies the estimates of the top level plan steps, which SQLite runs as nested loops.
+    """
+    top_level = [step for step in plan if step['parent'] == 0]
+    total = None
+    for step in top_level:
+        rows = estimate_rows(step, statistics)
+        if rows is not None:
+            total = max(rows, 1) if total is None else total * max(rows, 1)
+    return total or 0
+
+
+def candidate_indexes(sql, plan):
+    """
+    Suggests indexes for fully scanned tables and ORDER BYs sorted in a temporary B-tree:
+    equality columns from the WHERE clause first, then range columns, then ORDER BY columns.
+    """
+    classified = classify(plan)
+    where = ''
+    if ' WHERE ' in sql:
+        where = CLAUSE_END_RE.split(sql.split(' WHERE ', 1)[1], maxsplit=1)[0]
+    order_by = sql.split(' ORDER BY ', 1)[1] if ' ORDER BY ' in sql else ''
+    order_by = re.split(r" LIMIT ", order_by, maxsplit=1)[0]
+
+    tables = classified['full_scans'] + classified['automatic_indexes']
+    if any('ORDER BY' in purpose for purpose in classified['temp_btrees']):
+        tables.extend(match.group('table') for match in COLUMN_RE.finditer(order_by))
+
+    candidates = []
+    for table in dict.fromkeys(tables):
+        columns = []
+        for regex, clause in ((EQUALITY_RE, where), (RANGE_RE, where), (COLUMN_RE, order_by)):
+            for match in regex.finditer(clause):
+                if match.group('table') == table and match.group('column') not in columns:
+                    columns.append(match.group('column'))
+        if columns:
+            candidates.append({'table': table, 'columns': columns})
+    return candidates
@@ -0,0 +1,96 @@
+"""
+Retention purge of rows nobody needs after a while, run by `manage.py purge_old_data`.
+
+Each policy names the rows of one model that expire, given a cutoff date. RETENTION_DAYS maps the
+policy names to their age in days; a policy missing there (or set to None) keeps its rows forever.
+The rows are deleted in small batches over a range of primary keys, each in its own short
+transaction, with a pause between the batches, so the SQLite write lock is never held for long and
+the server keeps answering while a purge runs.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import retry_locked
+from .models import ArchivedComment, ChangeNotification, Event, Job, JobStatus
+from .signals import suspend_notifications
+
+
+class Policy:
+    def __init__(self, name, model, expired, description):
+        self.name = name
+        self.model = model
+        # cutoff -> queryset of the expired rows
+        self.expired = expired
+        self.description = description
+
+    def days(self):
+        return getattr(settings, 'RETENTION_DAYS', {}).get(self.name)
+
+    def queryset(self, now=None):
+        cutoff = (now or timezone.now()) - timedelta(days=self.days())
+        return self.expired(cutoff)
+
+
+POLICIES = {policy.name: policy for policy in [
+    Policy('archived_comments', ArchivedComment,
+           lambda cutoff: ArchivedComment.objects.filter(subcontract__contract__archived_at__lt=cutoff),
+           "comments of contracts archived before the cutoff"),
+    Policy('events', Event,
+           # An event ends after it starts, the start_time condition lets event_start_end_idx narrow the scan
+           lambda cutoff: Event.objects.filter(start_time__lt=cutoff, end_time__lt=cutoff),
+           "calendar events that ended before the cutoff"),
+    Policy('change_notifications', ChangeNotification,
+           lambda cutoff: ChangeNotification.objects.filter(created__lt=cutoff),
+           "live update notifications created before the cutoff"),
+    Policy('finished_jobs', Job,
+           lambda cutoff: Job.objects.filter(status__in=[JobStatus.DONE, JobStatus.FAILED], finished_at__lt=cutoff),
+           "background jobs finished before the cutoff"),
+]}
+
+
+def active_policies(names=None):
+    """
+    The policies with a retention configured, all of them or the ones named.
+    """
+    policies = [POLICIES[name] for name in names] if names else list(POLICIES.values())
+    return [policy for policy in policies if policy.days() is not None]
+
+
+def delete_range(policy, first_pk, last_pk, now):
+    """
+    Deletes the expired rows with primary keys from first_pk to last_pk. The expiry condition is
+    checked again, a row changed since it was selected stays. Returns the number of deleted rows.
+    """
+    with transaction.atomic(), suspend_notifications():
+        queryset = policy.queryset(now).filter(pk__gte=first_pk, pk__lte=last_pk)
+        return queryset.delete()[1].get(policy.model._meta.label, 0)
+
+
+def purge(policy, batch_size=500, pause=0.1, progress=None, now=None):
+    """
+    Deletes the expired rows of the policy batch by batch. After every batch progress(deleted, total)
+    is called, if given, and the purge sleeps `pause` seconds to let other writers in.
+    Returns the number of deleted rows.
+    """
+    now = now or timezone.now()
+    expired = policy.queryset(now).order_by('pk')
+    total = expired.count()
+    deleted = 0
+    last_pk = None
+    while True:
+        # Keyset over the primary key, rows kept by delete_range() don't loop forever
+        batch = expired if last_pk is None else expired.filter(pk__gt=last_pk)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += retry_locked(lambda: delete_range(policy, ids[0], ids[-1], now))
+        last_pk = ids[-1]
+        if progress:
+            progress(deleted, total)
+        if pause:
+            time.sleep(pause)
+    return deleted
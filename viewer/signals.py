@@ -0,0 +1,175 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .caching import bump
+from .models import Contract, SubContract, Customer, Position, UserProfile, Event, Comment, ChangeAction, \
+    ChangeVersion
+from .notifications import CALENDAR_TOPIC, comment_payload, event_payload, notify, subcontract_topic
+
+
+counters_suspended = ContextVar('counters_suspended', default=False)
+notifications_suspended = ContextVar('notifications_suspended', default=False)
+
+
+@contextmanager
+def suspend_counter_updates():
+    """
+    Skips the per-row counter updates, for set-based operations that recount
+    (or delete) the affected contracts themselves.
+    """
+    token = counters_suspended.set(True)
+    try:
+        yield
+    finally:
+        counters_suspended.reset(token)
+
+
+@contextmanager
+def suspend_notifications():
+    """
+    Skips the change notifications, for rows that leave the live tables without anybody watching them
+    (e.g. when they are moved to the archive).
+    """
+    token = notifications_suspended.set(True)
+    try:
+        yield
+    finally:
+        notifications_suspended.reset(token)
+
+
+def counter_changes(state, sign):
+    """
+    Counter deltas for one subcontract state (contract_id, status) counted with `sign` (+1 or -1).
+    """
+    contract_id, status = state
+    changes = Counter({(contract_id, 'subcontracts_total'): sign})
+    field = Contract.SUBCONTRACT_COUNTERS.get(status)
+    if field:
+        changes[(contract_id, field)] += sign
+    return changes
+
+
+def apply_counter_changes(changes):
+    """
+    Applies the deltas with one UPDATE ... SET field = field + delta per contract.
+    """
+    per_contract = {}
+    for (contract_id, field), delta in changes.items():
+        if delta and contract_id is not None:
+            per_contract.setdefault(contract_id, {})[field] = F(field) + delta
+    for contract_id, updates in per_contract.items():
+        Contract.objects.filter(pk=contract_id).update(**updates)
+
+
+@receiver(post_save, sender=SubContract)
+def update_counters_on_subcontract_save(sender, instance, created, raw, **kwargs):
+    """
+    Moves the subcontract between the counters of its contract when it is created,
+    changes status or is moved to another contract.
+    """
+    if raw or counters_suspended.get():
+        return
+    new_state = (instance.contract_id, int(instance.status))
+    old_state = getattr(instance, '_counted_state', None)
+    if created:
+        apply_counter_changes(counter_changes(new_state, +1))
+    elif old_state is None:
+        # Saved without being loaded first, so the previous state is unknown
+        Contract.refresh_subcontract_counters(contract_ids=[instance.contract_id])
+    elif old_state != new_state:
+        changes = counter_changes(old_state, -1)
+        changes.update(counter_changes(new_state, +1))
+        apply_counter_changes(changes)
+    instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=SubContract)
+def update_counters_on_subcontract_delete(sender, instance, **kwargs):
+    if counters_suspended.get():
+        return
+    state = getattr(instance, '_counted_state', None) or (instance.contract_id, int(instance.status))
+    apply_counter_changes(counter_changes(state, -1))
+
+
+# Cache namespaces (see viewer.caching) invalidated when a model changes
+CACHE_NAMESPACES = {
+    Contract: ('contracts',),
+    SubContract: ('contracts',),
+    Customer: ('customers',),
+    Position: ('employees',),
+    UserProfile: ('employees',),
+    get_user_model(): ('employees',),
+}
+
+
+def invalidate_caches(sender, **kwargs):
+    bump(*CACHE_NAMESPACES[sender])
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(invalidate_caches, sender=model, dispatch_uid=f'invalidate_caches_save_{model.__name__}')
+    post_delete.connect(invalidate_caches, sender=model, dispatch_uid=f'invalidate_caches_delete_{model.__name__}')
+
+
+# Tables whose ChangeVersion (the ETag of the HTML pages, see ConditionalGetMixin) follows every
+# saved and deleted row; writes through QuerySet.update() and bulk_create() are bumped by TrackedQuerySet
+TRACKED_MODELS = [Contract, SubContract, Customer, Comment, Position, UserProfile, get_user_model()]
+
+
+def bump_change_version(sender, raw=False, **kwargs):
+    if not raw:
+        ChangeVersion.bump(sender)
+
+
+for model in TRACKED_MODELS:
+    post_save.connect(bump_change_version, sender=model, dispatch_uid=f'change_version_save_{model.__name__}')
+    post_delete.connect(bump_change_version, sender=model, dispatch_uid=f'change_version_delete_{model.__name__}')
+
+
+def bump_user_version(sender, action, **kwargs):
+    # Groups and permissions decide which links and buttons the pages show
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        ChangeVersion.bump(get_user_model())
+
+
+for through in (get_user_model().groups.through, get_user_model().user_permissions.through,
+                Group.permissions.through):
+    m2m_changed.connect(bump_user_version, sender=through, dispatch_uid=f'change_version_{through.__name__}')
+
+
+# Change notifications for the live pages, see viewer/notifications.py
+@receiver(post_save, sender=Event)
+def notify_event_saved(sender, instance, created, raw, **kwargs):
+    if raw or notifications_suspended.get():
+        return
+    notify(CALENDAR_TOPIC, 'event', ChangeAction.CREATED if created else ChangeAction.UPDATED, instance.pk,
+           event_payload(instance))
+
+
+@receiver(post_delete, sender=Event)
+def notify_event_deleted(sender, instance, **kwargs):
+    if notifications_suspended.get():
+        return
+    notify(CALENDAR_TOPIC, 'event', ChangeAction.DELETED, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def notify_comment_saved(sender, instance, created, raw, **kwargs):
+    if raw or notifications_suspended.get():
+        return
+    notify(subcontract_topic(instance.subcontract_id), 'comment',
+           ChangeAction.CREATED if created else ChangeAction.UPDATED, instance.pk, comment_payload(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def notify_comment_deleted(sender, instance, **kwargs):
+    if notifications_suspended.get():
+        return
+    notify(subcontract_topic(instance.subcontract_id), 'comment', ChangeAction.DELETED, instance.pk)
@@ -0,0 +1,81 @@
+"""
+Daily status snapshots for burndown and trend reports.
+
+take_snapshot() reads the live tables once a day with grouped queries and writes one StatusSnapshot
+row per scope; the reports only read StatusSnapshot.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import STATUS_KEYS, contract_rollup, status_counts, subcontract_rollup
+from .models import Contract, SubContract, StatusSnapshot, SnapshotScope
+
+COUNT_FIELDS = [f"{kind}_{name}" for kind in ('contracts', 'subcontracts') for name in STATUS_KEYS.values()]
+
+
+def snapshot_row(day, scope, key, contracts, subcontracts):
+    values = {f"contracts_{name}": contracts.get(name) or 0 for name in STATUS_KEYS.values()}
+    values.update({f"subcontracts_{name}": subcontracts.get(name) or 0 for name in STATUS_KEYS.values()})
+    return StatusSnapshot(date=day, scope=scope, key=key, **values)
+
+
+def take_snapshot(day=None, batch_size=1000):
+    """
+    Writes the snapshot rows of `day` (today by default), replacing the rows of an earlier run on the
+    same day. Returns the number of written rows.
+    """
+    day = day or timezone.localdate()
+    rows = [snapshot_row(
+        day, SnapshotScope.TOTAL, 0,
+        Contract.objects.aggregate(**status_counts()),
+        SubContract.objects.aggregate(**status_counts()),
+    )]
+
+    contracts = contract_rollup('user')
+    subcontracts = subcontract_rollup('user')
+    for user_id in contracts.keys() | subcontracts.keys():
+        rows.append(snapshot_row(day, SnapshotScope.USER, user_id,
+                                 contracts.get(user_id, {}), subcontracts.get(user_id, {})))
+
+    # Subcontracts per customer from the counters on Contract
+    for customer_id, row in contract_rollup('customer', with_subcontract_counters=True).items():
+        rows.append(snapshot_row(day, SnapshotScope.CUSTOMER, customer_id, row, {
+            'open': row['sub_open'], 'done': row['sub_done'], 'cancelled': row['sub_cancelled'],
+        }))
+
+    # A user or customer without contracts since the earlier run must not keep its old row
+    with transaction.atomic():
+        StatusSnapshot.objects.filter(date=day).delete()
+        StatusSnapshot.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def snapshot_series(scope, key, date_from, date_to):
+    """
+    Snapshot counts of one scope between two dates (inclusive), oldest first.
+    """
+    return list(StatusSnapshot.objects.filter(scope=scope, key=key, date__range=(date_from, date_to))
+                .order_by('date').values('date', *COUNT_FIELDS))
+
+
+def burndown(date_from, date_to):
+    """
+    Open contracts and subcontracts per day with the change against the previous snapshot.
+    """
+    series = snapshot_series(SnapshotScope.TOTAL, 0, date_from - timedelta(days=1), date_to)
+    result = []
+    previous = None
+    for row in series:
+        if row['date'] >= date_from:
+            result.append({
+                'date': row['date'],
+                'contracts_open': row['contracts_open'],
+                'subcontracts_open': row['subcontracts_open'],
+                'contracts_change': row['contracts_open'] - previous['contracts_open'] if previous else None,
+                'subcontracts_change':
+                    row['subcontracts_open'] - previous['subcontracts_open'] if previous else None,
+            })
+        previous = row
+    return result
@@ -1,7 +1,7 @@
 document.addEventListener('DOMContentLoaded', function() {
         var addButton = document.getElementById('add-contact-btn');
         var formContainer = document.getElementById('formset-container');
-        var prefix = '{{ emergency_contact_formset.prefix }}';
+        var prefix = formContainer.dataset.prefix;
 
         var totalForms = document.getElementById('id_' + prefix + '-TOTAL_FORMS');
         var maxForms = parseInt(document.getElementById('id_' + prefix + '-MAX_NUM_FORMS').value);
@@ -234,6 +234,19 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     calendar.render();
+
+    // Changes made by other users patch the calendar without refetching the feed
+    subscribeToChanges(['calendar'], {
+        event: function(change) {
+            var existing = calendar.getEventById(change.id);
+            if (existing) {
+                existing.remove();
+            }
+            if (change.action !== 'deleted') {
+                calendar.addEvent(change.data);
+            }
+        }
+    });
 });
 
 function getCookie(name) {
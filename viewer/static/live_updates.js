@@ -0,0 +1,19 @@
+// Subscribes to server-sent change notifications (viewer/notifications.py).
+// handlers maps a kind ('event', 'comment') to function(change), where change is
+// {action: 'created' | 'updated' | 'deleted', id: <object id>, data: <object as JSON>}.
+function subscribeToChanges(topics, handlers) {
+    if (!window.EventSource) {
+        return null;
+    }
+    var query = topics.map(function(topic) {
+        return 'topic=' + encodeURIComponent(topic);
+    }).join('&');
+    // The browser resends Last-Event-ID on reconnect and gets the missed changes
+    var source = new EventSource('/events/stream/?' + query);
+    Object.keys(handlers).forEach(function(kind) {
+        source.addEventListener(kind, function(message) {
+            handlers[kind](JSON.parse(message.data));
+        });
+    });
+    return source;
+}
@@ -0,0 +1,84 @@
+import gzip
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always written
+    brotli = None
+
+
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_WHITESPACE_RE = re.compile(r"\s+")
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{}:;,>])\s*")
+
+
+def minify_css(source):
+    """
+    Conservative CSS minifier: drops comments and collapses whitespace around punctuation.
+    """
+    source = CSS_COMMENT_RE.sub("", source)
+    source = CSS_WHITESPACE_RE.sub(" ", source)
+    source = CSS_PUNCTUATION_RE.sub(r"\1", source)
+    return source.replace(";}", "}").strip()
+
+
+class MinifyingStorage:
+    """
+    Source storage of collectstatic whose open() returns minified CSS.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def open(self, name, mode='rb'):
+        with self.storage.open(name, mode) as f:
+            return ContentFile(minify_css(f.read().decode('utf-8')).encode('utf-8'), name=name)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage (content hashes in file names) that also minifies CSS
+    and writes precompressed .gz (and .br when brotli is installed) variants
+    of every hashed text asset during collectstatic.
+
+    CSS is minified as it is read for hashing, so the hash in the file name
+    is the hash of the minified file that is served.
+    """
+    compress_extensions = ('.css', '.js', '.svg', '.ico', '.txt', '.json', '.map')
+    minimum_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        paths = {name: (MinifyingStorage(storage) if name.endswith('.css') else storage, path)
+                 for name, (storage, path) in paths.items()}
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if hashed_name.endswith(self.compress_extensions):
+                self._compress(hashed_name)
+
+    def _compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            content = f.read()
+        if len(content) < self.minimum_compress_size:
+            return
+        self._write_variant(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0), content)
+        if brotli is not None:
+            self._write_variant(path + '.br', brotli.compress(content), content)
+
+    @staticmethod
+    def _write_variant(path, compressed, original):
+        # A variant that isn't smaller than the original is never worth sending.
+        if len(compressed) >= len(original):
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path, 'wb') as f:
+            f.write(compressed)
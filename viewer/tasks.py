@@ -0,0 +1,58 @@
+"""
+Tasks runnable by the background workers, see viewer/jobs.py.
+"""
+from datetime import date
+
+from django.conf import settings
+
+from .analytics import DIMENSIONS, workload
+from .archive import archivable_contracts, archive_contracts as move_to_archive
+from .caching import bump
+from .jobs import task
+from .models import Contract, SubContract
+from .snapshots import take_snapshot
+
+
+@task()
+def refresh_risk_buckets():
+    result = {
+        'contracts': Contract.objects.update_risk_buckets('deadline'),
+        'subcontracts': SubContract.objects.update_risk_buckets('contract__deadline'),
+    }
+    if any(result.values()):
+        bump('contracts')
+    return result
+
+
+@task()
+def repair_contract_counters(contract_ids=None):
+    repaired = Contract.refresh_subcontract_counters(contract_ids=contract_ids)
+    if repaired:
+        bump('contracts')
+    return {'repaired': repaired}
+
+
+@task()
+def warm_analytics():
+    """
+    Computes the workload rollups ahead of the first dashboard request.
+    """
+    return {dimension: len(workload(dimension)) for dimension in DIMENSIONS}
+
+
+@task()
+def archive_contracts(days=None, batch_size=200):
+    days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365) if days is None else days
+    ids = list(archivable_contracts(days).values_list('pk', flat=True))
+    archived = 0
+    for start in range(0, len(ids), batch_size):
+        archived += move_to_archive(ids[start:start + batch_size])
+    return {'archived': archived}
+
+
+@task()
+def snapshot_statuses(day=None):
+    """
+    Daily status snapshot, `day` as an ISO date (today by default).
+    """
+    return {'rows': take_snapshot(date.fromisoformat(day) if day else None)}
@@ -0,0 +1,121 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from viewer.models import Contract, Customer, SubContract, Comment, Event, Position, UserProfile
+from viewer.pagination import EstimatedCountPaginator, table_row_estimate
+from viewer.query_plans import classify, explain_queryset
+
+
+class AdminChangelistQueryTest(TestCase):
+    """
+    Testuje, že počet dotazů v administraci nezávisí na počtu řádků.
+    """
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="heslo")
+        self.client.login(username="admin", password="heslo")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.add_rows(2)
+
+    def add_rows(self, count):
+        position = Position.objects.create(name=f"Pozice {Position.objects.count()}")
+        for _ in range(count):
+            user = User.objects.create(username=f"u{User.objects.count()}")
+            UserProfile.objects.create(user=user, position=position)
+            contract = Contract.objects.create(contract_name="Projekt", user=user, customer=self.customer)
+            subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=user, contract=contract)
+            Comment.objects.create(text="Komentář", subcontract=subcontract)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context.captured_queries)
+
+    def test_queries_constant(self):
+        for name in ['contract', 'subcontract', 'comment', 'userprofile']:
+            url = reverse(f'admin:viewer_{name}_changelist')
+            before = self.count_queries(url)
+            self.add_rows(5)
+            self.assertEqual(self.count_queries(url), before, name)
+
+    def test_search_and_autocomplete(self):
+        response = self.client.get(reverse('admin:viewer_contract_changelist'), {'q': "Proj"})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'viewer', 'model_name': 'subcontract', 'field_name': 'contract', 'term': "Proj",
+        })
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_search_uses_index(self):
+        # Hledání podle začátku textu (LIKE) musí použít indexy s porovnáním NOCASE, ne projít tabulku
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        for model in [Customer, Contract, SubContract, Comment, Event]:
+            model_admin = admin.site._registry[model]
+            for term in ["Proj", "12"]:
+                queryset, _ = model_admin.get_search_results(request, model.objects.order_by(), term)
+                if queryset.query.is_empty():
+                    continue
+                self.assertEqual(classify(explain_queryset(queryset))['full_scans'], [], (model, term))
+
+    def test_search_by_number(self):
+        contract = Contract.objects.first()
+        response = self.client.get(reverse('admin:viewer_contract_changelist'), {'q': str(contract.pk)})
+        self.assertEqual(list(response.context['cl'].result_list), [contract])
+        # Podprojekty se hledají i podle čísla zakázky, komentáře podle čísla podprojektu
+        response = self.client.get(reverse('admin:viewer_subcontract_changelist'), {'q': str(contract.pk)})
+        self.assertIn(contract.subcontracts.get(), response.context['cl'].result_list)
+        subcontract = contract.subcontracts.get()
+        response = self.client.get(reverse('admin:viewer_comment_changelist'), {'q': str(subcontract.pk)})
+        self.assertEqual([comment.subcontract_id for comment in response.context['cl'].result_list], [subcontract.pk])
+        response = self.client.get(reverse('admin:viewer_comment_changelist'), {'q': "Komentář"})
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """
+    Testuje odhadovaný počet řádků stránkovače.
+    """
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        user = User.objects.create(username="jan")
+        for number in range(5):
+            Contract.objects.create(contract_name=f"Projekt {number}", user=user, customer=customer)
+
+    def test_exact_below_threshold(self):
+        paginator = EstimatedCountPaginator(Contract.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_estimate_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        paginator = EstimatedCountPaginator(Contract.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 5)
+
+    def test_estimate_with_partial_index(self):
+        # Částečný index obsahuje jen jeden řádek, odhad se z něj brát nesmí
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE INDEX contract_partial_idx ON viewer_contract (contract_name) "
+                           "WHERE contract_name = 'Projekt 0'")
+            cursor.execute("ANALYZE")
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE idx = 'contract_partial_idx'")
+            self.assertEqual(cursor.fetchone()[0].split()[0], '1')
+        self.assertEqual(table_row_estimate(Contract), 5)
+
+    @override_settings(ESTIMATED_COUNT_LIMIT=3)
+    def test_filtered_count_capped(self):
+        queryset = Contract.objects.filter(contract_name__startswith="Projekt").order_by('pk')
+        paginator = EstimatedCountPaginator(queryset, 2)
+        self.assertEqual(paginator.count, 3)
+
+    def test_subcontract_str_without_query(self):
+        subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=User.objects.get(),
+                                                 contract=Contract.objects.first(), subcontract_number=4)
+        subcontract = SubContract.objects.get(pk=subcontract.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(subcontract), f"Podprojekt: Podprojekt {subcontract.contract_id}-4")
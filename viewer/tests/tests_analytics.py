@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.analytics import workload, workload_by_customer
+from viewer.caching import bump, cached
+from viewer.models import Contract, Customer, SubContract, Position, UserProfile, Status
+
+
+class WorkloadAnalyticsTest(TestCase):
+    """
+    Testuje přehledy vytížení podle zaměstnanců, zákazníků a pozic.
+    """
+    def setUp(self):
+        cache.clear()
+        position = Position.objects.create(name="Vývojář")
+        self.user = User.objects.create(username="jan", first_name="Jan", last_name="Novák")
+        UserProfile.objects.create(user=self.user, position=position)
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        soon = timezone.now() + timedelta(days=3)
+        self.open = Contract.objects.create(contract_name="Otevřený", user=self.user, customer=self.customer,
+                                            deadline=soon)
+        Contract.objects.create(contract_name="Hotový", user=self.user, customer=self.customer, status=Status.DONE)
+        SubContract.objects.create(subcontract_name="Podprojekt", user=self.user, contract=self.open,
+                                   subcontract_number=1)
+
+    def test_by_user(self):
+        row, = workload('user')
+        self.assertEqual(row['name'], "Jan Novák")
+        self.assertEqual(row['contracts'], {'open': 1, 'done': 1, 'cancelled': 0})
+        self.assertEqual(row['subcontracts'], {'open': 1, 'done': 0, 'cancelled': 0})
+        self.assertEqual(row['deadlines'], {'overdue': 0, 'week': 1, 'fortnight': 0, 'later': 0})
+
+    def test_by_customer_uses_counters(self):
+        """
+        Podprojekty zákazníků se berou z počítadel na projektu, stačí dva dotazy.
+        """
+        with self.assertNumQueries(2):
+            row, = workload_by_customer()
+        self.assertEqual(row['subcontracts'], {'open': 1, 'done': 0, 'cancelled': 0})
+
+    def test_by_position(self):
+        row, = workload('position')
+        self.assertEqual(row['name'], "Vývojář")
+        self.assertEqual(row['contracts']['open'], 1)
+
+    def test_cached_until_change(self):
+        workload('user')
+        with self.assertNumQueries(0):
+            workload('user')
+        # Změna projektu zneplatní uložené přehledy
+        self.open.status = Status.DONE
+        self.open.save()
+        row, = workload('user')
+        self.assertEqual(row['contracts'], {'open': 0, 'done': 2, 'cancelled': 0})
+
+    def test_api(self):
+        manager = User.objects.create_user(username="manager", password="heslo")
+        manager.user_permissions.add(Permission.objects.get(codename="view_contract"))
+        self.client.force_login(manager)
+        response = self.client.get(reverse('analytics_api', kwargs={'dimension': 'customer'}))
+        self.assertEqual(response.json()['results'][0]['name'], "Firma A")
+        response = self.client.get(reverse('analytics_api', kwargs={'dimension': 'neznámý'}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('analytics'))
+        self.assertContains(response, "Vývojář")
+
+
+class NamespaceCacheTest(TestCase):
+    """
+    Testuje verzované jmenné prostory cache.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_invalidates(self):
+        self.assertEqual(cached(('a', 'b'), 'klic', lambda: 1), 1)
+        self.assertEqual(cached(('a', 'b'), 'klic', lambda: 2), 1)
+        bump('b')
+        self.assertEqual(cached(('a', 'b'), 'klic', lambda: 3), 3)
+        self.assertEqual(cached(('a',), 'klic', lambda: 4), 4)
@@ -0,0 +1,174 @@
+import json
+
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.models import Contract, Customer, SubContract, Comment, Status
+
+
+class ApiTest(TestCase):
+    """
+    Testuje JSON API: stránkování kurzorem, výběr polí, ETagy a zápisy.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="api", password="heslo")
+        self.user.user_permissions.add(*Permission.objects.filter(content_type__app_label='viewer', codename__in=[
+            f"{action}_{model}" for action in ('view', 'add', 'change', 'delete')
+            for model in ('contract', 'subcontract', 'customer', 'comment')
+        ]))
+        self.client.login(username="api", password="heslo")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contracts = [
+            Contract.objects.create(contract_name=f"Projekt {number}", user=self.user, customer=self.customer)
+            for number in range(5)
+        ]
+
+    def get(self, url, **params):
+        return self.client.get(url, params)
+
+    def test_cursor_pagination(self):
+        url = reverse('api_list', args=['contracts'])
+        names = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.get(url, **params).json()
+            names += [row['contract_name'] for row in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(names, [f"Projekt {number}" for number in range(5)])
+
+    def test_sparse_fields_join_only_requested(self):
+        url = reverse('api_list', args=['contracts'])
+        with self.assertNumQueries(5):
+            data = self.get(url, fields='contract_name,customer.last_name').json()
+        self.assertEqual(data['results'][0], {'id': self.contracts[0].pk, 'contract_name': "Projekt 0",
+                                              'customer.last_name': "A"})
+        self.assertEqual(self.get(url, fields='heslo').status_code, 400)
+
+    def test_etag_not_modified(self):
+        url = reverse('api_detail', args=['contracts', self.contracts[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_create_update_delete(self):
+        url = reverse('api_list', args=['subcontracts'])
+        response = self.client.post(url, json.dumps({
+            'subcontract_name': "Nový", 'user': self.user.pk, 'contract': self.contracts[0].pk,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        subcontract = response.json()
+        self.assertEqual(subcontract['subcontract_number'], 1)
+        self.assertEqual(Contract.objects.get(pk=self.contracts[0].pk).subcontracts_in_progress, 1)
+
+        detail = reverse('api_detail', args=['subcontracts', subcontract['id']])
+        etag = self.client.get(detail)['ETag']
+        response = self.client.patch(detail, json.dumps({'status': Status.DONE}), content_type='application/json',
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.json()['status'], Status.DONE)
+        self.assertEqual(Contract.objects.get(pk=self.contracts[0].pk).subcontracts_done, 1)
+        # Zastaralý ETag odmítne zápis
+        response = self.client.patch(detail, json.dumps({'subcontract_name': "Jiný"}),
+                                     content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+        # Zakázku s podprojektem nelze smazat
+        response = self.client.delete(reverse('api_detail', args=['contracts', self.contracts[0].pk]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.delete(detail).status_code, 204)
+        self.assertFalse(SubContract.objects.exists())
+
+    def test_delete_referenced_customer(self):
+        # Zakázky odkazují na zákazníka přes DO_NOTHING, smazání se musí odmítnout a nic nesmazat
+        response = self.client.delete(reverse('api_detail', args=['customers', self.customer.pk]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['message'], "The row is still referenced")
+        self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+
+        customer = Customer.objects.create(first_name="Firma", last_name="B")
+        self.assertEqual(self.client.delete(reverse('api_detail', args=['customers', customer.pk])).status_code, 204)
+
+    def test_validation_errors(self):
+        url = reverse('api_list', args=['comments'])
+        response = self.client.post(url, json.dumps({'text': "x" * 300}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        response = self.client.post(url, json.dumps({'id': 1}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_permissions(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_list', args=['contracts'])).status_code, 401)
+        User.objects.create_user(username="host", password="heslo")
+        self.client.login(username="host", password="heslo")
+        self.assertEqual(self.client.get(reverse('api_list', args=['contracts'])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_list', args=['users'])).status_code, 404)
+
+
+class ApiBatchTest(TestCase):
+    """
+    Testuje dávkový endpoint: sloučení dotazů na související řádky do jednoho IN (...).
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="api", password="heslo")
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=[
+            'view_contract', 'view_subcontract', 'view_customer', 'view_comment', 'view_user', 'view_position',
+        ]))
+        self.client.login(username="api", password="heslo")
+        self.other = User.objects.create(username="petr")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contracts = []
+        for number in range(3):
+            contract = Contract.objects.create(contract_name=f"Projekt {number}", user=self.user,
+                                               customer=self.customer)
+            SubContract.objects.create(subcontract_name="Podprojekt", user=self.other, contract=contract,
+                                       subcontract_number=1)
+            self.contracts.append(contract)
+
+    def post(self, requests):
+        return self.client.post(reverse('api_batch'), json.dumps({'requests': requests}),
+                                content_type='application/json')
+
+    def test_related_rows_loaded_once(self):
+        requests = [
+            {'id': 'contracts', 'resource': 'contracts', 'include': ['user', 'customer']},
+            {'id': 'subcontracts', 'resource': 'subcontracts', 'include': ['contract.user.position', 'user']},
+            {'id': 'detail', 'resource': 'contracts', 'ids': [self.contracts[0].pk, self.contracts[1].pk]},
+            {'id': 'again', 'resource': 'contracts', 'include': ['user', 'customer']},
+        ]
+        # Session, uživatel, oprávnění (2), zakázky, podprojekty, zakázky podle id, uživatelé, zákazníci
+        with self.assertNumQueries(9):
+            data = self.post(requests).json()
+        responses = data['responses']
+        self.assertEqual(len(responses['contracts']['body']['results']), 3)
+        self.assertEqual(responses['again'], responses['contracts'])
+        self.assertEqual([row['id'] for row in responses['detail']['body']['results']],
+                         [self.contracts[0].pk, self.contracts[1].pk])
+        self.assertEqual(set(data['included']['users']), {str(self.user.pk), str(self.other.pk)})
+        self.assertEqual(data['included']['customers'][str(self.customer.pk)]['last_name'], "A")
+        self.assertIn('positions', data['included'])
+
+    def test_errors_per_request(self):
+        data = self.post([
+            {'id': 'ok', 'resource': 'customers'},
+            {'id': 'bad', 'resource': 'jobs'},
+            {'id': 'include', 'resource': 'comments', 'include': ['user']},
+            {'id': 'ids', 'resource': 'contracts', 'ids': str(self.contracts[0].pk)},
+            {'id': 'id_object', 'resource': 'contracts', 'ids': {str(self.contracts[0].pk): 1}},
+        ]).json()
+        self.assertEqual(data['responses']['ok']['status'], 200)
+        self.assertEqual(data['responses']['bad']['status'], 404)
+        self.assertEqual(data['responses']['include']['status'], 400)
+        # Řetězec ani objekt nejsou seznam id
+        self.assertEqual(data['responses']['ids']['status'], 400)
+        self.assertEqual(data['responses']['ids']['body']['message'], "Invalid ids")
+        self.assertEqual(data['responses']['id_object']['status'], 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_batch')).status_code, 405)
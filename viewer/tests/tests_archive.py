@@ -0,0 +1,121 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.archive import archive_contracts, restore_contract
+from viewer.models import Contract, Customer, SubContract, Comment, Status, ArchivedContract, ArchivedSubContract, \
+    ArchivedComment
+
+
+class ContractArchiveTest(TestCase):
+    """
+    Testuje přesun dokončených projektů do archivu a jejich obnovení.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="testuser")
+        self.customer = Customer.objects.create(first_name="Jan", last_name="Novák")
+        self.old = Contract.objects.create(contract_name="Starý", user=self.user, customer=self.customer,
+                                           status=Status.DONE)
+        self.recent = Contract.objects.create(contract_name="Nový", user=self.user, customer=self.customer,
+                                              status=Status.CANCELLED)
+        self.active = Contract.objects.create(contract_name="Aktivní", user=self.user, customer=self.customer,
+                                              status=Status.IN_PROGRESS)
+        # Projekt uzavřený před dvěma lety
+        Contract.objects.filter(pk=self.old.pk).update(closed_at=timezone.now() - timedelta(days=730))
+        self.subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=self.user,
+                                                      contract=self.old, subcontract_number=1, status=Status.DONE)
+        self.comment = Comment.objects.create(text="Hotovo", subcontract=self.subcontract)
+
+    def test_closed_at_follows_status(self):
+        """
+        Dokončení projektu nastaví datum uzavření, znovuotevření ho smaže.
+        """
+        self.assertIsNotNone(self.recent.closed_at)
+        self.assertIsNone(self.active.closed_at)
+        self.recent.status = Status.IN_PROGRESS
+        self.recent.save()
+        self.assertIsNone(self.recent.closed_at)
+
+    def test_command_archives_old_contracts(self):
+        call_command('archive_contracts', days=365, stdout=StringIO())
+
+        self.assertFalse(Contract.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(SubContract.objects.filter(pk=self.subcontract.pk).exists())
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+        self.assertTrue(Contract.objects.filter(pk=self.recent.pk).exists())
+        self.assertTrue(Contract.objects.filter(pk=self.active.pk).exists())
+
+        archived = ArchivedContract.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.contract_name, "Starý")
+        self.assertEqual(ArchivedSubContract.objects.get(pk=self.subcontract.pk).contract, archived)
+        self.assertEqual(ArchivedComment.objects.get(pk=self.comment.pk).text, "Hotovo")
+
+    def test_dry_run_moves_nothing(self):
+        call_command('archive_contracts', days=365, dry_run=True, stdout=StringIO())
+        self.assertTrue(Contract.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(ArchivedContract.objects.exists())
+
+    def test_active_contract_is_not_archived(self):
+        self.assertEqual(archive_contracts([self.active.pk]), 0)
+        self.assertTrue(Contract.objects.filter(pk=self.active.pk).exists())
+
+    def test_restore(self):
+        """
+        Obnovený projekt dostane zpět svá původní ID i počítadla podprojektů.
+        """
+        created = Contract.objects.get(pk=self.old.pk).created
+        archive_contracts([self.old.pk])
+        contract = restore_contract(ArchivedContract.objects.get(pk=self.old.pk))
+
+        self.assertEqual(contract.pk, self.old.pk)
+        self.assertEqual(contract.created, created)
+        self.assertEqual(contract.subcontracts_total, 1)
+        self.assertEqual(contract.subcontracts_done, 1)
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).subcontract_id, self.subcontract.pk)
+        self.assertFalse(ArchivedContract.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+        # Obnovený projekt se hned znovu nearchivuje
+        call_command('archive_contracts', days=365, stdout=StringIO())
+        self.assertTrue(Contract.objects.filter(pk=self.old.pk).exists())
+
+
+class ContractArchiveViewTest(TestCase):
+    """
+    Testuje prohlížení archivu a obnovení projektu přes webové rozhraní.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="heslo")
+        self.user.user_permissions.add(*Permission.objects.filter(
+            codename__in=["view_archivedcontract", "delete_archivedcontract", "add_contract", "view_contract"]))
+        self.client.force_login(self.user)
+        customer = Customer.objects.create(first_name="Jan", last_name="Novák")
+        contract = Contract.objects.create(contract_name="Archivní", user=self.user, customer=customer,
+                                           status=Status.DONE)
+        SubContract.objects.create(subcontract_name="Podprojekt", user=self.user, contract=contract,
+                                   subcontract_number=1, status=Status.DONE)
+        archive_contracts([contract.pk])
+        self.pk = contract.pk
+
+    def test_list_and_search(self):
+        response = self.client.get(reverse('archive_list'), {'query': 'Archiv'})
+        self.assertContains(response, "Archivní")
+        response = self.client.get(reverse('archive_list'), {'query': 'Jiný'})
+        self.assertNotContains(response, "Archivní")
+
+    def test_detail(self):
+        response = self.client.get(reverse('archive_detail', kwargs={'pk': self.pk}))
+        self.assertContains(response, "Podprojekt")
+
+    def test_restore_requires_post(self):
+        response = self.client.get(reverse('archive_restore', kwargs={'pk': self.pk}))
+        self.assertEqual(response.status_code, 405)
+
+    def test_restore(self):
+        response = self.client.post(reverse('archive_restore', kwargs={'pk': self.pk}))
+        self.assertRedirects(response, reverse('contract_detail', kwargs={'pk': self.pk}))
+        self.assertTrue(Contract.objects.filter(pk=self.pk).exists())
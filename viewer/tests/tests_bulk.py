@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.bulk import set_contract_status, set_subcontract_status, reassign_contracts, reassign_subcontracts
+from viewer.models import Contract, Customer, SubContract, Status, RiskBucket
+
+
+class BulkActionTest(TestCase):
+    """
+    Testuje hromadné změny stavu a předání zakázek a podprojektů.
+    """
+    def setUp(self):
+        self.owner = User.objects.create(username="jan")
+        self.other = User.objects.create(username="petr")
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contracts = [
+            Contract.objects.create(contract_name=f"Projekt {number}", user=self.owner, customer=customer,
+                                    deadline=timezone.now() + timedelta(days=3))
+            for number in range(3)
+        ]
+        for contract in self.contracts:
+            SubContract.objects.create(subcontract_name="Vlastní", user=self.owner, contract=contract,
+                                       subcontract_number=1)
+            SubContract.objects.create(subcontract_name="Cizí", user=self.other, contract=contract,
+                                       subcontract_number=2, status=Status.DONE)
+
+    def test_finish_contracts_cascades(self):
+        ids = [contract.pk for contract in self.contracts[:2]]
+        # Včetně jednoho zvýšení verzí tabulek pro celou operaci
+        with self.assertNumQueries(9):
+            self.assertEqual(set_contract_status(ids, Status.CANCELLED), 2)
+        contract = Contract.objects.get(pk=ids[0])
+        self.assertEqual(contract.status, Status.CANCELLED)
+        self.assertIsNotNone(contract.closed_at)
+        self.assertIsNone(contract.risk_bucket)
+        # Hotový podprojekt zůstává hotový, rozpracovaný se zruší
+        self.assertEqual((contract.subcontracts_in_progress, contract.subcontracts_done,
+                          contract.subcontracts_cancelled), (0, 1, 1))
+        self.assertFalse(SubContract.objects.active().filter(contract_id__in=ids).exists())
+        self.assertEqual(Contract.objects.get(pk=self.contracts[2].pk).status, Status.IN_PROGRESS)
+        # Opakované volání nic nemění
+        self.assertEqual(set_contract_status(ids, Status.CANCELLED), 0)
+
+    def test_reopen_restores_risk_bucket(self):
+        ids = [self.contracts[0].pk]
+        set_contract_status(ids, Status.DONE)
+        closed_at = Contract.objects.get(pk=ids[0]).closed_at
+        set_contract_status(ids, Status.CANCELLED)
+        self.assertEqual(Contract.objects.get(pk=ids[0]).closed_at, closed_at)
+        set_contract_status(ids, Status.IN_PROGRESS)
+        contract = Contract.objects.get(pk=ids[0])
+        self.assertIsNone(contract.closed_at)
+        self.assertEqual(contract.risk_bucket, RiskBucket.WEEK)
+
+    def test_subcontract_status_updates_counters(self):
+        subcontract = SubContract.objects.get(contract=self.contracts[0], subcontract_number=1)
+        self.assertEqual(set_subcontract_status([subcontract.pk], Status.DONE), 1)
+        contract = Contract.objects.get(pk=self.contracts[0].pk)
+        self.assertEqual((contract.subcontracts_in_progress, contract.subcontracts_done), (0, 2))
+        set_subcontract_status([subcontract.pk], Status.IN_PROGRESS)
+        self.assertEqual(SubContract.objects.get(pk=subcontract.pk).risk_bucket, RiskBucket.WEEK)
+
+    def test_reassign(self):
+        self.assertEqual(reassign_contracts([self.contracts[0].pk], self.other), 1)
+        self.assertEqual(Contract.objects.get(pk=self.contracts[0].pk).user, self.other)
+        # Otevřený podprojekt původního vlastníka jde se zakázkou
+        self.assertEqual(set(SubContract.objects.filter(contract=self.contracts[0]).values_list('user', flat=True)),
+                         {self.other.pk})
+        subcontract = SubContract.objects.get(contract=self.contracts[1], subcontract_number=2)
+        self.assertEqual(reassign_subcontracts([subcontract.pk], self.owner), 1)
+
+
+class BulkActionViewTest(TestCase):
+    """
+    Testuje hromadné akce z administrace a ze seznamu zakázek.
+    """
+    def setUp(self):
+        self.staff = User.objects.create_user(username="vedouci", password="heslo", is_staff=True)
+        self.staff.user_permissions.add(*Permission.objects.filter(codename__in=['change_contract', 'view_contract']))
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contract = Contract.objects.create(contract_name="Projekt", user=self.staff, customer=self.customer)
+        self.client.login(username="vedouci", password="heslo")
+
+    def test_staff_view(self):
+        response = self.client.get(reverse('navbar_contracts_all'))
+        self.assertContains(response, 'form="bulk-actions"')
+        response = self.client.post(reverse('contract_bulk_action'),
+                                    {'action': 'done', 'selected': [self.contract.pk]})
+        self.assertRedirects(response, reverse('navbar_contracts_all'))
+        self.assertEqual(Contract.objects.get().status, Status.DONE)
+
+    def test_staff_view_reassign_requires_user(self):
+        self.client.post(reverse('contract_bulk_action'), {'action': 'reassign', 'selected': [self.contract.pk]})
+        self.assertEqual(Contract.objects.get().user, self.staff)
+
+    def test_non_staff_forbidden(self):
+        self.staff.is_staff = False
+        self.staff.save()
+        response = self.client.post(reverse('contract_bulk_action'),
+                                    {'action': 'done', 'selected': [self.contract.pk]})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Contract.objects.get().status, Status.IN_PROGRESS)
+
+    def test_admin_reassign_action(self):
+        admin_user = User.objects.create_superuser(username="admin", password="heslo")
+        self.client.login(username="admin", password="heslo")
+        url = reverse('admin:viewer_contract_changelist')
+        data = {'action': 'reassign', ACTION_CHECKBOX_NAME: [self.contract.pk]}
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(response, 'admin/viewer/bulk_reassign.html')
+        response = self.client.post(url, {**data, 'apply': '1', 'user': admin_user.pk})
+        self.assertRedirects(response, url)
+        self.assertEqual(Contract.objects.get().user, admin_user)
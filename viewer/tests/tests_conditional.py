@@ -0,0 +1,128 @@
+from django.contrib.auth.models import Group, User, Permission
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.bulk import set_contract_status
+from viewer.models import Contract, Customer, SubContract, Comment, ChangeVersion, Status
+
+
+class ChangeTrackingTest(TestCase):
+    """
+    Testuje sloupce updated_at a verze tabulek.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="jan")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contract = Contract.objects.create(contract_name="Projekt", user=self.user, customer=self.customer)
+
+    def version(self, model):
+        return ChangeVersion.current([model])[0][0]
+
+    def test_update_sets_updated_at_and_bumps_version(self):
+        before = self.version(Contract)
+        updated_at = self.contract.updated_at
+        Contract.objects.filter(pk=self.contract.pk).update(contract_name="Nový název")
+        self.contract.refresh_from_db()
+        self.assertGreater(self.contract.updated_at, updated_at)
+        self.assertNotEqual(self.version(Contract), before)
+        # Update bez změněných řádků verzi nemění
+        version = self.version(Contract)
+        Contract.objects.filter(pk=0).update(contract_name="Nic")
+        self.assertEqual(self.version(Contract), version)
+
+    def test_bulk_operation_bumps_once(self):
+        SubContract.objects.create(subcontract_name="Podprojekt", user=self.user, contract=self.contract)
+        before = dict(ChangeVersion.objects.values_list('table', 'version'))
+        set_contract_status([self.contract.pk], Status.DONE)
+        after = dict(ChangeVersion.objects.values_list('table', 'version'))
+        self.assertEqual(after['viewer.contract'], before['viewer.contract'] + 1)
+        self.assertEqual(after['viewer.subcontract'], before['viewer.subcontract'] + 1)
+
+    def test_cascade_delete_bumps_once(self):
+        subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=self.user,
+                                                 contract=self.contract)
+        Comment.objects.create(text="A", subcontract=subcontract)
+        Comment.objects.create(text="B", subcontract=subcontract)
+        before = ChangeVersion.objects.get(table='viewer.comment').version
+        SubContract.objects.filter(pk=subcontract.pk).delete()
+        self.assertEqual(ChangeVersion.objects.get(table='viewer.comment').version, before + 1)
+
+
+class ConditionalGetTest(TestCase):
+    """
+    Testuje odpovědi 304 Not Modified stránek projektů a podprojektů.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="jan", password="heslo")
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=[
+            'view_contract', 'view_subcontract', 'view_customer',
+        ]))
+        self.client.login(username="jan", password="heslo")
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contract = Contract.objects.create(contract_name="Projekt", user=self.user, customer=customer)
+        self.subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=self.user,
+                                                      contract=self.contract, subcontract_number=1)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_contract_detail_not_modified(self):
+        url = reverse('contract_detail', kwargs={'pk': self.contract.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # Session, uživatel, 2x oprávnění, projekt s podprojekty, verze tabulek, bez vykreslení
+        with self.assertNumQueries(6):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        self.subcontract.subcontract_name = "Přejmenovaný"
+        self.subcontract.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, "Přejmenovaný")
+
+    def test_subcontract_detail_comment_invalidates(self):
+        url = reverse('subcontract_detail', kwargs={'contract_pk': self.contract.pk, 'subcontract_number': 1})
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Comment.objects.create(text="Nový komentář", subcontract=self.subcontract)
+        self.assertContains(self.revalidate(url, response), "Nový komentář")
+
+    def test_list_follows_table_version(self):
+        url = reverse('navbar_contracts_all')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        # Jiné vyhledávání je jiná stránka
+        self.assertEqual(self.client.get(url, {'query': "Projekt"}, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         200)
+        Contract.objects.filter(pk=self.contract.pk).update(contract_name="Přejmenovaný")
+        self.assertContains(self.revalidate(url, response), "Přejmenovaný")
+
+    def test_etag_is_per_user(self):
+        url = reverse('navbar_customers')
+        response = self.client.get(url)
+        other = User.objects.create_user(username="petr", password="heslo")
+        other.user_permissions.add(Permission.objects.get(codename='view_customer'))
+        self.client.login(username="petr", password="heslo")
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_user_changes_invalidate(self):
+        detail = reverse('subcontract_detail', kwargs={'contract_pk': self.contract.pk, 'subcontract_number': 1})
+        for url in (detail, reverse('navbar_customers')):
+            response = self.client.get(url)
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+            # Jméno v záhlaví stránky
+            self.user.username = f"jan-{url}"
+            self.user.save()
+            self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_group_permissions_invalidate(self):
+        group = Group.objects.create(name="Vedoucí")
+        self.user.groups.add(group)
+        url = reverse('navbar_customers')
+        response = self.client.get(url)
+        group.permissions.add(Permission.objects.get(codename='add_customer'))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_missing_contract_returns_404(self):
+        self.assertEqual(self.client.get(reverse('contract_detail', kwargs={'pk': 999})).status_code, 404)
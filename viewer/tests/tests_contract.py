@@ -1,6 +1,7 @@
 from django.test import TestCase
-from viewer.models import Contract, UserProfile, Customer
-from django.contrib.auth.models import User
+from viewer.models import Contract, UserProfile, Customer, SubContract, Position, Status
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
 
 
 # Unit TESTS
@@ -49,7 +50,7 @@ class ContractCrudTest(TestCase):
             user=self.user,
             customer=self.customer,
             contract_name= "Tasky",
-            status= "0"
+            status=Status.IN_PROGRESS
         )
 
 
@@ -62,7 +63,7 @@ class ContractCrudTest(TestCase):
             user=self.user,
             customer=self.customer,
             contract_name="Eshop",
-            status="0"
+            status=Status.IN_PROGRESS
         )
         self.assertEqual(Contract.objects.count(), 2)
         self.assertEqual(new_contract.contract_name, "Eshop")
@@ -71,7 +72,7 @@ class ContractCrudTest(TestCase):
     def test_read_contract(self):
         contract = Contract.objects.get(pk=self.contract.pk)
         self.assertEqual(contract.contract_name, "Tasky")
-        self.assertEqual(contract.status, "0")
+        self.assertEqual(contract.status, Status.IN_PROGRESS)
 
 
     def test_update_conract(self):
@@ -79,11 +80,11 @@ class ContractCrudTest(TestCase):
         Testovani uprav projektu.
         """
         self.contract.contract_name = "Test projekt"
-        self.contract.status = "1"
+        self.contract.status = Status.DONE
         self.contract.save()
         updated_contract = Contract.objects.get(pk=self.contract.pk)
         self.assertEqual(updated_contract.contract_name, "Test projekt")
-        self.assertEqual(updated_contract.status, "1")
+        self.assertEqual(updated_contract.status, Status.DONE)
 
 
     def test_delete_contract(self):
@@ -94,3 +95,140 @@ class ContractCrudTest(TestCase):
         self.contract.delete()
         with self.assertRaises(Contract.DoesNotExist):
             Contract.objects.get(pk=contract_id)
+
+
+class ContractStatusQuerySetTest(TestCase):
+    """
+    Testuje filtry stavů projektů a to, že "Moje projekty" ukazují jen rozpracované projekty.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="heslo")
+        self.user.user_permissions.add(Permission.objects.get(codename="view_contract"))
+        customer = Customer.objects.create(first_name="Franta", last_name="Pepa")
+        for name, status in (("Rozpracovaný", Status.IN_PROGRESS), ("Hotový", Status.DONE),
+                             ("Zrušený", Status.CANCELLED)):
+            Contract.objects.create(user=self.user, customer=customer, contract_name=name, status=status)
+
+    def test_querysets(self):
+        self.assertEqual(list(Contract.objects.active().values_list("contract_name", flat=True)), ["Rozpracovaný"])
+        self.assertEqual(list(Contract.objects.done().values_list("contract_name", flat=True)), ["Hotový"])
+        self.assertEqual(list(Contract.objects.cancelled().values_list("contract_name", flat=True)), ["Zrušený"])
+        self.assertEqual(Contract.objects.finished().count(), 2)
+
+    def test_my_contracts_show_only_active(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("navbar_contracts"))
+        self.assertContains(response, "Rozpracovaný")
+        self.assertNotContains(response, "Hotový")
+
+
+class ContractSubcontractCountersTest(TestCase):
+    """
+    Testuje průběžně udržovaná počítadla podprojektů na modelu Contract.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="testuser")
+        self.customer = Customer.objects.create(first_name="Franta", last_name="Pepa")
+        self.contract = Contract.objects.create(user=self.user, customer=self.customer, contract_name="Tasky")
+        self.other_contract = Contract.objects.create(user=self.user, customer=self.customer, contract_name="Eshop")
+
+    def create_subcontract(self, number, status=Status.IN_PROGRESS, contract=None):
+        return SubContract.objects.create(user=self.user, contract=contract or self.contract,
+                                          subcontract_name=f"Podprojekt {number}",
+                                          subcontract_number=number, status=status)
+
+    def assertCounters(self, contract, total, in_progress, done, cancelled):
+        contract.refresh_from_db()
+        self.assertEqual(
+            (contract.subcontracts_total, contract.subcontracts_in_progress,
+             contract.subcontracts_done, contract.subcontracts_cancelled),
+            (total, in_progress, done, cancelled),
+        )
+
+    def test_create_and_delete(self):
+        """
+        Vytvoření a smazání podprojektu upraví počítadla.
+        """
+        first = self.create_subcontract(1)
+        self.create_subcontract(2, status=Status.DONE)
+        self.assertCounters(self.contract, 2, 1, 1, 0)
+        first.delete()
+        self.assertCounters(self.contract, 1, 0, 1, 0)
+
+    def test_status_change(self):
+        """
+        Změna statusu přesune podprojekt mezi počítadly.
+        """
+        self.create_subcontract(1)
+        subcontract = SubContract.objects.get(contract=self.contract, subcontract_number=1)
+        subcontract.status = Status.CANCELLED
+        subcontract.save()
+        subcontract.save()
+        self.assertCounters(self.contract, 1, 0, 0, 1)
+
+    def test_move_to_other_contract(self):
+        """
+        Přesun podprojektu do jiného projektu upraví počítadla obou projektů.
+        """
+        subcontract = self.create_subcontract(1)
+        subcontract.contract = self.other_contract
+        subcontract.save()
+        self.assertCounters(self.contract, 0, 0, 0, 0)
+        self.assertCounters(self.other_contract, 1, 1, 0, 0)
+
+    def test_contract_save_keeps_counters(self):
+        """
+        Uložení projektu načteného před přidáním podprojektu nepřepíše počítadla starými hodnotami.
+        """
+        contract = Contract.objects.get(pk=self.contract.pk)
+        self.create_subcontract(1)
+        contract.contract_name = "Přejmenováno"
+        contract.save()
+        self.assertCounters(contract, 1, 1, 0, 0)
+        self.assertEqual(contract.contract_name, "Přejmenováno")
+
+    def test_refresh_repairs_drift(self):
+        """
+        Oprava počítadel přepočítá projekty, které nesedí.
+        """
+        self.create_subcontract(1)
+        Contract.objects.filter(pk=self.contract.pk).update(subcontracts_total=7)
+        self.assertEqual(Contract.refresh_subcontract_counters(), 1)
+        self.assertCounters(self.contract, 1, 1, 0, 0)
+
+
+class ContractDetailQueryBudgetTest(TestCase):
+    """
+    Detail projektu musí načíst projekt, uživatele, pozici i všechny podprojekty v pevném počtu dotazů.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.user.user_permissions.add(Permission.objects.get(codename='view_contract'))
+        position = Position.objects.create(name="Vývojář")
+        UserProfile.objects.create(user=self.user, position=position)
+        customer = Customer.objects.create(first_name="Franta", last_name="Pepa")
+        self.contract = Contract.objects.create(user=self.user, customer=customer, contract_name="Tasky")
+        self.client.login(username="testuser", password="password")
+
+    def add_subcontracts(self, count):
+        start = self.contract.subcontracts.count()
+        for number in range(start + 1, start + count + 1):
+            worker = User.objects.create(username=f"worker{number}")
+            SubContract.objects.create(user=worker, contract=self.contract,
+                                       subcontract_name=f"Podprojekt {number}", subcontract_number=number)
+
+    def test_query_budget(self):
+        """
+        Session, uživatel, 2x oprávnění, ETag (projekt a verze tabulek), projekt s uživatelem a pozicí,
+        podprojekty s uživateli.
+        """
+        url = reverse('contract_detail', kwargs={'pk': self.contract.pk})
+        self.add_subcontracts(1)
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertContains(response, "Vývojář")
+
+        self.add_subcontracts(20)
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertContains(response, "worker21")
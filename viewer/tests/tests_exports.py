@@ -0,0 +1,85 @@
+import csv
+import json
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.exports import export_csv, export_jsonl, iter_profiles
+from viewer.models import UserProfile, Position, EmployeeInformation, BankAccount, EmergencyContact
+
+
+class HrExportTest(TestCase):
+    """
+    Testuje streamovaný export HR dat zaměstnanců.
+    """
+    def setUp(self):
+        position = Position.objects.create(name="Vývojář")
+        for number in range(5):
+            user = User.objects.create(username=f"zamestnanec{number}", first_name="Jan", last_name=f"Novák{number}")
+            profile = UserProfile.objects.create(user=user, position=position if number % 2 else None)
+            if number != 3:
+                EmployeeInformation.objects.create(
+                    user_profile=profile, permament_address="Dlouhá", permament_descriptive_number="1",
+                    permament_postal_code="11000", city="Praha", phone_number="777000111",
+                    start_employee_contract=date(2024, 1, 1),
+                )
+                BankAccount.objects.create(user_profile=profile, account_number="123456", bank_code="0100")
+            for contact in range(2):
+                EmergencyContact.objects.create(
+                    user_profile=profile, name=f"Kontakt {contact}", address="Krátká", descriptive_number="2",
+                    postal_code="12000", city="Brno", phone_number=f"60000000{contact}",
+                )
+
+    def test_constant_queries_per_batch(self):
+        """
+        Každá dávka stojí dva dotazy (profily s JOINy + kontakty) a poslední neúplná dávka ukončí čtení.
+        """
+        with self.assertNumQueries(6):
+            self.assertEqual(len(list(iter_profiles(batch_size=2))), 5)
+
+    def test_jsonl(self):
+        records = [json.loads(line) for line in export_jsonl(batch_size=2)]
+        self.assertEqual([record['username'] for record in records], [f"zamestnanec{n}" for n in range(5)])
+        self.assertEqual(records[0]['employee_information']['start_employee_contract'], "2024-01-01")
+        self.assertEqual(len(records[0]['emergency_contacts']), 2)
+        # Zaměstnanec bez osobních údajů a účtu
+        self.assertIsNone(records[3]['employee_information'])
+        self.assertIsNone(records[3]['bank_account'])
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO("".join(export_csv()))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1]['position'], "Vývojář")
+        self.assertEqual(rows[0]['bank_account_account_number'], "123456")
+        self.assertEqual(rows[0]['emergency_contacts'], "Kontakt 0, 600000000; Kontakt 1, 600000001")
+
+    def test_csv_formulas_are_escaped(self):
+        """
+        Text, který by tabulkový procesor spustil jako vzorec, dostane na začátek apostrof.
+        """
+        User.objects.filter(username="zamestnanec0").update(first_name='=HYPERLINK("http://x")', last_name="-1+2")
+        EmergencyContact.objects.filter(name="Kontakt 0").update(name="@SUM(A1)")
+        row = next(csv.DictReader(StringIO("".join(export_csv()))))
+        self.assertTrue(row['first_name'].startswith("'=HYPERLINK"))
+        self.assertEqual(row['last_name'], "'-1+2")
+        self.assertTrue(row['emergency_contacts'].startswith("'@SUM(A1)"))
+        self.assertEqual(row['bank_account_account_number'], "123456")
+
+    def test_view_requires_permissions(self):
+        user = User.objects.create_user(username="hr", password="heslo")
+        self.client.login(username="hr", password="heslo")
+        self.assertEqual(self.client.get(reverse('hr_export', args=['csv'])).status_code, 403)
+
+        user.user_permissions.add(*Permission.objects.filter(codename__in=[
+            'view_userprofile', 'view_employeeinformation', 'view_bankaccount', 'view_emergencycontact',
+        ]))
+        response = self.client.get(reverse('hr_export', args=['jsonl']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(self.client.get(reverse('hr_export', args=['xml'])).status_code, 404)
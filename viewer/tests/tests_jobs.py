@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.jobs import task, enqueue, claim_next, run_job, work, requeue_stale, TASKS
+from viewer.models import Job, JobStatus
+
+
+calls = []
+
+
+@task(name="test_add")
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task(name="test_fail", max_attempts=2)
+def fail():
+    raise RuntimeError("Chyba")
+
+
+class JobQueueTest(TestCase):
+    """
+    Testuje frontu úloh na pozadí: zařazení, převzetí, opakování a dokončení.
+    """
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue("neexistuje")
+
+    def test_run(self):
+        job = enqueue("test_add", {"a": 1, "b": 2})
+        self.assertEqual(work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.DONE)
+        self.assertEqual(job.result, 3)
+        self.assertEqual(job.attempts, 1)
+
+    def test_claim_is_exclusive(self):
+        """
+        Úlohu převezme jen jeden worker.
+        """
+        enqueue("test_add", {"a": 1, "b": 2})
+        self.assertIsNotNone(claim_next("worker-1"))
+        self.assertIsNone(claim_next("worker-2"))
+
+    def test_future_job_waits(self):
+        enqueue("test_add", {"a": 1, "b": 2}, run_after=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(claim_next("worker-1"))
+
+    @override_settings(JOB_RETRY_BACKOFF=60)
+    def test_retry_with_backoff_then_fail(self):
+        job = enqueue("test_fail")
+        run_job(claim_next("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.QUEUED)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        self.assertIn("RuntimeError", job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_job(claim_next("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_requeue_stale(self):
+        job = enqueue("test_add", {"a": 1, "b": 2})
+        claim_next("worker-1")
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(requeue_stale(timeout=3600), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, JobStatus.QUEUED)
+
+    def test_runworker_once(self):
+        enqueue("test_add", {"a": 2, "b": 3})
+        out = StringIO()
+        call_command('runworker', once=True, stdout=out)
+        self.assertIn("Processed 1 jobs", out.getvalue())
+        self.assertEqual(calls, [(2, 3)])
+
+    def test_builtin_tasks_registered(self):
+        self.assertIn("refresh_risk_buckets", TASKS)
+        self.assertIn("repair_contract_counters", TASKS)
+
+
+class JobStatusPageTest(TestCase):
+    """
+    Testuje stránku se stavem úloh, která je dostupná jen pro personál.
+    """
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", password="heslo", is_staff=True)
+        self.user = User.objects.create_user(username="user", password="heslo")
+
+    def test_only_staff(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('job_list')).status_code, 403)
+
+    def test_list_and_enqueue(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('job_enqueue'), {'task': 'refresh_risk_buckets'})
+        self.assertRedirects(response, reverse('job_list'))
+        response = self.client.get(reverse('job_list'), {'status': JobStatus.QUEUED})
+        self.assertContains(response, "refresh_risk_buckets")
+
+    def test_retry_of_removed_task(self):
+        """
+        Nový pokus o úlohu, jejíž funkce už není registrovaná, skončí hláškou místo chyby 500.
+        """
+        job = Job.objects.create(name="odstranena_uloha", status=JobStatus.FAILED)
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('job_enqueue'), {'job': job.pk}, follow=True)
+        self.assertContains(response, "Neznámá úloha.")
+        self.assertEqual(Job.objects.count(), 1)
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.memory_profile import measure
+from viewer.models import Contract, Customer
+
+
+class MemoryProfileTest(TestCase):
+    """
+    Testuje měření paměti požadavků (?profile_memory=1).
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="jan", password="heslo")
+        self.user.user_permissions.add(Permission.objects.get(codename='view_contract'))
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        for number in range(3):
+            Contract.objects.create(contract_name=f"Projekt {number}", user=self.user, customer=customer)
+        self.client.login(username="jan", password="heslo")
+
+    def test_staff_gets_report(self):
+        self.user.is_staff = True
+        self.user.save()
+        for parameters in ({'profile_memory': 1}, {'profile_memory': 1, 'stream': 1}):
+            response = self.client.get(reverse('navbar_contracts_all'), parameters)
+            report = response.content.decode()
+            self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+            self.assertIn("-> 200", report)
+            self.assertIn("peak:", report)
+            self.assertIn("top allocation sites:", report)
+            self.assertGreater(int(response['X-Memory-Peak']), 0)
+
+    def test_other_users_get_the_page(self):
+        response = self.client.get(reverse('navbar_contracts_all'), {'profile_memory': 1})
+        self.assertNotIn('X-Memory-Peak', response)
+        self.assertContains(response, "Projekt 2")
+
+    def test_measure(self):
+        measurement = measure(lambda: [bytearray(1024) for _ in range(1000)], limit=3)
+        self.assertEqual(len(measurement.result), 1000)
+        # Tisíc bloků po kilobajtu, alokovaných v tomto souboru
+        self.assertGreater(measurement.peak, 1000 * 1024)
+        self.assertIn("tests_memory_profile.py", measurement.top[0][0])
@@ -0,0 +1,99 @@
+import gc
+import json
+import os
+import tempfile
+import threading
+
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from viewer import metrics
+from viewer.caching import cached
+
+
+class MetricsTest(TestCase):
+    """
+    Testuje sběr metrik a endpoint /metrics.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="heslo", is_staff=True)
+        self.user.user_permissions.add(Permission.objects.get(codename='view_customer'))
+        self.client.login(username="admin", password="heslo")
+
+    def sample(self, metric, **labels):
+        return metrics.process_samples().get(metric.key(labels))
+
+    def test_request_metrics(self):
+        before = self.sample(metrics.REQUESTS, view='navbar_customers', method='GET', status=200) or 0
+        self.client.get(reverse('navbar_customers'))
+        self.assertEqual(self.sample(metrics.REQUESTS, view='navbar_customers', method='GET', status=200),
+                         before + 1)
+        queries = self.sample(metrics.REQUEST_QUERIES, view='navbar_customers')
+        self.assertGreaterEqual(sum(queries[:-1]), 1)
+        self.assertIsNotNone(self.sample(metrics.TEMPLATE_RENDER, template='navbar_customers.html'))
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn("# TYPE employeehub_http_request_duration_seconds histogram", body)
+        self.assertIn('employeehub_http_requests_total{view="navbar_customers",method="GET",status="200"}', body)
+        self.assertIn('employeehub_http_request_duration_seconds_bucket{view="navbar_customers",method="GET",'
+                      'le="+Inf"}', body)
+
+    def test_streamed_response(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='view_contract'))
+        labels = dict(view='navbar_contracts_all', method='GET', status=200)
+        before = self.sample(metrics.REQUESTS, **labels) or 0
+        response = self.client.get(reverse('navbar_contracts_all'), {'stream': 1})
+        # Požadavek skončí až s posledním kusem těla
+        self.assertEqual(self.sample(metrics.REQUESTS, **labels) or 0, before)
+        b"".join(response.streaming_content)
+        self.assertEqual(self.sample(metrics.REQUESTS, **labels), before + 1)
+
+    def test_access(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN="tajne"):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION="Bearer tajne")
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_hits_and_misses(self):
+        key = "metrics-test"
+        before = self.sample(metrics.CACHE_REQUESTS, namespace='metrics-test', result='hit') or 0
+        cached(['metrics-test'], key, lambda: 1)
+        cached(['metrics-test'], key, lambda: 1)
+        self.assertEqual(self.sample(metrics.CACHE_REQUESTS, namespace='metrics-test', result='hit'), before + 1)
+
+    def test_thread_shards_are_summed(self):
+        before = self.sample(metrics.LOCK_RETRIES) or 0
+        thread = threading.Thread(target=metrics.LOCK_RETRIES.inc)
+        thread.start()
+        thread.join()
+        metrics.LOCK_RETRIES.inc()
+        self.assertEqual(self.sample(metrics.LOCK_RETRIES), before + 2)
+
+    def test_finished_threads_are_merged(self):
+        before = self.sample(metrics.LOCK_RETRIES) or 0
+        shards = len(metrics.all_shards)
+        threads = [threading.Thread(target=metrics.LOCK_RETRIES.inc) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        del thread, threads
+        gc.collect()
+        # Vzorky skončených vláken zůstanou, jejich shardy ne
+        self.assertLessEqual(len(metrics.all_shards), shards)
+        self.assertEqual(self.sample(metrics.LOCK_RETRIES), before + 50)
+
+    def test_processes_are_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # Soubor procesu, který už neběží
+            with open(os.path.join(directory, "metrics-999999999.json"), 'w') as file:
+                json.dump({'pid': 999999999, 'samples': [
+                    [metrics.LOCK_RETRIES.name, [], 5],
+                    [metrics.ACTIVE_REQUESTS.name, [], 3],
+                ]}, file)
+            own = self.sample(metrics.LOCK_RETRIES) or 0
+            totals = metrics.collect()
+            self.assertTrue(os.path.exists(metrics.process_file(directory, os.getpid())))
+        self.assertEqual(totals[metrics.LOCK_RETRIES.key({})], own + 5)
+        self.assertEqual(totals.get(metrics.ACTIVE_REQUESTS.key({}), 0), self.sample(metrics.ACTIVE_REQUESTS) or 0)
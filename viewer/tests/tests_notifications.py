@@ -0,0 +1,124 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User, Group, Permission
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from viewer.models import Contract, Customer, SubContract, Comment, Event, ChangeNotification, ChangeAction
+from viewer.notifications import sse_application
+
+
+class ChangeNotificationTest(TestCase):
+    """
+    Testuje zápis oznámení o změnách událostí a komentářů.
+    """
+    def setUp(self):
+        user = User.objects.create(username="jan")
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        contract = Contract.objects.create(contract_name="Projekt", user=user, customer=customer)
+        self.subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=user, contract=contract)
+        self.group = Group.objects.create(name="Tým")
+
+    def test_comment_notifications(self):
+        comment = Comment.objects.create(text="Ahoj", subcontract=self.subcontract)
+        comment.delete()
+        rows = list(ChangeNotification.objects.order_by('pk').values_list('topic', 'kind', 'action'))
+        topic = f"subcontract:{self.subcontract.pk}"
+        self.assertEqual(rows, [(topic, 'comment', ChangeAction.CREATED), (topic, 'comment', ChangeAction.DELETED)])
+        self.assertEqual(ChangeNotification.objects.first().payload['text'], "Ahoj")
+
+    def test_event_notifications(self):
+        event = Event.objects.create(title="Porada", group=self.group,
+                                     start_time=datetime(2026, 1, 1, 9, tzinfo=timezone.utc),
+                                     end_time=datetime(2026, 1, 1, 10, tzinfo=timezone.utc))
+        event.title = "Porada týmu"
+        event.save()
+        notification = ChangeNotification.objects.order_by('-pk').first()
+        self.assertEqual((notification.topic, notification.action), ("calendar", ChangeAction.UPDATED))
+        self.assertEqual(notification.payload['title'], "Porada týmu")
+        self.assertEqual(notification.payload['extendedProps']['group'], "Tým")
+
+    def test_wsgi_fallback(self):
+        User.objects.create_user(username="petr", password="heslo")
+        self.client.login(username="petr", password="heslo")
+        self.assertEqual(self.client.get(reverse('event_stream')).status_code, 204)
+
+
+@override_settings(SSE_POLL_INTERVAL=0.05, SSE_HEARTBEAT=0.1)
+class SseApplicationTest(TestCase):
+    """
+    Testuje ASGI stream server-sent events.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="jan", password="heslo")
+        self.user.user_permissions.add(Permission.objects.get(codename='view_subcontract'))
+        self.client.login(username="jan", password="heslo")
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        customer = Customer.objects.create(first_name="Firma", last_name="A")
+        contract = Contract.objects.create(contract_name="Projekt", user=self.user, customer=customer)
+        self.subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=self.user,
+                                                      contract=contract)
+
+    async def stream(self, query, cookie=None, last_event_id=None, during=None, duration=0.4):
+        """
+        Runs the app for `duration` seconds, calls `during` once the stream is open and returns
+        the response status and body.
+        """
+        headers = [(b'cookie', (cookie if cookie is not None else self.cookie).encode())]
+        if last_event_id is not None:
+            headers.append((b'last-event-id', str(last_event_id).encode()))
+        scope = {'type': 'http', 'method': 'GET', 'path': '/events/stream/',
+                 'query_string': query.encode(), 'headers': headers}
+        messages = []
+        started = asyncio.Event()
+
+        async def receive():
+            await started.wait()
+            if during:
+                await sync_to_async(during)()
+            await asyncio.sleep(duration)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.start':
+                started.set()
+
+        await sse_application(scope, receive, send)
+        body = b"".join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return messages[0]['status'], body.decode()
+
+    def events(self, body):
+        return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+    async def test_streams_new_comments(self):
+        topic = f"subcontract:{self.subcontract.pk}"
+
+        def add_comment():
+            Comment.objects.create(text="Nový komentář", subcontract=self.subcontract)
+
+        status, body = await self.stream(f"topic={topic}", during=add_comment)
+        self.assertEqual(status, 200)
+        self.assertIn("event: comment", body)
+        self.assertEqual(self.events(body)[0]['data']['text'], "Nový komentář")
+
+    async def test_replays_missed_after_last_event_id(self):
+        first = await sync_to_async(Comment.objects.create)(text="Starý", subcontract=self.subcontract)
+        await sync_to_async(Comment.objects.create)(text="Zmeškaný", subcontract=self.subcontract)
+        last_id = await sync_to_async(
+            lambda: ChangeNotification.objects.get(object_id=first.pk, kind='comment').pk)()
+        status, body = await self.stream(f"topic=subcontract:{self.subcontract.pk}", last_event_id=last_id,
+                                         duration=0.1)
+        self.assertEqual([event['data']['text'] for event in self.events(body)], ["Zmeškaný"])
+
+    async def test_rejects_anonymous_and_unknown_topics(self):
+        status, body = await self.stream("topic=calendar", cookie="")
+        self.assertEqual(status, 403)
+        status, body = await self.stream("topic=jobs")
+        self.assertEqual(status, 403)
+        status, body = await self.stream("")
+        self.assertEqual(status, 400)
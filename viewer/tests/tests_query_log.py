@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from viewer import query_log
+from viewer.query_log import fingerprint
+
+
+class FingerprintTest(TestCase):
+    """
+    Testuje normalizaci SQL příkazů na otisky.
+    """
+    def test_literals_and_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT "t"."id" FROM "t" WHERE ("t"."id" IN (%s, %s, %s) AND "t"."name" = \'O\'\'Brien\')'
+                        ' LIMIT 21'),
+            'SELECT "t"."id" FROM "t" WHERE ("t"."id" IN (...) AND "t"."name" = ?) LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT 1 FROM "t" WHERE "t"."id" IN (%s)'),
+                         fingerprint('SELECT 2 FROM "t"  WHERE "t"."id" IN (%s, %s)'))
+        self.assertEqual(fingerprint('SAVEPOINT "s140406110968704_x402"'), 'SAVEPOINT ?')
+        # Čísla v názvech sloupců zůstávají
+        self.assertEqual(fingerprint('SELECT "t"."col2" FROM "t"'), 'SELECT "t"."col2" FROM "t"')
+
+
+class QueryLogTest(TestCase):
+    """
+    Testuje statistiky dotazů podle pohledů, pomalý log a report.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(QUERY_LOG_DIR=self.directory.name, SLOW_QUERY_THRESHOLD=0)
+        self.settings.enable()
+        user = User.objects.create_user(username="jan", password="heslo")
+        user.user_permissions.add(Permission.objects.get(codename='view_customer'))
+        self.client.login(username="jan", password="heslo")
+
+    def tearDown(self):
+        for handler in list(query_log.slow_logger.handlers):
+            query_log.slow_logger.removeHandler(handler)
+            handler.close()
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def test_statements_labelled_with_view(self):
+        self.client.get(reverse('navbar_customers'))
+        query_log.flush(force=True)
+        stats = query_log.load_stats(self.directory.name)
+        self.assertTrue(any('navbar_customers' in entry['views'] for statement, entry in stats.items()
+                            if statement.startswith('SELECT "viewer_customer"."id"')))
+
+        with open(os.path.join(self.directory.name, 'slow.log'), encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file]
+        self.assertTrue(any(entry['view'] == 'navbar_customers' for entry in entries))
+
+    def test_report(self):
+        self.client.get(reverse('navbar_customers'))
+        out = StringIO()
+        call_command('query_report', '--view', 'navbar_customers', stdout=out)
+        self.assertIn('"viewer_customer"', out.getvalue())
+        self.assertNotIn('navbar_contracts', out.getvalue())
+
+    def test_reset(self):
+        self.client.get(reverse('navbar_customers'))
+        query_log.flush(force=True)
+        self.assertEqual(len(query_log.stats_files(self.directory.name)), 1)
+        out = StringIO()
+        call_command('query_report', '--reset', stdout=out)
+        self.assertIn("Deleted 1 statistics files.", out.getvalue())
+        self.assertEqual(query_log.stats_files(self.directory.name), [])
+        self.assertEqual(query_log.load_stats(self.directory.name), {})
@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from viewer.models import Contract
+from viewer.query_plans import classify, candidate_indexes, estimate_rows, explain_queryset
+
+
+class QueryPlanTest(TestCase):
+    """
+    Testuje rozbor výstupu EXPLAIN QUERY PLAN pro index advisor.
+    """
+    def test_classify(self):
+        plan = [
+            {'id': 2, 'parent': 0, 'detail': 'SCAN viewer_comment'},
+            {'id': 3, 'parent': 0, 'detail': 'SEARCH viewer_contract USING INTEGER PRIMARY KEY (rowid=?)'},
+            {'id': 4, 'parent': 0, 'detail': 'SCAN viewer_customer USING INDEX customer_name_idx'},
+            {'id': 5, 'parent': 0, 'detail': 'USE TEMP B-TREE FOR ORDER BY'},
+        ]
+        result = classify(plan)
+        self.assertEqual(result['full_scans'], ['viewer_comment'])
+        self.assertEqual(result['searches'], ['viewer_contract'])
+        self.assertEqual(result['index_scans'], ['viewer_customer'])
+        self.assertEqual(result['temp_btrees'], ['ORDER BY'])
+
+    def test_candidate_index_for_full_scan(self):
+        sql = ('SELECT "viewer_event"."id" FROM "viewer_event" WHERE ("viewer_event"."group_id" = %s '
+               'AND "viewer_event"."start_time" > %s) ORDER BY "viewer_event"."title" ASC')
+        plan = [{'id': 2, 'parent': 0, 'detail': 'SCAN viewer_event'},
+                {'id': 3, 'parent': 0, 'detail': 'USE TEMP B-TREE FOR ORDER BY'}]
+        self.assertEqual(candidate_indexes(sql, plan),
+                         [{'table': 'viewer_event', 'columns': ['group_id', 'start_time', 'title']}])
+
+    def test_estimate_rows_uses_index_statistics(self):
+        statistics = {'tables': {'viewer_contract': 1000}, 'indexes': {'contract_user_deadline_idx': [1000, 20, 1]}}
+        step = {'id': 2, 'parent': 0,
+                'detail': 'SEARCH viewer_contract USING INDEX contract_user_deadline_idx (user_id=?)'}
+        self.assertEqual(estimate_rows(step, statistics), 20)
+        self.assertEqual(estimate_rows({'id': 2, 'parent': 0, 'detail': 'SCAN viewer_contract'}, statistics), 1000)
+
+    def test_user_contracts_use_index(self):
+        plan = explain_queryset(Contract.objects.filter(user_id=1).order_by('deadline'))
+        result = classify(plan)
+        self.assertEqual(result['full_scans'], [])
+        self.assertEqual(result['temp_btrees'], [])
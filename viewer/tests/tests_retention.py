@@ -0,0 +1,84 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from viewer.models import ArchivedComment, ArchivedContract, ArchivedSubContract, ChangeNotification, Event, Job, \
+    JobStatus, Status
+from viewer.retention import POLICIES, purge
+
+
+@override_settings(RETENTION_DAYS={'archived_comments': 365, 'events': 30, 'change_notifications': 7,
+                                   'finished_jobs': 7})
+class RetentionTest(TestCase):
+    """
+    Testuje mazání starých dat po dávkách (purge_old_data).
+    """
+    def setUp(self):
+        self.now = timezone.now()
+        self.group = Group.objects.create(name="Tým")
+
+    def archived_comments(self, archived_days_ago, count):
+        # Archiv přebírá primární klíče živých tabulek, sám je nepřiděluje
+        contract = ArchivedContract.objects.create(id=archived_days_ago, contract_name="Projekt", created=self.now,
+                                                   status=Status.DONE, deadline=self.now, closed_at=self.now)
+        ArchivedContract.objects.filter(pk=contract.pk).update(archived_at=self.now - timedelta(days=archived_days_ago))
+        subcontract = ArchivedSubContract.objects.create(id=archived_days_ago, subcontract_name="Podprojekt",
+                                                         created=self.now, contract=contract, status=Status.DONE)
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(id=subcontract.pk * 100 + number, text=f"Komentář {number}", subcontract=subcontract,
+                            created=self.now)
+            for number in range(count)
+        ])
+
+    def event(self, days_ago):
+        start = self.now - timedelta(days=days_ago)
+        return Event.objects.create(title=f"Porada {days_ago}", start_time=start, end_time=start + timedelta(hours=1),
+                                    group=self.group)
+
+    def test_purge_in_batches(self):
+        for days_ago in (100, 60, 31, 29, 1):
+            self.event(days_ago)
+        progress = []
+        deleted = purge(POLICIES['events'], batch_size=2, pause=0,
+                        progress=lambda deleted, total: progress.append((deleted, total)))
+        self.assertEqual(deleted, 3)
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        self.assertEqual(sorted(Event.objects.values_list('title', flat=True)), ["Porada 1", "Porada 29"])
+        # Smazané události se neposílají otevřeným stránkám
+        self.assertFalse(ChangeNotification.objects.filter(action='deleted').exists())
+
+    def test_command(self):
+        self.archived_comments(400, 3)
+        self.archived_comments(10, 2)
+        self.event(40)
+        old = ChangeNotification.objects.create(topic="calendar", kind="event", action="created", object_id=1)
+        ChangeNotification.objects.filter(pk=old.pk).update(created=self.now - timedelta(days=8))
+        Job.objects.create(name="stará", status=JobStatus.DONE, finished_at=self.now - timedelta(days=8))
+        Job.objects.create(name="čekající", status=JobStatus.QUEUED)
+        Job.objects.create(name="nová", status=JobStatus.FAILED, finished_at=self.now)
+
+        out = StringIO()
+        call_command('purge_old_data', dry_run=True, stdout=out)
+        self.assertIn("archived_comments: 3 rows would be deleted", out.getvalue())
+        self.assertEqual(ArchivedComment.objects.count(), 5)
+
+        out = StringIO()
+        call_command('purge_old_data', batch_size=2, pause=0, stdout=out)
+        self.assertIn("archived_comments: 2/3", out.getvalue())
+        self.assertIn("archived_comments: deleted 3 rows.", out.getvalue())
+        self.assertEqual(ArchivedComment.objects.count(), 2)
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(ChangeNotification.objects.filter(pk=old.pk).exists())
+        self.assertEqual(set(Job.objects.values_list('name', flat=True)), {"čekající", "nová"})
+
+    def test_only_configured_policies(self):
+        self.event(40)
+        with override_settings(RETENTION_DAYS={'events': None}):
+            out = StringIO()
+            call_command('purge_old_data', 'events', stdout=out)
+        self.assertIn("No retention configured", out.getvalue())
+        self.assertTrue(Event.objects.exists())
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.models import Contract, Customer, SubContract, Status, RiskBucket, risk_bucket_for
+
+
+class RiskBucketTest(TestCase):
+    """
+    Testuje ukládané rizikové skupiny projektů a podprojektů podle deadline.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="testuser")
+        self.customer = Customer.objects.create(first_name="Jan", last_name="Novák")
+
+    def create_contract(self, days, status=Status.IN_PROGRESS):
+        return Contract.objects.create(contract_name=f"Za {days} dní", user=self.user, customer=self.customer,
+                                       status=status, deadline=timezone.now() + timedelta(days=days, hours=1))
+
+    def test_bucket_thresholds(self):
+        """
+        Hranice odpovídají podmínkám delta <= 7 a delta <= 14 v šablonách.
+        """
+        now = timezone.now()
+        self.assertEqual(risk_bucket_for(now - timedelta(hours=1), now), RiskBucket.OVERDUE)
+        self.assertEqual(risk_bucket_for(now + timedelta(days=7, hours=23), now), RiskBucket.WEEK)
+        self.assertEqual(risk_bucket_for(now + timedelta(days=8), now), RiskBucket.FORTNIGHT)
+        self.assertEqual(risk_bucket_for(now + timedelta(days=15), now), RiskBucket.LATER)
+
+    def test_bucket_set_on_save(self):
+        contract = self.create_contract(3)
+        subcontract = SubContract.objects.create(subcontract_name="Podprojekt", user=self.user, contract=contract)
+        self.assertEqual(contract.risk_bucket, RiskBucket.WEEK)
+        self.assertEqual(subcontract.risk_bucket, RiskBucket.WEEK)
+
+        # Posunutý deadline projektu se propíše i do podprojektů
+        contract.deadline = timezone.now() + timedelta(days=30)
+        contract.save()
+        subcontract.refresh_from_db()
+        self.assertEqual(subcontract.risk_bucket, RiskBucket.LATER)
+
+        contract.status = Status.DONE
+        contract.save()
+        self.assertIsNone(contract.risk_bucket)
+
+    def test_refresh_updates_only_changed_rows(self):
+        contract = self.create_contract(10)
+        self.create_contract(30)
+        self.assertEqual(Contract.objects.update_risk_buckets('deadline'), 0)
+
+        # O tři dny později se projekt přesune do skupiny "do 7 dní"
+        later = timezone.now() + timedelta(days=3)
+        self.assertEqual(Contract.objects.update_risk_buckets('deadline', now=later), 1)
+        contract.refresh_from_db()
+        self.assertEqual(contract.risk_bucket, RiskBucket.WEEK)
+
+    def test_command(self):
+        contract = self.create_contract(-2)
+        Contract.objects.filter(pk=contract.pk).update(risk_bucket=None)
+        call_command('refresh_risk_buckets', stdout=StringIO())
+        contract.refresh_from_db()
+        self.assertEqual(contract.risk_bucket, RiskBucket.OVERDUE)
+
+    def test_at_risk_view(self):
+        self.create_contract(5)
+        self.create_contract(60)
+        self.create_contract(5, status=Status.DONE)
+        user = User.objects.create_user(username="manager", password="heslo")
+        user.user_permissions.add(*Permission.objects.filter(codename__in=["view_contract", "view_subcontract"]))
+        self.client.force_login(user)
+
+        # Session, uživatel, dvě oprávnění a po jednom dotazu na každý seznam
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('at_risk'))
+        self.assertEqual([contract.contract_name for contract in response.context['contracts']], ["Za 5 dní"])
@@ -0,0 +1,81 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.models import Contract, Customer, SubContract, Status, StatusSnapshot, SnapshotScope
+from viewer.snapshots import take_snapshot, burndown
+
+
+class StatusSnapshotTest(TestCase):
+    """
+    Testuje denní snímky stavů a reporty, které z nich čtou.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="jan")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+        self.contract = Contract.objects.create(contract_name="Projekt", user=self.user, customer=self.customer)
+        Contract.objects.create(contract_name="Hotový", user=self.user, customer=self.customer, status=Status.DONE)
+        SubContract.objects.create(subcontract_name="Podprojekt", user=self.user, contract=self.contract,
+                                   subcontract_number=1)
+
+    def test_snapshot_rows(self):
+        self.assertEqual(take_snapshot(date(2026, 1, 1)), 3)
+        total = StatusSnapshot.objects.get(scope=SnapshotScope.TOTAL, date=date(2026, 1, 1))
+        self.assertEqual((total.contracts_open, total.contracts_done, total.subcontracts_open), (1, 1, 1))
+        customer = StatusSnapshot.objects.get(scope=SnapshotScope.CUSTOMER, key=self.customer.pk)
+        self.assertEqual(customer.subcontracts_open, 1)
+
+    def test_rerun_replaces_day(self):
+        """
+        Opakovaný snímek téhož dne přepíše řádky místo vložení duplicit.
+        """
+        take_snapshot(date(2026, 1, 1))
+        self.contract.status = Status.DONE
+        self.contract.save()
+        call_command('snapshot_statuses', date='2026-01-01', stdout=StringIO())
+        self.assertEqual(StatusSnapshot.objects.filter(scope=SnapshotScope.TOTAL).count(), 1)
+        self.assertEqual(StatusSnapshot.objects.get(scope=SnapshotScope.TOTAL).contracts_done, 2)
+
+    def test_rerun_drops_scopes_without_contracts(self):
+        """
+        Zaměstnanec, který od prvního snímku přišel o všechny projekty, ve snímku dne nezůstane.
+        """
+        other = User.objects.create(username="petr")
+        Contract.objects.filter(user=self.user).update(user=other)
+        SubContract.objects.filter(user=self.user).update(user=other)
+        take_snapshot(date(2026, 1, 1))
+        Contract.objects.filter(user=other).update(user=self.user)
+        SubContract.objects.filter(user=other).update(user=self.user)
+        take_snapshot(date(2026, 1, 1))
+        self.assertEqual(list(StatusSnapshot.objects.filter(scope=SnapshotScope.USER).values_list('key', flat=True)),
+                         [self.user.pk])
+
+    def test_burndown(self):
+        take_snapshot(date(2026, 1, 1))
+        self.contract.status = Status.DONE
+        self.contract.save()
+        take_snapshot(date(2026, 1, 2))
+
+        # Report čte jen tabulku snímků
+        with self.assertNumQueries(1):
+            series = burndown(date(2026, 1, 2), date(2026, 1, 2))
+        self.assertEqual(series[0]['contracts_open'], 0)
+        self.assertEqual(series[0]['contracts_change'], -1)
+
+    def test_endpoints(self):
+        take_snapshot(date(2026, 1, 1))
+        manager = User.objects.create_user(username="manager", password="heslo")
+        manager.user_permissions.add(Permission.objects.get(codename="view_contract"))
+        self.client.force_login(manager)
+
+        response = self.client.get(reverse('trend_report_scope', kwargs={'scope': 'user', 'key': self.user.pk}),
+                                   {'from': '2026-01-01', 'to': '2026-01-31'})
+        self.assertEqual(response.json()['results'][0]['contracts_open'], 1)
+        response = self.client.get(reverse('burndown_report'), {'from': '2026-01-01', 'to': '2026-01-31'})
+        self.assertEqual(response.json()['results'][0]['date'], '2026-01-01')
+        response = self.client.get(reverse('burndown_report'), {'from': 'včera'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from viewer.middleware import accepted_encodings
+from viewer.storage import minify_css
+
+
+class MinifyCssTest(TestCase):
+    """
+    Testuje minifikaci CSS souborů.
+    """
+    def test_minify_css(self):
+        source = "/* komentář */\n.btn-custom {\n    color: #fff;   /* bílá */\n}\n"
+        self.assertEqual(minify_css(source), ".btn-custom{color:#fff}")
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings("gzip, br;q=0, x-gzip;q=0.5"), {'gzip': 1.0, 'br': 0.0, 'x-gzip': 0.5})
+        self.assertEqual(accepted_encodings(""), {})
+
+
+class StaticAssetPipelineTest(TestCase):
+    """
+    Testuje collectstatic s hashovanými názvy a servírování předkomprimovaných variant.
+    """
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.settings_override = override_settings(
+            STATIC_ROOT=self.static_root,
+            STATICFILES_STORAGE='viewer.storage.CompressedManifestStaticFilesStorage',
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as f:
+            self.manifest = json.load(f)['paths']
+
+    def test_hashed_files_have_gzip_variant(self):
+        hashed_name = self.manifest['fullcalendar.js']
+        self.assertNotEqual(hashed_name, 'fullcalendar.js')
+        self.assertTrue(os.path.isfile(os.path.join(self.static_root, hashed_name + '.gz')))
+
+    def test_hashed_file_served_immutable_and_compressed(self):
+        hashed_name = self.manifest['fullcalendar.js']
+        response = self.client.get('/static/' + hashed_name, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        with open(os.path.join(self.static_root, hashed_name), 'rb') as f:
+            self.assertEqual(body, f.read())
+
+    def test_unhashed_file_short_cache(self):
+        response = self.client.get('/static/fullcalendar.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_etag_revalidation(self):
+        hashed_name = self.manifest['buttons.css']
+        response = self.client.get('/static/' + hashed_name)
+        response = self.client.get('/static/' + hashed_name, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_per_encoding(self):
+        hashed_name = self.manifest['fullcalendar.js']
+        plain = self.client.get('/static/' + hashed_name)
+        compressed = self.client.get('/static/' + hashed_name, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+        # ETag nekomprimované varianty nesmí potvrdit gzip odpověď
+        response = self.client.get('/static/' + hashed_name, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get('/static/' + hashed_name, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=f"{plain['ETag']}, {compressed['ETag']}")
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], compressed['ETag'])
+
+    def test_css_hash_matches_minified_content(self):
+        hashed_name = self.manifest['buttons.css']
+        with open(os.path.join(self.static_root, hashed_name), 'rb') as f:
+            content = f.read()
+        self.assertNotIn(b"\n", content.strip())
+        self.assertEqual(hashed_name.split('.')[-2], hashlib.md5(content).hexdigest()[:12])
+        # Opakovaný collectstatic dá stejný soubor
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as f:
+            self.assertEqual(json.load(f)['paths']['buttons.css'], hashed_name)
+
+    def test_refused_encoding_not_sent(self):
+        hashed_name = self.manifest['fullcalendar.js']
+        response = self.client.get('/static/' + hashed_name, HTTP_ACCEPT_ENCODING='gzip;q=0, x-gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User, Permission
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from viewer.models import Contract, Customer, SubContract
+
+
+@override_settings(LIST_STREAM_CHUNK_SIZE=2)
+class StreamingListTest(TestCase):
+    """
+    Testuje postupné odesílání dlouhých seznamů (?stream=1).
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="jan", password="heslo", first_name="Jan")
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['view_contract', 'view_subcontract']))
+        self.client.login(username="jan", password="heslo")
+        self.customer = Customer.objects.create(first_name="Firma", last_name="A")
+
+    def stream(self, name):
+        response = self.client.get(reverse(name), {'stream': 1})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return [part.decode() for part in response.streaming_content]
+
+    def test_contract_rows_in_chunks(self):
+        for number in range(5):
+            contract = Contract.objects.create(contract_name=f"Projekt {number}", user=self.user,
+                                               customer=self.customer)
+            SubContract.objects.create(subcontract_name=f"Podprojekt {number}", user=self.user, contract=contract)
+        parts = self.stream('navbar_contracts_all')
+        # Hlavička stránky, tři dávky řádků po dvou, konec stránky
+        self.assertEqual(len(parts), 5)
+        self.assertIn("Všechny projekty", parts[0])
+        self.assertNotIn("Projekt 0", parts[0])
+        self.assertIn("Projekt 0", parts[1])
+        self.assertIn("Projekt 4", parts[3])
+        self.assertIn("</html>", parts[-1])
+        # Stejný obsah jako bez streamování
+        self.assertEqual("".join(parts).split(), self.client.get(reverse('navbar_contracts_all')).content.decode()
+                         .split())
+
+    def test_empty_list(self):
+        parts = self.stream('navbar_subcontracts')
+        self.assertIn("Žádné podprojekty k zobrazení", "".join(parts))
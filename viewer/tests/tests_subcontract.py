@@ -1,6 +1,7 @@
 from django.test import TestCase
-from viewer.models import SubContract, UserProfile, Contract, Customer
-from django.contrib.auth.models import User
+from viewer.models import SubContract, UserProfile, Contract, Customer, Comment
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
 
 
 # Unit TESTS
@@ -105,3 +106,33 @@ class SubcontractCrudTest(TestCase):
         self.subcontract.delete()
         with self.assertRaises(SubContract.DoesNotExist):
             SubContract.objects.get(pk=subcontract_id)
+
+
+class SubContractDetailQueryBudgetTest(TestCase):
+    """
+    Detail podprojektu načte podprojekt s projektem a komentáře v pevném počtu dotazů.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.user.user_permissions.add(Permission.objects.get(codename='view_subcontract'))
+        customer = Customer.objects.create(first_name="Franta", last_name="Pepa")
+        contract = Contract.objects.create(contract_name="Test Contract", customer=customer, user=self.user)
+        self.subcontract = SubContract.objects.create(user=self.user, subcontract_name="Test SubContract",
+                                                      contract=contract, subcontract_number=1)
+        self.url = reverse('subcontract_detail', kwargs={'contract_pk': contract.pk, 'subcontract_number': 1})
+        self.client.login(username="testuser", password="password")
+
+    def test_query_budget(self):
+        """
+        Session, uživatel, 2x oprávnění, ETag (podprojekt a verze komentářů), podprojekt s projektem, komentáře.
+        """
+        for number in range(15):
+            Comment.objects.create(subcontract=self.subcontract, text=f"Komentář {number}")
+        with self.assertNumQueries(8):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Komentář 14")
+
+    def test_missing_subcontract_returns_404(self):
+        url = reverse('subcontract_detail', kwargs={'contract_pk': self.subcontract.contract.pk,
+                                                    'subcontract_number': 99})
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from viewer.caching import cached
+from viewer.tracing import Trace, current_trace, writer
+
+
+class TracingTest(TestCase):
+    """
+    Testuje vzorkované tracy požadavků a jejich zápis do JSONL.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        User.objects.create_user(username="jan", password="heslo")
+        self.client.login(username="jan", password="heslo")
+
+    def traces(self):
+        writer.flush()
+        traces = []
+        for name in os.listdir(self.directory.name):
+            with open(os.path.join(self.directory.name, name), encoding='utf-8') as file:
+                traces += [json.loads(line) for line in file]
+        return traces
+
+    def test_request_spans(self):
+        with override_settings(TRACE_DIR=self.directory.name, TRACE_SAMPLE_RATE=1):
+            self.client.get(reverse('homepage'))
+            traces = self.traces()
+        self.assertEqual(len(traces), 1)
+        events = {event['name']: event for event in traces[0]['traceEvents']}
+        for name in ('GET /', 'middleware (request)', 'view', 'homepage.html', 'events_homepage.html', 'SELECT'):
+            self.assertIn(name, events)
+        self.assertEqual(events['GET /']['args']['view'], 'homepage')
+        # Vložená šablona leží uvnitř stránky a ta uvnitř pohledu
+        page, include, view = events['homepage.html'], events['events_homepage.html'], events['view']
+        self.assertTrue(view['ts'] <= page['ts'] <= include['ts'])
+        self.assertTrue(include['ts'] + include['dur'] <= page['ts'] + page['dur'] <= view['ts'] + view['dur'])
+
+    def test_sampling(self):
+        with override_settings(TRACE_DIR=self.directory.name, TRACE_SAMPLE_RATE=1,
+                               TRACE_SAMPLE_RATES={'homepage': 0}):
+            self.client.get(reverse('homepage'))
+            self.assertEqual(self.traces(), [])
+        with override_settings(TRACE_DIR=self.directory.name, TRACE_SAMPLE_RATE=0):
+            self.client.get(reverse('homepage'))
+            self.assertEqual(self.traces(), [])
+
+    def test_cache_spans(self):
+        trace = Trace("test")
+        token = current_trace.set(trace)
+        try:
+            cached(['tracing-test'], "tracing-test", lambda: 1)
+        finally:
+            current_trace.reset(token)
+        self.assertEqual([event['name'] for event in trace.events], ['cache.get', 'cache.compute', 'cache.set'])
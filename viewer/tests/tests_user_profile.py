@@ -1,6 +1,8 @@
 from django.test import TestCase
-from viewer.models import UserProfile, Position, SecurityQuestion
+from viewer.models import UserProfile, Position, SecurityQuestion, EmployeeInformation, BankAccount, \
+    EmergencyContact
 from django.contrib.auth.models import User
+from django.urls import reverse
 
 
 # Unit TESTS
@@ -101,3 +103,45 @@ class UserProfileCRUDTest(TestCase):
         self.user_profile.delete()
         with self.assertRaises(UserProfile.DoesNotExist):
             UserProfile.objects.get(pk=user_profile_id)
+
+
+class EmployeeProfileQueryBudgetTest(TestCase):
+    """
+    Testuje, že stránka profilu zaměstnance načte profil se všemi částmi v pevném počtu dotazů.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password")
+        self.client.force_login(self.user)
+        self.profile = UserProfile.objects.create(
+            user=self.user,
+            position=Position.objects.create(name="manager"),
+            security_question=SecurityQuestion.objects.create(question_text="Jméno psa?"),
+        )
+        EmployeeInformation.objects.create(user_profile=self.profile, permament_address="Ulice",
+                                           permament_descriptive_number="1", permament_postal_code="11000",
+                                           city="Praha", phone_number="123456789")
+        BankAccount.objects.create(user_profile=self.profile, account_number="123456", bank_code="0100")
+        for name in ("Pavel Novák", "Jana Nováková"):
+            EmergencyContact.objects.create(user_profile=self.profile, name=name, address="Ulice",
+                                            descriptive_number="1", postal_code="11000", city="Praha",
+                                            phone_number="123456789")
+
+    def test_profile_page(self):
+        # Session, uživatel, profil včetně vazeb jedna ku jedné a kontaktní osoby
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('employee_profile'))
+        self.assertContains(response, "Jana Nováková")
+        self.assertContains(response, "123456")
+
+    def test_edit_emergency_contacts(self):
+        # Navíc jen dotaz formsetu na upravované kontakty
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('employee_profile') + '?edit=emergency_contacts')
+        self.assertEqual(response.context['emergency_contact_formset'].total_form_count(), 2)
+
+    def test_missing_profile_is_created(self):
+        user = User.objects.create_user(username="novy", password="password")
+        self.client.force_login(user)
+        response = self.client.get(reverse('employee_profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
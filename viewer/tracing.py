@@ -0,0 +1,238 @@
+"""
+Sampled per-request traces in the Trace Event format read by chrome://tracing and Perfetto.
+
+TracingMiddleware (first in MIDDLEWARE) starts a trace for a sample of the requests: TRACE_SAMPLE_RATE,
+or the rate TRACE_SAMPLE_RATES gives for the URL name. While a trace is active, span() records nested
+"complete" events for the middleware on the way in and out, the view (ViewTracingMiddleware, last in
+MIDDLEWARE), every SQL statement, every template render including each {% include %} (templates
+come from CachedLoader below) and the cache lookups of viewer.caching.
+
+Finished traces are buffered in memory and a background thread appends them to
+TRACE_DIR/traces-<date>-<pid>.jsonl, one trace per line. Every line is a complete trace file on its own,
+so it can be saved as .json and opened in the viewer. With TRACE_SAMPLE_RATE at 0 and no
+TRACE_SAMPLE_RATES, span() costs one context variable lookup.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template import Template, TemplateDoesNotExist
+from django.template.loaders import base, cached
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+current_trace = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.events = []
+        self.epoch_us = time.time_ns() // 1000
+        self.start_ns = time.perf_counter_ns()
+
+    def timestamp(self, perf_ns):
+        return self.epoch_us + (perf_ns - self.start_ns) / 1000
+
+    def add(self, name, category, start_ns, end_ns, args):
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': self.timestamp(start_ns), 'dur': (end_ns - start_ns) / 1000,
+            'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args,
+        })
+
+    def as_json(self):
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms',
+                'otherData': {'trace_id': self.trace_id, 'name': self.name}}
+
+
+@contextmanager
+def span(name, category, **args):
+    """
+    Records the block as a span of the current trace, if there is one.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, category, start, time.perf_counter_ns(), args)
+
+
+def sample_rate(request):
+    rates = getattr(settings, 'TRACE_SAMPLE_RATES', {})
+    if rates:
+        try:
+            url_name = resolve(request.path_info).view_name
+        except Resolver404:
+            url_name = None
+        if url_name in rates:
+            return rates[url_name]
+    return getattr(settings, 'TRACE_SAMPLE_RATE', 0)
+
+
+class TraceWriter:
+    """
+    Buffers finished traces and appends them to the trace files from a background thread.
+    """
+    def __init__(self):
+        self.pending = queue.SimpleQueue()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def submit(self, trace):
+        if self.pending.qsize() >= getattr(settings, 'TRACE_MAX_PENDING', 1000):
+            # The disk can't keep up, losing traces is better than growing without bound
+            return
+        self.pending.put(trace)
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='trace-writer', daemon=True)
+            self.thread.start()
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(getattr(settings, 'TRACE_FLUSH_INTERVAL', 1.0))
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every buffered trace. Also called on exit, and by tests to wait for the files.
+        """
+        with self.write_lock:
+            traces = []
+            while True:
+                try:
+                    traces.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            directory = getattr(settings, 'TRACE_DIR', None)
+            if not traces or not directory:
+                return
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"traces-{timezone.now():%Y%m%d}-{os.getpid()}.jsonl")
+            with open(path, 'a', encoding='utf-8') as file:
+                for trace in traces:
+                    file.write(json.dumps(trace.as_json(), default=str) + "\n")
+
+
+writer = TraceWriter()
+atexit.register(writer.flush)
+
+
+class TracingMiddleware:
+    """
+    Starts the trace of a sampled request. Goes first in MIDDLEWARE; the time until the view starts
+    and after it returns is recorded as the middleware spans.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'TRACE_DIR', None) or random.random() >= sample_rate(request):
+            return self.get_response(request)
+        trace = Trace(f"{request.method} {request.path}")
+        token = current_trace.set(trace)
+        request.trace_marks = {}
+        start = time.perf_counter_ns()
+        status = None
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            end = time.perf_counter_ns()
+            current_trace.reset(token)
+            marks = request.trace_marks
+            if 'view_start' in marks:
+                trace.add('middleware (request)', 'middleware', start, marks['view_start'], {})
+                trace.add('middleware (response)', 'middleware', marks['view_end'], end, {})
+            match = getattr(request, 'resolver_match', None)
+            trace.add(trace.name, 'request', start, end, {
+                'trace_id': trace.trace_id, 'status': status, 'view': match.view_name if match else None,
+            })
+            writer.submit(trace)
+
+
+class ViewTracingMiddleware:
+    """
+    Last in MIDDLEWARE: records the view, with the rendering of its template response, as one span.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        marks = getattr(request, 'trace_marks', None)
+        if marks is None:
+            return self.get_response(request)
+        marks['view_start'] = time.perf_counter_ns()
+        try:
+            with span('view', 'view'):
+                return self.get_response(request)
+        finally:
+            marks['view_end'] = time.perf_counter_ns()
+
+
+def trace_query(execute, sql, params, many, context):
+    with span(sql.split(None, 1)[0] if sql else 'SQL', 'sql', sql=sql[:2000]):
+        return execute(sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    # First in the list: execute_wrapper() blocks open at this moment remove their wrapper with pop()
+    if trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, trace_query)
+
+
+connection_created.connect(install, dispatch_uid='tracing_install')
+
+
+class TracedTemplate(Template):
+    """
+    Template whose every render is a span. {% include %} renders the included template through
+    render() as well, {% extends %} renders the parent as part of the child.
+    """
+    def render(self, context):
+        with span(self.name or '<string>', 'template'):
+            return super().render(context)
+
+
+class TracedLoaderMixin(base.Loader):
+    """
+    Loader.get_template() building TracedTemplate instead of Template.
+    """
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for origin in self.get_template_sources(template_name):
+            if skip is not None and origin in skip:
+                tried.append((origin, "Skipped to avoid recursion"))
+                continue
+            try:
+                contents = self.get_contents(origin)
+            except TemplateDoesNotExist:
+                tried.append((origin, "Source does not exist"))
+                continue
+            return TracedTemplate(contents, origin, origin.template_name, self.engine)
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+
+class CachedLoader(cached.Loader, TracedLoaderMixin):
+    """
+    Cached loader building TracedTemplate. It wraps the loaders listed with it in TEMPLATES but builds
+    the templates itself, through the get_template() of its base class.
+    """
@@ -1,25 +1,46 @@
+import hashlib
 import logging
+import uuid
+from functools import wraps
+from itertools import islice
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import User
-from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, PasswordChangeView
-from django.db.models import Max, Q
-from django.http import JsonResponse
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Max, Q, Prefetch, F, Count, ProtectedError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.urls import reverse_lazy
 from django.views.decorators.csrf import csrf_exempt
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, FormView, DetailView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, FormView, DetailView, \
+    View
 
 
 from .models import *
 from .forms import *
 from .models import Contract, Customer, SubContract, Event, Comment, UserProfile, BankAccount, \
-    EmployeeInformation, EmergencyContact
+    EmployeeInformation, EmergencyContact, ChangeVersion, Position
 from .forms import SecurityQuestionForm, SecurityAnswerForm, SetNewPasswordForm, SignUpForm, ContractForm, \
     CustomerForm, SubContractForm, CommentForm, SearchForm, EmployeeInformationForm, BankAccountForm, \
-    BaseEmergencyContactFormSet, EmergencyContactForm
-from datetime import datetime, date
+    BaseEmergencyContactFormSet, EmergencyContactForm, EmergencyContactAddFormSet, EmergencyContactEditFormSet, \
+    BulkActionForm
+from .analytics import DIMENSIONS, workload
+from .api import ApiError, get_resource, parse_body, render_json
+from .batching import run_batch
+from .archive import restore_contract
+from .bulk import apply_bulk_action
+from .exports import EXPORT_FORMATS
+from .snapshots import burndown, snapshot_series
+from .jobs import TASKS, enqueue
+from .metrics import exposition
+from datetime import datetime, date, timedelta
 import json
 
 logger = logging.getLogger(__name__)
@@ -41,28 +62,108 @@ class HomepageView(LoginRequiredMixin, TemplateView):
         """
         Fetches the context data to be displayed on the homepage.
         """
-        contracts = Contract.objects.filter(user=self.request.user)
-        subcontracts = SubContract.objects.filter(user=self.request.user)
-        sorted_contracts = sorted(contracts, key=lambda contract: contract.delta())
-        sorted_subcontracts = sorted(subcontracts, key=lambda subcontract: subcontract.delta)
-        limited_subcontracts = sorted_subcontracts[:5]
-        today = date.today()
+        # Only work in progress, read from the partial contract_active_user_idx / subcontract_active_user_idx.
+        # Ordering by deadline is the same as ordering by delta().
+        contracts = Contract.objects.active().filter(user=self.request.user).order_by('deadline')
+        limited_subcontracts = SubContract.objects.active().filter(user=self.request.user) \
+            .select_related('contract').order_by('contract__deadline')[:5]
+        day_start, day_end = today_bounds()
 
         context = super().get_context_data(**kwargs)
-        context['comments'] = Comment.objects.all().order_by('-created')[:5]
-        context['users'] = User.objects.all()
-        context['contracts'] = sorted_contracts
+        context['comments'] = Comment.objects.select_related('subcontract__contract').order_by('-created')[:5]
+        context['contracts'] = contracts
         context['subcontracts'] = limited_subcontracts
 
+        # Events overlapping today, written as plain range lookups so event_start_end_idx can be used
         context['events'] = Event.objects.filter(
-            Q(start_time__date=today) |
-            Q(end_time__date=today) |
-            Q(start_time__date__lt=today, end_time__date__gt=today)
-        ).order_by('start_time')
+            start_time__lt=day_end,
+            end_time__gte=day_start,
+        ).select_related('group').order_by('start_time')
         return context
 
 
-class ContractView(PermissionRequiredMixin, LoginRequiredMixin, DetailView):
+def today_bounds():
+    """
+    Returns the start of today and the start of tomorrow in the current time zone.
+    """
+    day_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return day_start, day_start + timedelta(days=1)
+
+
+class ConditionalGetMixin:
+    """
+    Answers a repeated GET with 304 Not Modified, without loading or rendering the page, while nothing
+    it shows has changed. The ETag hashes the change versions of `conditional_models` (see ChangeVersion)
+    together with the user, the URL, the CSRF cookie the forms are rendered with and today's date,
+    as the pages count the days left to the deadline. base.html shows the user's name and the links
+    their permissions allow on every page, so User belongs in every `conditional_models`.
+    """
+    conditional_models = ()
+
+    def get_conditional_state(self):
+        """
+        (marker, last modified) pairs of the data shown on the page, None when the object is missing.
+        """
+        return ChangeVersion.current(self.conditional_models)
+
+    def get(self, request, *args, **kwargs):
+        # Flash messages are shown only once, such a page can't be answered from the browser cache
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        state = self.get_conditional_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+        day_start, day_end = today_bounds()
+        key = [request.user.pk, request.get_full_path(), request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+               day_start.date().isoformat(), [marker for marker, updated_at in state]]
+        etag = f'"{hashlib.md5(repr(key).encode()).hexdigest()}"'
+        last_modified = int(max([day_start] + [updated_at for marker, updated_at in state if updated_at]).timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        # The browser keeps the page but asks every time, so a change is never missed
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class StreamingListMixin:
+    """
+    Opt-in streaming of a long list with ?stream=1. The page is rendered once with a sentinel in place
+    of the table rows and sent up to it right away, then the rows follow in chunks of `row_template_name`
+    read with QuerySet.iterator(), so a worker holds one chunk of model instances at a time instead of
+    the whole table and the whole page.
+    """
+    row_template_name = None
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('stream') != '1':
+            return super().get(request, *args, **kwargs)
+        self.object_list = self.get_queryset()
+        sentinel = f"stream-rows-{uuid.uuid4().hex}"
+        context = self.get_context_data(stream_rows=True, stream_sentinel=sentinel)
+        head, tail = render_to_string(self.get_template_names(), context, request).split(sentinel, 1)
+        return StreamingHttpResponse(self.stream_rows(head, tail, context), content_type='text/html; charset=utf-8')
+
+    def stream_rows(self, head, tail, context):
+        yield head
+        row_template = get_template(self.row_template_name)
+        chunk_size = getattr(settings, 'LIST_STREAM_CHUNK_SIZE', 200)
+        rows = self.object_list.iterator(chunk_size=chunk_size)
+        row_context = {'bulk_form': context.get('bulk_form')}
+        empty = True
+        for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+            empty = False
+            yield row_template.render({**row_context, 'rows': chunk})
+        if empty:
+            yield row_template.render({**row_context, 'rows': []})
+        yield tail
+
+
+class ContractView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, DetailView):
     """
     Displays the detail view of a specific contract.
     Access is limited to logged-in users with the ‘view_contract’ permission.
@@ -70,6 +171,32 @@ class ContractView(PermissionRequiredMixin, LoginRequiredMixin, DetailView):
     model = Contract
     template_name = "detail_contract.html"
     permission_required = 'viewer.view_contract'
+    conditional_models = (Customer, User, UserProfile, Position)
+
+    def get_conditional_state(self):
+        """
+        The contract and its subcontracts from one indexed query, the rest from the table versions.
+        """
+        row = Contract.objects.filter(pk=self.kwargs['pk']).values('updated_at').annotate(
+            subcontracts_changed=Max('subcontracts__updated_at'), subcontracts_count=Count('subcontracts'),
+        ).values_list('updated_at', 'subcontracts_changed', 'subcontracts_count').first()
+        if row is None:
+            return None
+        updated_at, subcontracts_changed, subcontracts_count = row
+        return [
+            (f"contract:{updated_at.isoformat()}", updated_at),
+            (f"subcontracts:{subcontracts_count}:{subcontracts_changed}", subcontracts_changed),
+        ] + super().get_conditional_state()
+
+    def get_queryset(self):
+        """
+        Loads the contract with its user, profile and position in one query and all of its
+        subcontracts with their users in a second one, regardless of the number of subcontracts.
+        """
+        return Contract.objects.select_related('user__userprofile__position', 'customer').prefetch_related(
+            Prefetch('subcontracts',
+                     queryset=SubContract.objects.select_related('user').order_by('subcontract_number'))
+        )
 
 
 class ContractCreateView(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
@@ -120,7 +247,7 @@ class ContractDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteView
         Returns:    HttpResponseRedirect: Redirects back to the contracts page or shows a warning message.
         """
         self.object = self.get_object()
-        if self.object.subcontracts.exists():
+        if self.object.subcontracts_total:
             messages.warning(request, "You can't delete this contract because it has active subcontracts.")
             return redirect('navbar_contracts_all')
         return super().post(request, *args, **kwargs)
@@ -143,7 +270,7 @@ class ContractDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteView
         return context
 
 
-class ContractListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+class ContractListView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, ListView):
     """
     View to list contracts for the logged-in user.
     The user must have the `view_contract` permission. The contracts are filtered by the logged-in user and sorted by a custom delta method.
@@ -152,21 +279,22 @@ class ContractListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
     template_name = 'navbar_contracts.html'
     context_object_name = "contracts"
     permission_required = 'viewer.view_contract'
+    conditional_models = (Contract, User, UserProfile, Position)
 
     def get_queryset(self):
         """
         Filters contracts by the logged-in user and applies a search query if provided.
-        If the user is authenticated, it filters out the contracts associated with the current user.
+        If the user is authenticated, it filters out the contracts in progress associated with the current user.
         The user can also search for contracts by name using the GET 'query' parameter.
-        Contracts are sorted using the `delta()` method.
+        Contracts are sorted by deadline, which is the order of the `delta()` method.
         Returns:    querySet: A filtered and sorted list of contracts for the current user.
         """
         if self.request.user.is_authenticated:
-            queryset = Contract.objects.filter(user=self.request.user)
+            queryset = Contract.objects.active().filter(user=self.request.user)
             query = self.request.GET.get("query")
             if query:
                 queryset = queryset.filter(contract_name__icontains=query)
-            return sorted(queryset, key=lambda contract: contract.delta())
+            return queryset.select_related('user__userprofile__position').order_by('deadline')
         return Contract.objects.none()
 
     def get_context_data(self, **kwargs):
@@ -184,29 +312,33 @@ class ContractListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
         return context
 
 
-class ContractAllListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+class ContractAllListView(ConditionalGetMixin, StreamingListMixin, PermissionRequiredMixin, LoginRequiredMixin,
+                          ListView):
     """
     View a list of all contracts regardless of the user.
     Only users with the ‘view_contract’ permission can access this view.
     Includes a search function that allows you to filter contracts by name.
+    With ?stream=1 the rows are streamed in chunks, see StreamingListMixin.
     """
     model = Contract
     template_name = 'navbar_contracts_all.html'
+    row_template_name = 'includes/contract_rows.html'
     context_object_name = "contracts"
     permission_required = 'viewer.view_contract'
+    conditional_models = (Contract, User, UserProfile, Position)
 
     def get_queryset(self):
         """
         Returns a set of all jobs, optionally filtered by the search query.
         If the GET parameter 'query' is specified, it filters the jobs by name.
-        The jobs are sorted using the `delta()` method.
+        The jobs are sorted by deadline, which is the order of the `delta()` method.
         Returns:    querySet: a filtered and sorted list of all jobs.
         """
         queryset = Contract.objects.all()
         query = self.request.GET.get("query")
         if query:
             queryset = queryset.filter(contract_name__icontains=query)
-        return sorted(queryset, key=lambda contract: contract.delta())
+        return queryset.select_related('user__userprofile__position').order_by('deadline')
 
     def get_context_data(self, **kwargs):
         """
@@ -216,9 +348,295 @@ class ContractAllListView(PermissionRequiredMixin, LoginRequiredMixin, ListView)
         context["search_form"] = SearchForm(self.request.GET or None)
         context["search_url"] = "navbar_contracts_all"
         context["show_search"] = True
+        if self.request.user.is_staff and self.request.user.has_perm('viewer.change_contract'):
+            context["bulk_form"] = BulkActionForm()
+            context["bulk_url"] = "contract_bulk_action"
         return context
 
 
+class ArchivedContractListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+    """
+    Read-only list of archived contracts, newest archived first.
+    Supports the same name search as the contract lists and is paginated, the archive only grows.
+    """
+    model = ArchivedContract
+    template_name = 'archive_list.html'
+    context_object_name = "contracts"
+    permission_required = 'viewer.view_archivedcontract'
+    paginate_by = 50
+
+    def get_queryset(self):
+        """
+        Returns the archived contracts, optionally filtered by the search query.
+        """
+        queryset = ArchivedContract.objects.all()
+        query = self.request.GET.get("query")
+        if query:
+            queryset = queryset.filter(contract_name__icontains=query)
+        return queryset.select_related('user', 'customer').order_by('-archived_at', '-pk')
+
+    def get_context_data(self, **kwargs):
+        """
+        Passes additional search context to the template.
+        """
+        context = super().get_context_data(**kwargs)
+        context["search_form"] = SearchForm(self.request.GET or None)
+        context["search_url"] = "archive_list"
+        context["show_search"] = True
+        return context
+
+
+class ArchivedContractDetailView(PermissionRequiredMixin, LoginRequiredMixin, DetailView):
+    """
+    Read-only detail of an archived contract with its subcontracts and their comments.
+    """
+    model = ArchivedContract
+    template_name = 'archive_detail.html'
+    context_object_name = "contract"
+    permission_required = 'viewer.view_archivedcontract'
+
+    def get_queryset(self):
+        return ArchivedContract.objects.select_related('user', 'customer').prefetch_related(
+            Prefetch('subcontracts', queryset=ArchivedSubContract.objects.select_related('user')
+                     .prefetch_related('comments').order_by('subcontract_number')),
+        )
+
+
+class ArchivedContractRestoreView(PermissionRequiredMixin, LoginRequiredMixin, View):
+    """
+    Moves an archived contract back to the live tables (POST only).
+    """
+    permission_required = ('viewer.delete_archivedcontract', 'viewer.add_contract')
+
+    def post(self, request, pk):
+        archived_contract = get_object_or_404(ArchivedContract, pk=pk)
+        contract = restore_contract(archived_contract)
+        messages.success(request, 'Projekt byl obnoven z archivu.')
+        return redirect('contract_detail', pk=contract.pk)
+
+
+class AtRiskView(PermissionRequiredMixin, LoginRequiredMixin, TemplateView):
+    """
+    Contracts and subcontracts in progress that are overdue or due within 14 days.
+    Reads the stored risk buckets, so each list is a single indexed query.
+    """
+    template_name = 'at_risk.html'
+    permission_required = ('viewer.view_contract', 'viewer.view_subcontract')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['contracts'] = Contract.objects.at_risk().select_related('user', 'customer') \
+            .order_by('risk_bucket', 'deadline')
+        context['subcontracts'] = SubContract.objects.at_risk().select_related('contract', 'user') \
+            .order_by('risk_bucket', 'contract__deadline')
+        return context
+
+
+class AnalyticsView(PermissionRequiredMixin, LoginRequiredMixin, TemplateView):
+    """
+    Workload dashboard: open/done/cancelled contracts and subcontracts and upcoming deadlines
+    per employee, customer and position, read from the cached rollups in viewer.analytics.
+    """
+    template_name = 'analytics.html'
+    permission_required = 'viewer.view_contract'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['by_user'] = workload('user')
+        context['by_customer'] = workload('customer')
+        context['by_position'] = workload('position')
+        return context
+
+
+@login_required
+@permission_required('viewer.view_contract', raise_exception=True)
+def analytics_api(request, dimension):
+    """
+    JSON version of the workload dashboard for one dimension ('user', 'customer' or 'position').
+    """
+    if dimension not in DIMENSIONS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown dimension'}, status=404)
+    return JsonResponse({'dimension': dimension, 'results': workload(dimension)})
+
+
+# HTTP method -> permission action of the API, see viewer.api
+API_PERMISSIONS = {'GET': 'view', 'HEAD': 'view', 'POST': 'add', 'PATCH': 'change', 'PUT': 'change',
+                   'DELETE': 'delete'}
+
+
+def api_view(view):
+    """
+    Wraps an API view: JSON errors instead of login redirects and the model permission of the method.
+    """
+    @wraps(view)
+    def wrapper(request, resource, *args, **kwargs):
+        try:
+            if not request.user.is_authenticated:
+                raise ApiError("Authentication required", status=401)
+            resource = get_resource(resource)
+            action = API_PERMISSIONS.get(request.method)
+            if action is None:
+                raise ApiError("Method not allowed", status=405)
+            if not request.user.has_perm(resource.permission(action)):
+                raise ApiError("Permission denied", status=403)
+            return view(request, resource, *args, **kwargs)
+        except ApiError as error:
+            data = {'status': 'error', 'message': error.message}
+            if error.errors:
+                data['errors'] = error.errors
+            return JsonResponse(data, status=error.status)
+    return wrapper
+
+
+def api_response(request, data, status=200):
+    """
+    JSON response with an ETag; GET and HEAD answer 304 when the client's copy is current.
+    """
+    content, etag = render_json(data)
+    response = HttpResponse(content, status=status, content_type='application/json')
+    response['ETag'] = etag
+    if request.method in ('GET', 'HEAD'):
+        return get_conditional_response(request, etag=etag, response=response)
+    return response
+
+
+def save_api_form(resource, form, status, request):
+    if not form.is_valid():
+        raise ApiError("Invalid data", errors=form.errors.get_json_data())
+    instance = resource.save(form)
+    return api_response(request, resource.detail(instance.pk), status=status)
+
+
+@api_view
+def api_list(request, resource):
+    """
+    GET: one page of rows, see viewer.api. POST: creates a row from a JSON object.
+    """
+    if request.method == 'POST':
+        return save_api_form(resource, resource.form(parse_body(request)), 201, request)
+    if request.method not in ('GET', 'HEAD'):
+        raise ApiError("Method not allowed", status=405)
+    return api_response(request, resource.list(request.GET))
+
+
+@api_view
+def api_detail(request, resource, pk):
+    """
+    GET: one row. PATCH/PUT: updates the sent fields. DELETE: deletes the row.
+    Writes honour If-Match with the ETag of the default representation.
+    """
+    if request.method in ('GET', 'HEAD'):
+        return api_response(request, resource.detail(pk, resource.parse_fields(request.GET.get('fields'))))
+    if request.method == 'POST':
+        raise ApiError("Method not allowed", status=405)
+
+    instance = resource.model.objects.filter(pk=pk).first()
+    if instance is None:
+        raise ApiError("Not found", status=404)
+    precondition = get_conditional_response(request, etag=render_json(resource.detail(pk))[1])
+    if precondition is not None:
+        return precondition
+    if request.method == 'DELETE':
+        try:
+            delete_checked(instance)
+        except (ProtectedError, IntegrityError):
+            raise ApiError("The row is still referenced", status=409)
+        return HttpResponse(status=204)
+    return save_api_form(resource, resource.form(parse_body(request), instance), 200, request)
+
+
+def delete_checked(instance):
+    """
+    Deletes the instance, raising IntegrityError when a DO_NOTHING foreign key still points to it.
+    The database checks those constraints only at the commit, the check is run before it instead,
+    so the delete is rolled back and no error escapes from the commit.
+    """
+    model = type(instance)
+    using = instance._state.db or 'default'
+    tables = sorted({relation.related_model._meta.db_table for relation in model._meta.related_objects})
+    with transaction.atomic(using=using):
+        instance.delete()
+        connections[using].check_constraints(table_names=tables)
+
+
+
+def api_batch(request):
+    """
+    Runs several API reads sent as {"requests": [...]} in one POST, see viewer.batching.
+    """
+    try:
+        if not request.user.is_authenticated:
+            raise ApiError("Authentication required", status=401)
+        if request.method != 'POST':
+            raise ApiError("Method not allowed", status=405)
+        return api_response(request, run_batch(request.user, parse_body(request).get('requests')))
+    except ApiError as error:
+        return JsonResponse({'status': 'error', 'message': error.message}, status=error.status)
+
+
+MAX_REPORT_DAYS = 366
+
+
+def report_range(request):
+    """
+    Reads the ?from=&to= ISO dates of a report, the last 30 days by default.
+    Raises ValueError for invalid dates or a range longer than MAX_REPORT_DAYS.
+    """
+    date_to = date.fromisoformat(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+    date_from = date.fromisoformat(request.GET['from']) if request.GET.get('from') else date_to - timedelta(days=30)
+    if date_from > date_to or (date_to - date_from).days > MAX_REPORT_DAYS:
+        raise ValueError("Invalid date range")
+    return date_from, date_to
+
+
+@login_required
+@permission_required('viewer.view_contract', raise_exception=True)
+def burndown_report(request):
+    """
+    Open contracts and subcontracts per day from the daily snapshots.
+    """
+    try:
+        date_from, date_to = report_range(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date range'}, status=400)
+    return JsonResponse({'from': date_from, 'to': date_to, 'results': burndown(date_from, date_to)})
+
+
+@login_required
+@permission_required('viewer.view_contract', raise_exception=True)
+def trend_report(request, scope=SnapshotScope.TOTAL, key=0):
+    """
+    Daily status counts of all work, one user or one customer from the daily snapshots.
+    """
+    if scope not in SnapshotScope.values:
+        return JsonResponse({'status': 'error', 'message': 'Unknown scope'}, status=404)
+    try:
+        date_from, date_to = report_range(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date range'}, status=400)
+    return JsonResponse({'scope': scope, 'key': key, 'from': date_from, 'to': date_to,
+                         'results': snapshot_series(scope, key, date_from, date_to)})
+
+
+HR_EXPORT_PERMISSIONS = ('viewer.view_userprofile', 'viewer.view_employeeinformation',
+                         'viewer.view_bankaccount', 'viewer.view_emergencycontact')
+
+
+@login_required
+@permission_required(HR_EXPORT_PERMISSIONS, raise_exception=True)
+def hr_export(request, export_format):
+    """
+    Streams the HR data of all employees as 'csv' or 'jsonl', reading the profiles in batches.
+    """
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown format'}, status=404)
+    rows, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(rows(), content_type=content_type)
+    filename = f"employees-{timezone.localdate().isoformat()}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def contract_detail(request, contract_id):
     """
@@ -228,21 +646,25 @@ def contract_detail(request, contract_id):
     return render(request, 'detail_contract.html', {'contract': contract})
 
 
-class SubContractAllListView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+class SubContractAllListView(ConditionalGetMixin, StreamingListMixin, PermissionRequiredMixin, LoginRequiredMixin,
+                             ListView):
     """
     This view loads and displays a list of all sub-deliveries.
     It supports filtering by subcontract name or parent contract.
-    Results are sorted by custom method (delta).
+    Results are sorted by risk bucket (work in progress first) and contract deadline.
+    With ?stream=1 the rows are streamed in chunks, see StreamingListMixin.
     Users must be authenticated and have the necessary 'view_subcontract' permissions.
     Methods:
         get_queryset(): retrieves subcontracts and applies filtering based on the search query.
-            The result is sorted using the delta subcontract method.
+            The result is sorted in the database by risk bucket and contract deadline.
         get_context_data(**kwargs): Adds additional context to the template, including the search form.
     """
     model = SubContract
     template_name = 'navbar_subcontracts.html'
+    row_template_name = 'includes/subcontract_rows.html'
     context_object_name = 'subcontracts'
     permission_required = 'viewer.view_subcontract'
+    conditional_models = (SubContract, Contract, User)
 
     def get_queryset(self):
         queryset = SubContract.objects.all()
@@ -252,24 +674,28 @@ class SubContractAllListView(PermissionRequiredMixin, LoginRequiredMixin, ListVi
                 Q(subcontract_name__icontains=query) |
                 Q(contract__contract_name__icontains=query)
             )
-        sorted_queryset = sorted(queryset, key=lambda subcontract: subcontract.delta)
-        return sorted_queryset
+        return queryset.select_related('contract', 'user').order_by(
+            F('risk_bucket').asc(nulls_last=True), 'contract__deadline')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["search_form"] = SearchForm(self.request.GET or None)
         context["search_url"] = "navbar_subcontracts"
         context["show_search"] = True
+        if self.request.user.is_staff and self.request.user.has_perm('viewer.change_subcontract'):
+            context["bulk_form"] = BulkActionForm()
+            context["bulk_url"] = "subcontract_bulk_action"
         return context
 
 
-class SubContractView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+class SubContractView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, ListView):
     """
     Displays a list of sub-orders. User must be authenticated and have ‘view_subcontract’ permission
     """
     model = SubContract
     template_name = 'subcontracts_homepage.html'
     permission_required = 'viewer.view_subcontract'
+    conditional_models = (SubContract, Contract, User)
 
 
 class SubContractCreateView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
@@ -351,38 +777,52 @@ class SubContractDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteV
         return context
 
 
-class SubContractDetailView(PermissionRequiredMixin, LoginRequiredMixin, DetailView):
+class SubContractDetailView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, DetailView):
     """
     View subcontract details. The user will be logged in and will have permission to view the details of the subcontract.
     """
     template_name = "detail_subcontract.html"
     model = SubContract
     permission_required = 'viewer.view_subcontract'
+    conditional_models = (Comment, User)
+
+    def get_conditional_state(self):
+        row = SubContract.objects.filter(
+            contract_id=self.kwargs.get("contract_pk"), subcontract_number=self.kwargs.get("subcontract_number"),
+        ).values_list('updated_at', 'contract__updated_at').first()
+        if row is None:
+            return None
+        return [(f"{name}:{updated_at.isoformat()}", updated_at)
+                for name, updated_at in zip(('subcontract', 'contract'), row)] + super().get_conditional_state()
 
     def get_object(self):
         """
         Finds a subcontract object based on the contract primary key and subcontract number specified in the URL.
+        The contract comes in the same query and the comments are prefetched in one more.
         """
         contract_pk = self.kwargs.get("contract_pk")
         subcontract_number = self.kwargs.get("subcontract_number")
-        return SubContract.objects.get(contract__pk=contract_pk, subcontract_number=subcontract_number)
+        queryset = SubContract.objects.select_related('contract', 'user').prefetch_related(
+            Prefetch('comment_set', queryset=Comment.objects.order_by('pk'))
+        )
+        return get_object_or_404(queryset, contract_id=contract_pk, subcontract_number=subcontract_number)
 
 
 @login_required
 def show_subcontracts(request):
     """
-    This function takes care of displaying the subcontracts that belong to the logged-in user.
+    This function takes care of displaying the subcontracts in progress that belong to the logged-in user.
     It supports filtering based on the search query entered by the user.
     The subcontracts are sorted based on the delta() method of the related contract.
     The view uses a search form and displays the results in a template.
     """
     query = request.GET.get("query", "")
-    subcontracts = SubContract.objects.filter(user=request.user)
+    subcontracts = SubContract.objects.active().filter(user=request.user)
     if query:
         subcontracts = subcontracts.filter(
             Q(subcontract_name__icontains=query)
         )
-    sorted_subcontracts = sorted(subcontracts, key=lambda subcontract: subcontract.contract.delta())
+    sorted_subcontracts = subcontracts.select_related('contract', 'user').order_by('contract__deadline')
     search_form = SearchForm(initial={'query': query})
     search_url = 'navbar_show_subcontracts'
     show_search = True
@@ -406,7 +846,7 @@ def subcontract_detail(request, subcontract_id):
     return render(request, 'detail_subcontract.html', {'subcontract': subcontract, 'contract': contract})
 
 
-class CustomerView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
+class CustomerView(ConditionalGetMixin, PermissionRequiredMixin, LoginRequiredMixin, ListView):
     """
     View the list of customers. The user will be logged in and will have permission to view customer details.
     """
@@ -414,6 +854,7 @@ class CustomerView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
     template_name = 'navbar_customers.html'
     context_object_name = "customers"
     permission_required = 'viewer.view_customer'
+    conditional_models = (Customer, User)
 
     def get_queryset(self):
         """
@@ -426,7 +867,7 @@ class CustomerView(PermissionRequiredMixin, LoginRequiredMixin, ListView):
                 Q(first_name__icontains=query) |
                 Q(last_name__icontains=query)
             )
-        return queryset
+        return queryset.order_by('last_name', 'first_name')
 
     def get_context_data(self, **kwargs):
         """
@@ -561,12 +1002,33 @@ def calendar_view(request):
     return render(request, 'calendar.html')
 
 
+def metrics(request):
+    """
+    Prometheus scrape endpoint, see viewer/metrics.py. Open to staff and to requests carrying
+    "Authorization: Bearer <METRICS_TOKEN>" when that setting is configured.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = token and request.headers.get('Authorization') == f"Bearer {token}"
+    if not authorized and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def event_stream(request):
+    """
+    Live updates are streamed by the ASGI app, see viewer/notifications.py. When the request gets
+    here instead (e.g. under runserver), 204 tells EventSource to stop reconnecting.
+    """
+    return HttpResponse(status=204)
+
+
 @login_required
 def events_feed(request):
     """
     Returns a JSON response with all events formatted for calendar display.
     """
-    events = Event.objects.all()
+    events = Event.objects.select_related('group')
     events_data = [
         {
             'id': event.id,
@@ -672,11 +1134,22 @@ def employee_profile(request):
     user = request.user
 
     try:
-        user_profile, created = UserProfile.objects.get_or_create(user=user)
+        # Profile, position, security question, employee information, bank account and contacts in two queries
+        user_profile = UserProfile.load_aggregate(user)
     except Exception as e:
         logger.error(f"Error fetching/creating UserProfile for user {user.id}: {e}")
         messages.error(request, 'An error occurred while fetching your profile. Please try again later.')
-        return redirect('home')
+        return redirect('homepage')
+
+    try:
+        employee_information = user_profile.employeeinformation
+    except EmployeeInformation.DoesNotExist:
+        employee_information = None
+
+    try:
+        bank_account = user_profile.bankaccount
+    except BankAccount.DoesNotExist:
+        bank_account = None
 
     edit_section = request.GET.get('edit')
 
@@ -688,10 +1161,6 @@ def employee_profile(request):
     # Processing POST requests
     if request.method == 'POST':
         if 'employee_information_submit' in request.POST:
-            try:
-                employee_information = user_profile.employeeinformation
-            except EmployeeInformation.DoesNotExist:
-                employee_information = None
             employee_information_form = EmployeeInformationForm(request.POST, instance=employee_information)
 
             if employee_information_form.is_valid():
@@ -708,10 +1177,6 @@ def employee_profile(request):
                 messages.error(request, 'Opravte prosím níže uvedené chyby.')
 
         elif 'bank_account_submit' in request.POST:
-            try:
-                bank_account = user_profile.bankaccount
-            except BankAccount.DoesNotExist:
-                bank_account = None
             bank_account_form = BankAccountForm(request.POST, instance=bank_account)
 
             if bank_account_form.is_valid():
@@ -728,16 +1193,7 @@ def employee_profile(request):
                 messages.error(request, 'Opravte prosím níže uvedené chyby.')
 
         elif 'emergency_contact_submit' in request.POST:
-            EmergencyContactFormSetAdjusted = inlineformset_factory(
-                UserProfile,
-                EmergencyContact,
-                form=EmergencyContactForm,
-                formset=BaseEmergencyContactFormSet,
-                extra=1,
-                max_num=2,
-                can_delete=True,
-            )
-            emergency_contact_formset = EmergencyContactFormSetAdjusted(request.POST, instance=user_profile)
+            emergency_contact_formset = EmergencyContactAddFormSet(request.POST, instance=user_profile)
 
             if emergency_contact_formset.is_valid():
                 try:
@@ -753,41 +1209,18 @@ def employee_profile(request):
     # GET request processing
     else:
         if edit_section == 'information':
-            try:
-                employee_information = user_profile.employeeinformation
-            except EmployeeInformation.DoesNotExist:
-                employee_information = None
             employee_information_form = EmployeeInformationForm(instance=employee_information)
 
         elif edit_section == 'account':
-            try:
-                bank_account = user_profile.bankaccount
-            except BankAccount.DoesNotExist:
-                bank_account = None
             bank_account_form = BankAccountForm(instance=bank_account)
 
         elif edit_section == 'emergency_contacts':
-            EmergencyContactFormSetAdjusted = inlineformset_factory(
-                UserProfile,
-                EmergencyContact,
-                form=EmergencyContactForm,
-                formset=BaseEmergencyContactFormSet,
-                extra=1 if user_profile.emergency_contacts.count() == 0 else 0,
-                max_num=2,
-                can_delete=True,
-            )
-            emergency_contact_formset = EmergencyContactFormSetAdjusted(instance=user_profile)
-
-    # Getting data to display in read-only mode
-    try:
-        employee_information = user_profile.employeeinformation
-    except EmployeeInformation.DoesNotExist:
-        employee_information = None
-
-    try:
-        bank_account = user_profile.bankaccount
-    except BankAccount.DoesNotExist:
-        bank_account = None
+            # The contacts are prefetched, len() doesn't run a COUNT query
+            if len(user_profile.emergency_contacts.all()):
+                formset_class = EmergencyContactEditFormSet
+            else:
+                formset_class = EmergencyContactAddFormSet
+            emergency_contact_formset = formset_class(instance=user_profile)
 
     context = {
         'user': user,
@@ -899,3 +1332,85 @@ def password_reset_step_3(request):
     else:
         form = SetNewPasswordForm()
     return render(request, 'password_reset_step_3.html', {'form': form})
+
+
+class StaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    """
+    Restricts a view to staff members.
+    """
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class JobListView(StaffRequiredMixin, ListView):
+    """
+    Status page of the background job queue for staff: counts per status and the latest jobs,
+    optionally filtered by status.
+    """
+    model = Job
+    template_name = 'jobs.html'
+    context_object_name = 'jobs'
+    paginate_by = 50
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        status = self.request.GET.get('status')
+        if status in {str(value) for value in JobStatus.values}:
+            queryset = queryset.filter(status=int(status))
+        return queryset.order_by('-created', '-pk')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        counts = dict(Job.objects.values_list('status').annotate(count=Count('pk')).order_by())
+        context['status_counts'] = [(status, label, counts.get(status, 0)) for status, label in JobStatus.choices]
+        context['tasks'] = sorted(TASKS)
+        return context
+
+
+class JobEnqueueView(StaffRequiredMixin, View):
+    """
+    Queues a run of a registered task (POST only), or a new attempt of an existing job when `job` is given.
+    """
+    def post(self, request):
+        job_pk = request.POST.get('job')
+        job = get_object_or_404(Job, pk=job_pk) if job_pk else None
+        if job is not None and job.name in TASKS:
+            enqueue(job.name, job.payload)
+        elif job is None and request.POST.get('task') in TASKS:
+            enqueue(request.POST['task'])
+        else:
+            messages.error(request, 'Neznámá úloha.')
+            return redirect('job_list')
+        messages.success(request, 'Úloha byla zařazena do fronty.')
+        return redirect('job_list')
+
+
+class BulkActionView(PermissionRequiredMixin, StaffRequiredMixin, View):
+    """
+    Marks the selected rows of `model` as done or cancelled, or hands them over to another user,
+    with a few set-based UPDATEs (POST only), see viewer.bulk.
+    """
+    model = None
+    success_url = None
+
+    def post(self, request):
+        form = BulkActionForm(request.POST)
+        if form.is_valid():
+            changed = apply_bulk_action(self.model, form.cleaned_data['action'], form.cleaned_data['selected'],
+                                        form.cleaned_data['user'])
+            messages.success(request, f'Změněno záznamů: {changed}.')
+        else:
+            messages.error(request, 'Vyberte záznamy, akci a případně uživatele.')
+        return redirect(self.success_url)
+
+
+class ContractBulkActionView(BulkActionView):
+    model = Contract
+    permission_required = 'viewer.change_contract'
+    success_url = 'navbar_contracts_all'
+
+
+class SubContractBulkActionView(BulkActionView):
+    model = SubContract
+    permission_required = 'viewer.change_subcontract'
+    success_url = 'navbar_subcontracts'